@@ -0,0 +1,143 @@
+"""
+Which courses of a whole session can still be added to a schedule, found in one pass.
+
+The index keeps, for every occupancy bucket, the bitset of the sections occupying it, and for
+every course and section type the range of its section indices (index_sections numbers the sections of a course and
+type consecutively). For a schedule:
+    - the sections that conflict with it are the union of the bitsets of the buckets in its occupancy mask,
+    - the sections that could be added are the open sections minus those,
+    - a course can be added if each of its section types has one of them in its range.
+
+This gives the same answer as Schedule.can_add_course for every course not in the schedule, without going through
+sections one by one. Courses already in the schedule are never listed as addable.
+
+USAGE: python3 addable.py course_data_utm_20199 CSC108H5F:LEC0101,PRA0101 MAT135H5F:LEC0101,TUT0101 ...
+    prints the number of courses that can still be added to the given schedule, and why the others cannot.
+"""
+from datetime import datetime
+import sys
+from course import *
+from course_bin import load_course_data
+from availability import AvailabilityIndex
+from schedule import Schedule
+
+# reasons a section type of a course blocks the course
+BLOCK_SCHEDULED = 'scheduled'
+BLOCK_UNAVAILABLE = 'full or closed'
+BLOCK_CONFLICT = 'conflict'
+
+
+def compute_bucket_members(all_sections):
+    """
+    :return: dict of occupancy bucket (bit position in the masks) -> int bitset over the indices of the sections
+        occupying it.
+    """
+    bucket_members = {}
+    for sec in all_sections:
+        bit = 1 << sec.index
+        m = sec.mask
+        while m:
+            low = m & -m
+            bucket = low.bit_length() - 1
+            bucket_members[bucket] = bucket_members.get(bucket, 0) | bit
+            m ^= low
+    return bucket_members
+
+
+class AddableIndex:
+    def __init__(self, courses, availability=None):
+        """
+        :param courses: every course of the session, with sections indexed (see index_sections).
+        :param availability: optional AvailabilityIndex of the session, built from the courses if not given.
+        """
+        self.courses = courses
+        self.all_sections = [sec for course in courses for sectype in sectypes
+                             for sec in course.course_sections.get(sectype, ())]
+        if any(sec.index != i for i, sec in enumerate(self.all_sections)):
+            raise Exception("The sections of the courses must be indexed in order, see index_sections.")
+
+        self.bucket_members = compute_bucket_members(self.all_sections)
+
+        # (position in courses, section type, first section index, number of sections). A section type listed with
+        # no sections has an empty range, which blocks the course as Schedule.can_add_course does.
+        self.type_ranges = []
+        for pos, course in enumerate(courses):
+            for sectype in sectypes:
+                if sectype in course.course_sections:
+                    secs = course.course_sections[sectype]
+                    self.type_ranges.append((pos, sectype, secs[0].index if len(secs) > 0 else 0, len(secs)))
+
+        self.availability = availability if availability is not None else AvailabilityIndex(self.all_sections)
+        self.refresh_availability()
+
+    def refresh_availability(self):
+        """
+        Read the open sections again from the AvailabilityIndex, e.g. after AvailabilityIndex.update.
+        """
+        self.open_bits = sum(1 << i for i, sec in enumerate(self.all_sections) if self.availability.is_open(sec))
+
+    def conflict_bits(self, occupancy):
+        """
+        :return: bitset over section indices of the sections that conflict with the occupancy mask.
+        """
+        bits = 0
+        m = occupancy
+        while m:
+            low = m & -m
+            bits |= self.bucket_members.get(low.bit_length() - 1, 0)
+            m ^= low
+        return bits
+
+    def check_all(self, sched):
+        """
+        :return: (list of the courses that can be added, dict of course code -> dict of section type -> reason)
+            where the reason is one of BLOCK_SCHEDULED, BLOCK_UNAVAILABLE and BLOCK_CONFLICT.
+        """
+        free = self.open_bits & ~self.conflict_bits(sched.occupancy)
+        scheduled = set(cltp[0].course_code for cltp in sched.course_ltp_list)
+
+        blocked = {}
+        for pos, sectype, start, n in self.type_ranges:
+            code = self.courses[pos].course_code
+            range_bits = (1 << n) - 1
+            if code in scheduled:
+                reason = BLOCK_SCHEDULED
+            elif (free >> start) & range_bits:
+                continue
+            elif (self.open_bits >> start) & range_bits:
+                reason = BLOCK_CONFLICT
+            else:
+                reason = BLOCK_UNAVAILABLE
+            blocked.setdefault(code, {})[sectype] = reason
+
+        return [course for course in self.courses if course.course_code not in blocked], blocked
+
+    def addable(self, sched):
+        """
+        :return: list of the courses that can be added to sched.
+        """
+        return self.check_all(sched)[0]
+
+
+if __name__ == "__main__":
+    courses = load_course_data(sys.argv[1])
+    by_code = {course.course_code: course for course in courses}
+    sched = Schedule()
+    for arg in sys.argv[2:]:
+        code, sec_ids = arg.split(':')
+        chosen = {sec.section_id[:3]: sec for sectype, secs in by_code[code].course_sections.items()
+                  for sec in secs if sec.section_id in sec_ids.split(',')}
+        sched.add_course(by_code[code], chosen.get('LEC'), chosen.get('TUT'), chosen.get('PRA'))
+
+    index = AddableIndex(courses)
+    start = datetime.now()
+    addable, blocked = index.check_all(sched)
+    elapsed = datetime.now() - start
+
+    reasons = {}
+    for course_reasons in blocked.values():
+        for reason in set(course_reasons.values()):
+            reasons[reason] = reasons.get(reason, 0) + 1
+    print("{0} of {1} courses can be added, found in {2}".format(len(addable), len(courses), elapsed))
+    for reason, n in sorted(reasons.items()):
+        print("{0} courses blocked by: {1}".format(n, reason))
@@ -0,0 +1,191 @@
+"""
+Enrolment reports over whole sessions, computed on NumPy arrays instead of looping over courses.
+
+A session is loaded into an EnrolmentTable: one row per section with its course, section type, enrolled count,
+capacity, waitlist and closed flag, and one row per course with its code, name, department, year level and term.
+When the session has a current .bin file, the section columns are read straight from the memory-mapped file
+(see course_bin.py); otherwise they are filled in from the courses.
+
+Totals per course or per group are sums over the section rows with np.bincount, and the top n of a ranking is found
+with np.argpartition, so that only the courses that make it into the top n are sorted. Rankings are ordered as a
+stable sort by descending value would order them: equal values keep the order of the courses in the file.
+
+USAGE: python3 analytics.py course_data_utm_20199 [course_data_stg_artsci_20205 ...]
+    prints the courses with the highest enrolment and waitlist counts and ratios of each session, and the
+    enrolment of each department.
+"""
+from datetime import datetime
+import sys
+import numpy as np
+from course import *
+from course_bin import CourseFile, open_course_data
+
+N_REPORT = 20
+
+
+def safe_ratio(numerator, denominator):
+    """
+    :return: numerator / denominator, with 0 where the denominator is 0.
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def top_n(values, n, where=None):
+    """
+    :param values: 1-d array of values to rank, highest first.
+    :param where: optional boolean array, the rows that may be ranked.
+    :return: positions of the n highest values, in the order of a stable sort by descending value.
+    """
+    values = np.asarray(values)
+    rows = np.arange(len(values)) if where is None else np.flatnonzero(where)
+    if n <= 0 or len(rows) == 0:
+        return rows[:0]
+
+    candidates = values[rows]
+    if n < len(rows):
+        # every row tied with the n-th highest value is kept, so that ties are broken by position below
+        threshold = candidates[np.argpartition(-candidates, n - 1)[n - 1]]
+        keep = candidates >= threshold
+        rows = rows[keep]
+        candidates = candidates[keep]
+    return rows[np.lexsort((rows, -candidates))][:n]
+
+
+def group_sum(keys, values):
+    """
+    :return: (sorted array of the distinct keys, array of the sum of values for each key)
+    """
+    groups, inverse = np.unique(keys, return_inverse=True)
+    return groups, np.bincount(inverse.ravel(), weights=values, minlength=len(groups))
+
+
+class EnrolmentTable:
+    def __init__(self, course_data_path):
+        courses = open_course_data(course_data_path)
+
+        self.codes = np.array([course.course_code for course in courses])
+        self.names = np.array([course.course_name for course in courses])
+        self.terms = np.array([course.term for course in courses])
+        self.departments = np.array([code[:3] for code in self.codes])
+        self.levels = np.array([code[3:4] for code in self.codes])
+
+        if isinstance(courses, CourseFile):
+            self.sec_course = np.array(courses.s_course, dtype=np.int64)
+            self.sec_type = np.array(courses.s_type, dtype=np.int8)
+            self.enrolled = np.array(courses.s_enrolled, dtype=np.int64)
+            self.capacity = np.array(courses.s_total, dtype=np.int64)
+            self.waitlist = np.array(courses.s_waitlist, dtype=np.int64)
+            self.closed = np.array(courses.s_closed, dtype=bool)
+            courses.close()
+        else:
+            rows = [(i, sectypes.index(sectype), sec.enrolled_count, sec.total_count, sec.waitlist_count, sec.is_closed)
+                    for i, course in enumerate(courses)
+                    for sectype in sectypes
+                    for sec in course.course_sections.get(sectype, ())]
+            columns = list(zip(*rows)) if len(rows) > 0 else [()] * 6
+            self.sec_course = np.array(columns[0], dtype=np.int64)
+            self.sec_type = np.array(columns[1], dtype=np.int8)
+            self.enrolled = np.array(columns[2], dtype=np.int64)
+            self.capacity = np.array(columns[3], dtype=np.int64)
+            self.waitlist = np.array(columns[4], dtype=np.int64)
+            self.closed = np.array(columns[5], dtype=bool)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def section_mask(self, section_types=('LEC',), include_closed=True):
+        """
+        :return: boolean array over the sections, True for the sections of the given types.
+        """
+        mask = np.isin(self.sec_type, [sectypes.index(sectype) for sectype in section_types])
+        if not include_closed:
+            mask &= ~self.closed
+        return mask
+
+    def course_sum(self, column, sections=None):
+        """
+        :param column: array over the sections, e.g. self.enrolled.
+        :param sections: optional boolean array, the sections to include.
+        :return: array over the courses, the sum of column over the sections of each course.
+        """
+        weights = column if sections is None else np.where(sections, column, 0)
+        return np.bincount(self.sec_course, weights=weights, minlength=len(self)).astype(np.int64)
+
+    def course_totals(self, section_types=('LEC',), include_closed=True):
+        """
+        :return: (enrolled, capacity, waitlist), each an array over the courses.
+        """
+        sections = self.section_mask(section_types, include_closed)
+        return (self.course_sum(self.enrolled, sections), self.course_sum(self.capacity, sections),
+                self.course_sum(self.waitlist, sections))
+
+    def course_mask(self, levels=None, terms=None, departments=None):
+        """
+        :return: boolean array over the courses, True for the courses that are in one of the given levels,
+            one of the given terms and one of the given departments.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if levels is not None:
+            mask &= np.isin(self.levels, list(levels))
+        if terms is not None:
+            mask &= np.isin(self.terms, list(terms))
+        if departments is not None:
+            mask &= np.isin(self.departments, list(departments))
+        return mask
+
+    def group_totals(self, keys, section_types=('LEC',), include_closed=True):
+        """
+        :param keys: array over the courses to group by, e.g. self.departments, self.levels or self.terms.
+        :return: (groups, enrolled, capacity, waitlist), each an array over the distinct keys.
+        """
+        enrolled, capacity, waitlist = self.course_totals(section_types, include_closed)
+        groups, group_enrolled = group_sum(keys, enrolled)
+        return (groups, group_enrolled.astype(np.int64), group_sum(keys, capacity)[1].astype(np.int64),
+                group_sum(keys, waitlist)[1].astype(np.int64))
+
+
+def print_ranking(table, title, rows, columns):
+    """
+    :param columns: list of (label, array over the courses, format string)
+    """
+    print("---- {0} ----".format(title))
+    for i in rows:
+        print(table.codes[i], "{:<75}".format(table.names[i]),
+              *(s for label, values, fmt in columns for s in (label, fmt.format(values[i]))))
+
+
+def print_session_report(course_data_path, n=N_REPORT):
+    table = EnrolmentTable(course_data_path)
+    enrolled, capacity, waitlist = table.course_totals(include_closed=False)
+    enrol_ratio = safe_ratio(enrolled, capacity)
+    all_enrolled, _, all_waitlist = table.course_totals()
+    waitlist_ratio = safe_ratio(all_waitlist, all_enrolled)
+
+    print("==== {0}: {1} courses ====".format(course_data_path, len(table)))
+    print_ranking(table, "enrol count", top_n(enrolled, n, enrolled > 0),
+                  [("enrolled count:", enrolled, "{}"), ("capacity:", capacity, "{}")])
+    print_ranking(table, "enrol ratio", top_n(enrol_ratio, n, enrolled > 0),
+                  [("enrolled percent:", enrol_ratio, "{:.0%}"), ("enrolled count:", enrolled, "{}"),
+                   ("capacity:", capacity, "{}")])
+    print_ranking(table, "waitlist count", top_n(all_waitlist, n, all_waitlist > 0),
+                  [("waitlist count:", all_waitlist, "{}"), ("enrolled count:", all_enrolled, "{}")])
+    print_ranking(table, "waitlist ratio", top_n(waitlist_ratio, n, all_waitlist > 0),
+                  [("waitlist ratio:", waitlist_ratio, "{:.0%}"), ("waitlist count:", all_waitlist, "{}"),
+                   ("enrolled count:", all_enrolled, "{}")])
+
+    print("---- enrolment by department ----")
+    groups, group_enrolled, group_capacity, group_waitlist = table.group_totals(table.departments)
+    for i in top_n(group_enrolled, len(groups)):
+        print("{0:<5} enrolled: {1:<7} capacity: {2:<7} waitlist: {3}".format(
+            groups[i], group_enrolled[i], group_capacity[i], group_waitlist[i]))
+
+
+if __name__ == "__main__":
+    for course_data_path in sys.argv[1:]:
+        start = datetime.now()
+        print_session_report(course_data_path)
+        print("{0} in {1}".format(course_data_path, datetime.now() - start))
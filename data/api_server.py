@@ -0,0 +1,364 @@
+"""
+Local HTTP/JSON service for course lookup, search, schedule checks and arranging schedules.
+
+The course data of one session is loaded once into a CourseSession (courses, CourseIndex and section availability),
+which is shared by every request. A background task looks at the course data file and its .bin every reload_interval
+seconds. Once a file has changed and stayed unchanged for one more interval (the scrapers write the JSON file in
+place), a new CourseSession is loaded in a worker thread and swapped in with a single assignment, so each request
+sees either the old or the new data and never a mix. If the new file cannot be loaded, the old session is kept.
+
+Requests:
+    GET  /course?code=CSC108H5F
+        {"course": {...}} in the same form as the course data file. code may be any prefix matching one course.
+    GET  /search?q=CSC+intro
+        {"courses": [{"course_code": ..., "course_name": ..., "term": ...}, ...]}, as cmd_interface's search.
+    POST /check {"schedule": {"CSC108H5F": ["LEC0101", "PRA0101"]}, "course": "MAT135H5F", "sections": ["LEC0101"]}
+        {"can_add": false, "conflicts": [["LEC0101", 1, "CSC108H5F", "LEC0101"], ...], "report": "..."}.
+        Without "sections", any open and non-conflicting sections will do, as Schedule.check_course.
+        With them, full and closed sections are allowed, as cmd_interface's add. Each conflict is
+        [section id, timeslot position in the section, scheduled course code, scheduled section id].
+        "report" is only rendered if "report": true is given, and "conflicts" is left out with "quick": true.
+    POST /addable {"schedule": {"CSC108H5F": ["LEC0101", "PRA0101"]}, "q": "CSC"}
+        {"addable": ["CSC148H5S", ...], "blocked": {"CSC207H5F": {"LEC": "conflict"}, ...}} over every course of the
+        session, or only those matching the optional search "q". See addable.py for the reasons.
+    POST /solve {"courses": ["CSC108H5F", "MAT135H5F"], "preference": "compact", "k": 5, "open_only": false}
+        {"schedules": [{"score": -120, "sections": {"CSC108H5F": ["LEC0101", "PRA0101"], ...}}, ...]}
+        With "open_only", full sections are left out as well as closed ones.
+    GET  /status
+        {"course_data": ..., "courses": ..., "loaded": ..., "sections": {"open": ..., "full": ..., ...}}
+
+Errors are returned as {"error": ...}, with status 400 for bad requests, 404 for unknown paths and 500 for
+anything else that goes wrong while answering.
+The schedule is sent with each request instead of being kept by the server.
+
+USAGE: python3 api_server.py [course_data_file] [port]
+    e.g. api_server.py course_data_utm_20199 8080
+"""
+import asyncio
+from datetime import datetime
+import json
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+from course import *
+from course_bin import bin_path, load_course_data
+from course_index import CourseIndex
+from availability import AvailabilityIndex
+from addable import AddableIndex
+from schedule import Schedule
+from scoring import DEFAULT_K, DEFAULT_PREFERENCE, preference_weights
+from solver import find_best_schedules, schedule_sections
+
+DEFAULT_PORT = 8080
+RELOAD_INTERVAL = 5
+MAX_BODY_BYTES = 1 << 20
+
+http_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+json_kinds = {dict: 'an object', list: 'a list', str: 'a string', int: 'an integer'}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def body_field(body, name, kind, default=None, item_kind=None):
+    """
+    :return: body[name], or default if it is not given.
+    :raise RequestError: 400 if it is missing without a default, not a kind, or holds items that are not item_kind.
+    """
+    if name not in body:
+        if default is None:
+            raise RequestError(400, "Missing field: " + name)
+        return default
+    value = body[name]
+    # bool is a subclass of int, but true is not a number of schedules
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise RequestError(400, "{0} must be {1}.".format(name, json_kinds[kind]))
+    if item_kind is not None:
+        items = value.values() if isinstance(value, dict) else value
+        if not all(isinstance(item, item_kind) for item in items):
+            raise RequestError(400, "{0} must only hold {1} values.".format(name, json_kinds[item_kind]))
+    return value
+
+
+def schedule_field(body):
+    """
+    :return: the "schedule" of body, a dict of course code -> list of section ids.
+    """
+    sched_sections = body_field(body, 'schedule', dict, {}, list)
+    if not all(isinstance(name, str) for sec_names in sched_sections.values() for name in sec_names):
+        raise RequestError(400, "schedule must list section ids as strings.")
+    return sched_sections
+
+
+def data_files_stamp(course_data_path):
+    """
+    :return: (mtime, size) of the course data file and its .bin, which changes whenever either is rewritten.
+    """
+    stamp = []
+    for path in (course_data_path, bin_path(course_data_path)):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+class CourseSession:
+    """
+    The courses of one loaded course data file. Not modified after it is created.
+    """
+
+    def __init__(self, course_data_path):
+        self.stamp = data_files_stamp(course_data_path)
+        self.courses = load_course_data(course_data_path)
+        self.index = CourseIndex(self.courses)
+        self.by_code = {course.course_code: course for course in self.courses}
+        all_sections = index_sections(self.courses)
+        self.availability = AvailabilityIndex(all_sections)
+        self.addable = AddableIndex(self.courses, self.availability)
+        self.loaded = datetime.now()
+
+    def get_course(self, code):
+        try:
+            return self.index.get_course(code)
+        except Exception as ex:
+            raise RequestError(400, "{0}: {1}".format(code, ex))
+
+    def get_sections(self, course, sec_names, one_of_each=True):
+        """
+        :return: list of the LEC, TUT and PRA sections of course named by sec_names (prefixes of section ids),
+            with None for the section types not named.
+        """
+        if len(set(sec_names)) != len(sec_names) or (one_of_each and len(sec_names) != len(course.course_sections)):
+            raise RequestError(400, "{0}: select one of each section.".format(course.course_code))
+
+        chosen = {}
+        for name in sec_names:
+            sectype = name[:3]
+            matches = [sec for sec in course.course_sections.get(sectype, ()) if sec.section_id.startswith(name)]
+            if len(matches) != 1 or sectype in chosen:
+                raise RequestError(400, "{0}: no single section matches {1}.".format(course.course_code, name))
+            chosen[sectype] = matches[0]
+        return [chosen.get(sectype) for sectype in sectypes]
+
+    def make_schedule(self, sched_sections):
+        """
+        :param sched_sections: dict of course code -> list of section ids, as returned by /solve.
+        """
+        sched = Schedule(self.availability)
+        for code, sec_names in sched_sections.items():
+            course = self.get_course(code)
+            sched.add_course(course, *self.get_sections(course, sec_names))
+        return sched
+
+
+def course_json(obj):
+    if isinstance(obj, (Course, SingleSection, Timeslot)):
+        return obj.__getstate__()
+    raise TypeError(type(obj).__name__)
+
+
+class ApiServer:
+    def __init__(self, course_data_path, reload_interval=RELOAD_INTERVAL):
+        self.course_data_path = course_data_path
+        self.reload_interval = reload_interval
+        self.session = CourseSession(course_data_path)
+
+    def handle_course(self, session, query, body):
+        code = query.get('code', [''])[0]
+        return {'course': session.get_course(code)}
+
+    def handle_search(self, session, query, body):
+        keywords = ' '.join(query.get('q', [])).split()
+        return {'courses': [{'course_code': c.course_code, 'course_name': c.course_name, 'term': c.term}
+                            for c in session.index.search(*keywords)]}
+
+    def handle_check(self, session, query, body):
+        sched = session.make_schedule(schedule_field(body))
+        course = session.get_course(body_field(body, 'course', str))
+        sections = session.get_sections(course, body_field(body, 'sections', list, item_kind=str)) \
+            if 'sections' in body else None
+
+        if body.get('quick', False):
+            if sections is not None:
+                return {'can_add': sched.can_add_course_sections(course, *sections, ignore_full_closed=True)}
+            return {'can_add': sched.can_add_course(course)}
+
+        if sections is not None:
+            result = sched.check_course_sections(course, *sections, ignore_full_closed=True)
+        else:
+            result = sched.check_course(course)
+
+        response = {'can_add': result.ok,
+                    'conflicts': [[check.section.section_id, i, cst[0].course_code, cst[1].section_id]
+                                  for check in result.sections for i, cst in check.conflicts]}
+        if body.get('report', False):
+            response['report'] = result.to_string()
+        return response
+
+    def handle_addable(self, session, query, body):
+        sched = session.make_schedule(schedule_field(body))
+        addable, blocked = session.addable.check_all(sched)
+        if 'q' in body:
+            matching = set(c.course_code for c in session.index.search(*body_field(body, 'q', str).split()))
+            addable = [c for c in addable if c.course_code in matching]
+            blocked = {code: reasons for code, reasons in blocked.items() if code in matching}
+        return {'addable': [c.course_code for c in addable], 'blocked': blocked}
+
+    def handle_solve(self, session, query, body):
+        courses = [session.get_course(code) for code in body_field(body, 'courses', list, item_kind=str)]
+        if len(set(course.course_code for course in courses)) != len(courses):
+            raise RequestError(400, "Each course may only be given once.")
+
+        preference = body_field(body, 'preference', str, DEFAULT_PREFERENCE)
+        if preference not in preference_weights:
+            raise RequestError(400, "Unknown preference: " + preference)
+        k = body_field(body, 'k', int, DEFAULT_K)
+        if k < 1:
+            raise RequestError(400, "k must be at least 1.")
+        availability = session.availability if body.get('open_only', False) else None
+
+        results = find_best_schedules(courses, k, preference_weights[preference],
+                                      availability=availability)
+        return {'schedules': [{'score': score, 'sections': schedule_sections(sched)} for score, sched in results]}
+
+    def handle_status(self, session, query, body):
+        return {'course_data': self.course_data_path, 'courses': len(session.courses),
+                'loaded': session.loaded.isoformat(), 'sections': session.availability.counts()}
+
+    routes = {
+        ('GET', '/course'): handle_course,
+        ('GET', '/search'): handle_search,
+        ('POST', '/check'): handle_check,
+        ('POST', '/addable'): handle_addable,
+        ('POST', '/solve'): handle_solve,
+        ('GET', '/status'): handle_status,
+    }
+
+    def dispatch(self, method, target, body):
+        """
+        :return: (status, JSON-serializable response)
+        """
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return 405, {'error': "Method not allowed: " + method}
+            return 404, {'error': "Not found: " + url.path}
+
+        # every part of the request reads the same session, even if a reload swaps it in the meantime
+        session = self.session
+        try:
+            if method == 'POST':
+                body = json.loads(body.decode('utf8')) if len(body) > 0 else {}
+                if not isinstance(body, dict):
+                    raise RequestError(400, "The request body must be a JSON object.")
+            return 200, handler(self, session, parse_qs(url.query), body)
+        except RequestError as ex:
+            return ex.status, {'error': str(ex)}
+        except (ValueError, KeyError, TypeError) as ex:
+            return 400, {'error': "Bad request: {0!r}".format(ex)}
+        except Exception as ex:
+            # a bug in a handler must still answer, instead of closing the connection without a response
+            return 500, {'error': "Internal error: {0!r}".format(ex)}
+
+    async def handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if len(request_line) == 0:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode('latin1').split()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    await self.respond(writer, 400, {'error': "Malformed request."}, False)
+                    break
+
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': "Request body too large."}, False)
+                    break
+                body = await reader.readexactly(length) if length > 0 else b''
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version != 'HTTP/1.0'
+
+                # lookups are quick, but solving is not, so every request runs off the event loop
+                status, response = await loop.run_in_executor(None, self.dispatch, method, target, body)
+                await self.respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, response, keep_alive):
+        payload = json.dumps(response, default=course_json).encode('utf8')
+        writer.write("HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\nContent-Length: {2}\r\n"
+                     "Connection: {3}\r\n\r\n".format(status, http_reasons[status], len(payload),
+                                                      'keep-alive' if keep_alive else 'close').encode('latin1'))
+        writer.write(payload)
+        await writer.drain()
+
+    async def watch_course_data(self):
+        loop = asyncio.get_running_loop()
+        seen = failed = self.session.stamp
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            stamp = data_files_stamp(self.course_data_path)
+            if stamp in (self.session.stamp, failed) or stamp != seen:
+                # unchanged, already failed to load, or still being written
+                seen = stamp
+                continue
+
+            try:
+                session = await loop.run_in_executor(None, CourseSession, self.course_data_path)
+            except Exception as ex:
+                print("Keeping the loaded courses, could not load {0}: {1}".format(self.course_data_path, ex))
+                failed = stamp
+                continue
+            self.session = session
+            print("Reloaded {0}: {1} courses".format(self.course_data_path, len(session.courses)))
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        watcher = asyncio.ensure_future(self.watch_course_data())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("api_server.py [course_data_file] [port]")
+        print("Serves course lookup, search, schedule checks and schedule arrangement as JSON over HTTP on localhost.")
+        print("Example command: api_server.py course_data_utm_20199 8080")
+        exit()
+
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT
+
+    server = ApiServer(sys.argv[1])
+    print("{0} courses loaded, listening on http://127.0.0.1:{1}/".format(len(server.session.courses), port))
+    asyncio.run(server.serve(port=port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Availability of every section of a session, computed once when the session is loaded.
+
+Each section has one status byte, at the position of its index (see index_sections):
+    OPEN        has room
+    WAITLIST    full, with students on the waitlist
+    FULL        full, with no waitlist
+    CLOSED      marked as closed in its notes
+
+Searches and reports look the status up instead of checking the counts and notes of each section again, and can
+leave out sections that are not open before looking for conflicts. When a scrape only changes enrolment counts,
+update recomputes the statuses of the changed sections alone.
+"""
+from course import *
+
+OPEN = 0
+WAITLIST = 1
+FULL = 2
+CLOSED = 3
+
+status_names = {OPEN: 'open', WAITLIST: 'waitlist', FULL: 'full', CLOSED: 'closed'}
+
+
+def count_status(enrolled, total, waitlist, closed):
+    if closed:
+        return CLOSED
+    if enrolled < total:
+        return OPEN
+    return WAITLIST if waitlist > 0 else FULL
+
+
+def section_status(sec):
+    return count_status(sec.enrolled_count, sec.total_count, sec.waitlist_count, sec.is_closed)
+
+
+class AvailabilityIndex:
+    def __init__(self, all_sections):
+        """
+        :param all_sections: the sections of the session, as returned by index_sections.
+        """
+        self.status = bytearray(section_status(sec) for sec in all_sections)
+
+    @classmethod
+    def from_course_file(cls, course_file):
+        """
+        Build the index from the columns of a course_bin.CourseFile, without reading any sections.
+        """
+        index = cls(())
+        index.status = bytearray(count_status(*counts) for counts in zip(
+            course_file.s_enrolled, course_file.s_total, course_file.s_waitlist, course_file.s_closed))
+        return index
+
+    def __len__(self):
+        return len(self.status)
+
+    def section_status(self, sec):
+        """
+        :return: the status of sec, looked up by its index, or computed if it is not indexed.
+        """
+        if sec.index is None or sec.index >= len(self.status):
+            return section_status(sec)
+        return self.status[sec.index]
+
+    def is_open(self, sec, allow_waitlist=False):
+        status = self.section_status(sec)
+        return status == OPEN or (allow_waitlist and status == WAITLIST)
+
+    def open_sections(self, secs, allow_waitlist=False):
+        return [sec for sec in secs if self.is_open(sec, allow_waitlist)]
+
+    def update(self, sections):
+        """
+        Recompute the status of sections whose counts or notes changed. Sections must keep their indices,
+        so a scrape that adds or removes sections needs a new index instead.
+        """
+        for sec in sections:
+            self.status[sec.index] = section_status(sec)
+
+    def counts(self):
+        """
+        :return: dict of status name -> number of sections with that status.
+        """
+        return {name: self.status.count(status) for status, name in status_names.items()}
@@ -0,0 +1,181 @@
+"""
+Arrange timetables for a whole file of course wishlists at once, across all cores.
+
+Each line of the wishlist file is a JSON object:
+    {"id": "student1", "courses": ["CSC108H5F", "MAT135H5F"], "preference": "compact", "k": 5}
+where "preference" (a name in scoring.preference_weights) and "k" (number of schedules) are optional.
+
+Each wishlist is split at its first course section type with more than one open section: every such section
+becomes a task that searches only the schedules using it. Tasks go into one queue, and every worker takes the next
+task as soon as it is done with its last one, so a wishlist with a large search tree is spread over every worker
+instead of holding up one of them.
+
+The course data is loaded once before the workers are started, and workers forked from this process share it
+read-only. When a wishlist's tasks have all finished, its result is written as one JSON line:
+    {"id": "student1", "schedules": [{"score": -120, "sections": {"CSC108H5F": ["LEC0101", "PRA0101"], ...}}, ...]}
+A wishlist that cannot be arranged gets an empty list of schedules. An invalid wishlist (an unknown or repeated course,
+an unknown preference, k below 1), or one whose search fails, gets {"id": ..., "error": ...} instead, and the rest of
+the batch goes on.
+"""
+from datetime import datetime
+import heapq
+import json
+import multiprocessing
+import os
+import sys
+from course import *
+from course_bin import load_course_data
+from scoring import DEFAULT_K, DEFAULT_PREFERENCE, preference_weights
+from solver import find_best_schedules, schedule_sections
+
+# set in the main process before the pool is started, or by init_worker where workers are not forked
+courses_by_code = None
+
+
+def load_session(course_data_path):
+    global courses_by_code
+    courses = load_course_data(course_data_path)
+    courses_by_code = {course.course_code: course for course in courses}
+
+
+def init_worker(course_data_path):
+    if courses_by_code is None:
+        load_session(course_data_path)
+
+
+def split_wishlist(courses, ignore_closed=True):
+    """
+    :return: list of course lists, one for each open section of the first course section type with more than one,
+        with that section type narrowed down to the one section. Together they cover every schedule of the wishlist.
+    """
+    for i, course in enumerate(courses):
+        for sectype in sectypes:
+            secs = [sec for sec in course.course_sections.get(sectype, ()) if not (ignore_closed and sec.is_closed)]
+            if len(secs) > 1:
+                branches = []
+                for sec in secs:
+                    c_sections_dict = dict(course.course_sections)
+                    c_sections_dict[sectype] = [sec]
+                    narrowed = Course(course.course_code, course.course_name, course.course_info,
+                                      course.enrl_controls, course.term, c_sections_dict)
+                    branches.append(courses[:i] + [narrowed] + courses[i + 1:])
+                return branches
+    return [courses]
+
+
+def solve_task(task):
+    """
+    :param task: (wishlist number, branch number in split_wishlist, list of course codes, preference name, k)
+    :return: (wishlist number, branch number, list of (score, sections), None), or
+        (wishlist number, branch number, None, error message) if the search failed.
+    """
+    n, branch, codes, preference, k = task
+    try:
+        courses = split_wishlist([courses_by_code[code] for code in codes])[branch]
+        results = find_best_schedules(courses, k, preference_weights[preference])
+    except Exception as ex:
+        # raised out of the pool, the exception would end the whole batch
+        return n, branch, None, "{0}: {1}".format(type(ex).__name__, ex)
+    return n, branch, [(score, schedule_sections(sched)) for score, sched in results], None
+
+
+def make_tasks(n, wishlist):
+    """
+    :return: list of tasks for solve_task, or raises an exception if the wishlist is invalid.
+    """
+    codes = wishlist.get('courses')
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        raise Exception("courses must be a list of course codes.")
+    for code in codes:
+        if code not in courses_by_code:
+            raise Exception("Unknown course: " + code)
+    if len(set(codes)) != len(codes):
+        raise Exception("A course is listed more than once.")
+
+    preference = wishlist.get('preference', DEFAULT_PREFERENCE)
+    if not isinstance(preference, str) or preference not in preference_weights:
+        raise Exception("Unknown preference: " + str(preference))
+    k = wishlist.get('k', DEFAULT_K)
+    if not isinstance(k, int) or isinstance(k, bool) or k < 1:
+        raise Exception("k must be a whole number of at least 1.")
+
+    n_branches = len(split_wishlist([courses_by_code[code] for code in codes]))
+    return [(n, branch, codes, preference, k) for branch in range(n_branches)]
+
+
+def batch_solve(course_data_path, wishlist_path, output_path, processes=None):
+    load_session(course_data_path)
+
+    with open(wishlist_path, 'r') as f:
+        wishlists = [json.loads(line) for line in f if line.strip()]
+
+    tasks = []
+    pending = {}
+    best = {}
+    errors = {}
+
+    with open(output_path, 'w') as out:
+        def write_result(n):
+            results = sorted(best.pop(n), key=lambda entry: entry[:3], reverse=True)
+            if n in errors:
+                out.write(json.dumps({'id': wishlists[n].get('id', n), 'error': errors.pop(n)}) + '\n')
+                out.flush()
+                return
+            out.write(json.dumps({'id': wishlists[n].get('id', n),
+                                  'schedules': [{'score': score, 'sections': sections}
+                                                for score, _, _, sections in results]}) + '\n')
+            out.flush()
+
+        for n, wishlist in enumerate(wishlists):
+            try:
+                wishlist_tasks = make_tasks(n, wishlist)
+            except Exception as ex:
+                out.write(json.dumps({'id': wishlist.get('id', n), 'error': str(ex)}) + '\n')
+                continue
+            tasks += wishlist_tasks
+            pending[n] = len(wishlist_tasks)
+            best[n] = []
+
+        # fork where available, so that the workers share the loaded course data instead of loading it again
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with context.Pool(processes, initializer=init_worker, initargs=(course_data_path,)) as pool:
+            for n, branch, results, error in pool.imap_unordered(solve_task, tasks, chunksize=1):
+                if error is not None:
+                    errors.setdefault(n, error)
+                    results = []
+
+                k = wishlists[n].get('k', DEFAULT_K)
+                for rank, (score, sections) in enumerate(results):
+                    # equal scores are ordered by branch, then by the order each branch found them in
+                    entry = (score, -branch, -rank, sections)
+                    if len(best[n]) < k:
+                        heapq.heappush(best[n], entry)
+                    elif entry[:3] > best[n][0][:3]:
+                        heapq.heapreplace(best[n], entry)
+
+                pending[n] -= 1
+                if pending[n] == 0:
+                    write_result(n)
+
+    return len(wishlists)
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("batch_solve.py [course_data_file] [wishlist_file] [output_file] [processes]")
+        print("Each line of [wishlist_file] is a JSON object such as")
+        print('{"id": "student1", "courses": ["CSC108H5F", "MAT135H5F"], "preference": "compact", "k": 5}')
+        print("Results are written to [output_file] as JSON lines, as soon as each wishlist is done.")
+        print("[processes] defaults to the number of cores.")
+        print("Example command: batch_solve.py course_data_utm_20199 wishlists.jsonl schedules.jsonl")
+        exit()
+
+    processes = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count()
+
+    start = datetime.now()
+    n = batch_solve(sys.argv[1], sys.argv[2], sys.argv[3], processes)
+    print("{0} wishlists in {1}".format(n, datetime.now() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmarks of loading course data, checking courses against a schedule, searching and solving.
+
+Every benchmark runs on the checked-in course data files, against fixed wishlists, so that results can be compared
+between commits. Each one is timed over several runs (the fastest and the median are kept), then run once more under
+tracemalloc to measure the peak memory it allocates.
+
+The results are saved as JSON:
+    {"python": ..., "date": ..., "results": {"<session>/<benchmark>": {"min_s": ..., "median_s": ..., "peak_kb": ...,
+                                                                       "result": ...}, ...}}
+where "result" is a number computed by the benchmark (e.g. a count of schedules), to check that a faster version
+still gives the same answer.
+
+USAGE: python3 benchmark.py [output_file] [baseline_file] [runs]
+    [output_file] defaults to benchmark.json. If [baseline_file] is given, the results are compared to it, and
+    benchmarks that became more than REGRESSION_RATIO times slower (and more than NOISE_FLOOR_S seconds slower),
+    or whose result changed, are listed.
+    e.g. benchmark.py after.json before.json
+"""
+from datetime import datetime
+import gc
+import json
+import platform
+import statistics
+import sys
+from time import perf_counter
+import tracemalloc
+from course import *
+from course_index import CourseIndex
+from addable import AddableIndex
+from scoring import preference_weights
+from solver import find_schedules, find_best_schedules
+
+DEFAULT_OUTPUT = "benchmark.json"
+DEFAULT_RUNS = 5
+REGRESSION_RATIO = 1.2
+# changes smaller than this are within the noise of the timer and the machine, whatever their ratio
+NOISE_FLOOR_S = 0.002
+
+# course data file -> (wishlist the schedule is made of, wishlist solved in full, search queries)
+benchmark_sessions = {
+    'course_data_utm_20199': (
+        ['CSC108H5F', 'MAT102H5F', 'MAT135H5F'],
+        ['MAT135H5F', 'MAT102H5F'],
+        [('CSC',), ('MAT', '13'), ('Introduction',), ('ca',), ('Computer', 'Programming')],
+    ),
+    'course_data_stg_artsci_20199': (
+        ['CSC108H1F', 'MAT135H1F', 'ECO101H1F'],
+        ['CSC148H1F', 'MAT135H1F', 'PSY100H1F'],
+        [('CSC',), ('MAT', '13'), ('Introduction',), ('ca',), ('Economic', 'Principles')],
+    ),
+}
+
+
+def first_schedule(by_code, wishlist):
+    sched = next(find_schedules([by_code[code] for code in wishlist]), None)
+    if sched is None:
+        raise Exception("The benchmark wishlist cannot be arranged: " + " ".join(wishlist))
+    return sched
+
+
+def session_benchmarks(course_data_path):
+    """
+    :return: list of (name, function of no arguments returning a number), for the given course data file.
+    """
+    sched_wishlist, solve_wishlist, queries = benchmark_sessions[course_data_path]
+    courses = load_courses(course_data_path)
+    by_code = {course.course_code: course for course in courses}
+    index = CourseIndex(courses)
+    sched = first_schedule(by_code, sched_wishlist)
+    solve_courses = [by_code[code] for code in solve_wishlist]
+
+    def load_json():
+        return len(load_courses(course_data_path))
+
+    def build_index():
+        return len(CourseIndex(courses))
+
+    def check_add_course():
+        return sum(1 for course in courses if sched.check_add_course(course)[0])
+
+    def can_add_course():
+        return sum(1 for course in courses if sched.can_add_course(course))
+
+    addable_index = AddableIndex(courses)
+
+    def addable():
+        return len(addable_index.addable(sched))
+
+    def search():
+        return sum(len(index.search(*query)) for query in queries)
+
+    def build_wcs_list():
+        sched.build_wcs_list()
+        return len(sched.course_ltp_list)
+
+    def to_string():
+        return len(sched.to_string())
+
+    def solve_all():
+        return sum(1 for _ in find_schedules(solve_courses))
+
+    def solve_best():
+        return sum(len(find_best_schedules(solve_courses, 5, weights)) for weights in preference_weights.values())
+
+    return [('load_json', load_json), ('build_index', build_index), ('check_add_course', check_add_course),
+            ('can_add_course', can_add_course), ('addable', addable), ('search', search),
+            ('build_wcs_list', build_wcs_list), ('to_string', to_string), ('solve_all', solve_all),
+            ('solve_best', solve_best)]
+
+
+def run_benchmark(func, runs):
+    times = []
+    result = None
+    # as timeit does, keep the garbage collector from running at different points in different runs
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(runs):
+            start = perf_counter()
+            result = func()
+            times.append(perf_counter() - start)
+    finally:
+        gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'peak_kb': peak // 1024, 'result': result}
+
+
+def run_all(runs=DEFAULT_RUNS):
+    results = {}
+    for course_data_path in benchmark_sessions:
+        session = course_data_path[len("course_data_"):]
+        for name, func in session_benchmarks(course_data_path):
+            results[session + "/" + name] = r = run_benchmark(func, runs)
+            print("{0:<40} {1:>10.4f}s {2:>10.4f}s {3:>10} KB   {4}".format(
+                session + "/" + name, r['min_s'], r['median_s'], r['peak_kb'], r['result']))
+    return results
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO, noise_floor=NOISE_FLOOR_S):
+    """
+    :return: list of the names of the benchmarks that became slower by more than ratio and more than noise_floor
+        seconds, or whose result changed.
+    """
+    regressions = []
+    print("{0:<40} {1:>10} {2:>10} {3:>8}".format("benchmark", "before", "after", "ratio"))
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        change = r['min_s'] / before['min_s'] if before['min_s'] > 0 else float('inf')
+        flag = ""
+        if r['result'] != before['result']:
+            flag = "result changed: {0} -> {1}".format(before['result'], r['result'])
+        elif change > ratio and r['min_s'] - before['min_s'] > noise_floor:
+            flag = "slower"
+        if flag:
+            regressions.append(name)
+        print("{0:<40} {1:>9.4f}s {2:>9.4f}s {3:>7.2f}x  {4}".format(name, before['min_s'], r['min_s'], change, flag))
+    return regressions
+
+
+def main():
+    output_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT
+    baseline_path = sys.argv[2] if len(sys.argv) > 2 and len(sys.argv[2]) > 0 else None
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_RUNS
+
+    print("{0:<40} {1:>11} {2:>11} {3:>13}   {4}".format("benchmark", "min", "median", "peak memory", "result"))
+    results = run_all(runs)
+
+    with open(output_path, 'w') as f:
+        json.dump({'python': platform.python_version(), 'date': datetime.now().isoformat(), 'results': results},
+                  f, indent=2)
+
+    if baseline_path is not None:
+        with open(baseline_path, 'r') as f:
+            regressions = compare(results, json.load(f)['results'])
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -51,11 +51,13 @@ MAT324
 
 
 """
-import json
-import pickle
-import os
 from schedule import *
 from course import *
+from course_bin import load_course_data
+from course_index import CourseIndex
+from schedule_store import ScheduleStore
+from availability import AvailabilityIndex
+from addable import AddableIndex
 
 help_msg = """Options:
 
@@ -63,26 +65,19 @@ Add a course: add <courseID> <section1> <section2> ... (all sections need to be
 Remove a course (all sections): rm <courseID>
 View possible courses: list
 View possible courses with course code or title containing all of query: list <keyword1> <keyword2> ...
+View only the names of courses that can still be added: addable <keyword1> <keyword2> ...
 View course info: view <courseID>
 View current schedule: sched / schedule
 Search course with course code or title containing all of query: search <keyword1> <keyword2> ...
 """
 
 COURSE_SOURCE = 'UTM'  # POSSIBLE OPTIONS: 'STG_ARTSCI', 'UTM'
-
-
-def load_data_from_file(filepath):
-    with open(filepath, 'r') as f:
-        return json.load(f)
-
-
-def save_data_to_file(data, filepath):
-    with open(filepath, 'wb') as f:
-        json.dump(data, f)
+SCHED_FILE = "sched.jsonl"
 
 
 cur_sched = Schedule()
 all_courses = []
+course_index = CourseIndex(all_courses)
 
 
 def get_single(item_list, predicate):
@@ -97,14 +92,11 @@ def get_single(item_list, predicate):
 
 
 def get_course(crs_name):
-    crs_search = get_single(
-        all_courses, lambda c: c.course_code.startswith(crs_name))
-
-    return crs_search
+    return course_index.get_course(crs_name)
 
 
 def search_crs(*keyw):
-    return [c for c in all_courses if all([q in c.course_code or q in c.course_name for q in keyw])]
+    return course_index.search(*keyw)
 
 
 def get_course_with_secs(crs_name, *sec_names):
@@ -113,9 +105,7 @@ def get_course_with_secs(crs_name, *sec_names):
     :return: tuple of format (course, lec_section, tut_section, pra_section) with null when section doesn't exist
     """
     # find the course beginning with course code and ensure beginning with specified crs name
-    crs_search = get_single(
-        all_courses, lambda c: c.course_code.startswith(crs_name))
-    course = crs_search
+    course = course_index.get_course(crs_name)
 
     # assert section names unique, and exactly one of each section
 
@@ -128,23 +118,31 @@ def get_course_with_secs(crs_name, *sec_names):
 
     for sec in sec_names:
         if sec.startswith("LEC"):
-            lec_section = get_single(course.course_sections_dict['LEC'], lambda s: s.section_id.startswith(sec))
+            lec_section = get_single(course.course_sections['LEC'], lambda s: s.section_id.startswith(sec))
         elif sec.startswith("TUT"):
-            tut_section = get_single(course.course_sections_dict['TUT'], lambda s: s.section_id.startswith(sec))
+            tut_section = get_single(course.course_sections['TUT'], lambda s: s.section_id.startswith(sec))
         elif sec.startswith("PRA"):
-            pra_section = get_single(course.course_sections_dict['PRA'], lambda s: s.section_id.startswith(sec))
+            pra_section = get_single(course.course_sections['PRA'], lambda s: s.section_id.startswith(sec))
 
     return (course, lec_section, tut_section, pra_section)
 
 
-if os.path.isfile("sched.bin"):
-    cur_sched = load_data_from_file("sched.bin")
-
 if COURSE_SOURCE == 'STG_ARTSCI':
-    all_courses = load_data_from_file("all_stg_courses")
+    course_data_path = "all_stg_courses"
 elif COURSE_SOURCE == 'UTM':
-    for i in range(1, 5):
-        all_courses += load_data_from_file("course_data_utm_20199")
+    course_data_path = "course_data_utm_20199"
+
+all_courses = load_course_data(course_data_path)
+course_index = CourseIndex(all_courses)
+availability = AvailabilityIndex(index_sections(all_courses))
+addable_index = AddableIndex(all_courses, availability)
+
+# every add and rm is appended to SCHED_FILE as it is made
+sched_store = ScheduleStore(SCHED_FILE, course_data_path)
+cur_sched = sched_store.load(all_courses)
+cur_sched.availability = availability
+for code, sec_id in sched_store.missing:
+    print("Removed from the saved schedule, no longer offered: {0} {1}".format(code, sec_id or ""))
 
 
 """
@@ -172,23 +170,20 @@ if __name__ == "__main__":
             if cmd_split[0] == "add":
                 try:
                     crs = get_course_with_secs(cmd_split[1], *cmd_split[2:])
-                    conflict_check = cur_sched.check_add_course_sections(*filter(lambda c: c is not None, crs), ignore_full_closed=True)
+                    conflict_check = cur_sched.check_course_sections(*crs, ignore_full_closed=True)
 
-                    can_add_crs = conflict_check[0]
-                    report_str = conflict_check[1]
-
-                    if can_add_crs:
-                        cur_sched.add_course(*crs)
+                    if conflict_check.ok:
+                        sched_store.add_course(cur_sched, *crs)
                         print("Successfully added course.")
                     else:
                         print("Failure to add course: ")
-                        print(report_str)
+                        print(conflict_check.to_string())
                 except Exception as ex:
                     print("Error: " + str(ex))
 
             elif cmd_split[0] == "rm":
                 crs = get_course(cmd_split[1])
-                if(cur_sched.rm_course(crs)):
+                if(sched_store.rm_course(cur_sched, crs)):
                     print("Successfully removed course.")
                 else:
                     print("Failed to remove course.")
@@ -202,16 +197,33 @@ if __name__ == "__main__":
                     s_ok_courses = ""
                     s_conflict_courses = ""
                     for c in search_results:
-                        res = cur_sched.check_add_course(c)
-                        if res[0]:
-                            s_ok_courses += res[1]
+                        res = cur_sched.check_course(c)
+                        if res.ok:
+                            s_ok_courses += res.to_string()
                         else:
-                            s_conflict_courses += res[1]
+                            s_conflict_courses += res.to_string()
 
                     s_result = "Can add courses:\n{0}\nConflicting/blocked courses:\n{1}".format(
                         s_ok_courses, s_conflict_courses)
 
                     print(s_result)
+            elif cmd_split[0] == "addable":
+                addable, blocked = addable_index.check_all(cur_sched)
+                matching = set(c.course_code for c in search_crs(*cmd_split[1:]))
+
+                s_ok_courses = ""
+                for c in addable:
+                    if c.course_code in matching:
+                        s_ok_courses += "{0}: {1}\n".format(c.course_code, c.course_name)
+
+                s_conflict_courses = ""
+                for code, reasons in sorted(blocked.items()):
+                    if code in matching:
+                        s_conflict_courses += "{0}: {1}\n".format(
+                            code, ", ".join(sectype + " " + reason for sectype, reason in reasons.items()))
+
+                print("Can add courses:\n{0}\nConflicting/blocked courses:\n{1}".format(
+                    s_ok_courses, s_conflict_courses))
             elif cmd_split[0] == "view":
                 print(get_course(cmd_split[1]).to_string())
             elif cmd_split[0] in ("sched", "schedule"):
@@ -230,5 +242,3 @@ if __name__ == "__main__":
         except Exception as ex:
             print("[Error] " + str(ex))
             raise
-
-        save_data_to_file(cur_sched, "sched.bin")
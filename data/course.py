@@ -1,25 +1,77 @@
-from time import strptime, strftime, time
-import itertools
+from time import strftime
+import json
+import sys
 
 sectypes = ('LEC', 'TUT', 'PRA')
 section_type_name = {'PRA': "Practicals", "TUT": "Tutorials", "LEC": "Lectures"}
 tt_time_format = "%H:%M"
 disp_time_format = "%I.%M%p"
 
+n_weekday = 5
+
+weekday_tt = {
+    'MO': 0,
+    'TU': 1,
+    'WE': 2,
+    'TH': 3,
+    'FR': 4
+}
+
+# Occupancy bitmasks: each term is a week of mask_day_slots buckets per day, mask_slot_minutes wide.
+# Fall term occupies the low bits and winter term the bits directly above; yearly courses occupy both.
+# Weekends are included so that weekend sections still conflict with each other, even though they are not displayed.
+mask_weekday = dict(weekday_tt, SA=5, SU=6)
+mask_slot_minutes = 5
+mask_day_slots = 24 * 60 // mask_slot_minutes
+mask_term_bits = len(mask_weekday) * mask_day_slots
+
 
 def fmt_time(t):
-    return strftime(disp_time_format, t).lstrip('0').rstrip('M')
+    """
+    :param t: [hour, minute] pair, as in Timeslot.start_time
+    """
+    return strftime(disp_time_format, (1900, 1, 1, t[0], t[1], 0, 0, 1, -1)).lstrip('0').rstrip('M')
 
 
 class Course:
+    __slots__ = ('course_code', 'course_name', 'course_info', 'term', 'enrl_controls', 'course_sections')
+
     def __init__(self, course_code, course_name, course_info, enrl_controls, term, course_sections_dict):
         self.course_code = course_code
         self.course_name = course_name
         self.course_info = course_info
-        self.term = term
+        self.term = sys.intern(term)
         self.enrl_controls = enrl_controls
         self.course_sections = course_sections_dict
 
+        for secs in self.course_sections.values():
+            for sec in secs:
+                sec.set_term(self.term)
+
+    def __getstate__(self):
+        # keys are sorted, the order jsonpickle wrote them in before __slots__, so scraped files stay byte-identical
+        return {
+            'course_code': self.course_code,
+            'course_info': self.course_info,
+            'course_name': self.course_name,
+            'course_sections': self.course_sections,
+            'enrl_controls': self.enrl_controls,
+            'term': self.term
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['course_code'], state['course_name'], state['course_info'], state['enrl_controls'],
+                      state['term'], state['course_sections'])
+
+    def to_string(self):
+        s_out = "{0}: {1} ({2})\n".format(self.course_code, self.course_name, self.term)
+        for sectype in sectypes:
+            if sectype in self.course_sections:
+                s_out += "  " + section_type_name[sectype] + "\n"
+                for sec in self.course_sections[sectype]:
+                    s_out += sec.to_string(indent_spaces=4)
+        return s_out
+
 
 class SingleSection:
     """
@@ -28,11 +80,12 @@ class SingleSection:
             TH 17:00-19:00 DH2020
             FR 12:00-15:00 IB120
     """
+    __slots__ = ('section_id', 'instructors_list', 'notes', 'enrolled_count', 'total_count', 'waitlist_count',
+                 'timeslots', 'is_closed', 'mask', 'index')
 
     def __init__(self, section_id, instructors_list, notes, enrolled_count, total_count, waitlist_count, timeslots):
         self.section_id = section_id
-        self.instructors = ' | '.join(instructors_list) if instructors_list is not None else ""
-        self.instructors_list = instructors_list
+        self.instructors_list = tuple(instructors_list) if instructors_list is not None else ()
         self.notes = notes
         self.enrolled_count = int(enrolled_count)
         self.total_count = int(total_count)
@@ -40,49 +93,209 @@ class SingleSection:
         self.timeslots = timeslots
         self.is_closed = "Closed" in self.notes
 
+        # occupancy over both terms, narrowed down once the term of the owning course is known
+        self.mask = 0
+        # position of this section within its session, see index_sections
+        self.index = None
+        self.set_term(None)
+
+    @property
+    def instructors(self):
+        return ' | '.join(self.instructors_list)
+
+    def set_term(self, term):
+        mask = 0
+        for slot in self.timeslots:
+            slot.term = term
+            mask |= term_mask(slot.mask, term)
+        self.mask = intern_mask(mask)
+
+    def is_conflict(self, other):
+        return (self.mask & other.mask) != 0
+
+    def is_room(self):
+        return self.enrolled_count < self.total_count
+
+    def to_string(self, indent_spaces=0, show_timeslots=True, show_notes=True):
+        s_out = "{0}{1:<9}{2:<30}{3}/{4} ({5})\n".format(' ' * indent_spaces, self.section_id, self.instructors,
+                                                        self.enrolled_count, self.total_count, self.waitlist_count)
+        if show_notes and len(self.notes) > 0:
+            s_out += ' ' * (indent_spaces + 4) + self.notes + '\n'
+        if show_timeslots:
+            for slot in self.timeslots:
+                s_out += slot.to_string(indent_spaces + 4) + '\n'
+        return s_out
+
+    def __getstate__(self):
+        return {
+            'enrolled_count': self.enrolled_count,
+            'instructors': self.instructors,
+            'instructors_list': list(self.instructors_list),
+            'is_closed': self.is_closed,
+            'notes': self.notes,
+            'section_id': self.section_id,
+            'timeslots': self.timeslots,
+            'total_count': self.total_count,
+            'waitlist_count': self.waitlist_count
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['section_id'], state['instructors_list'], state['notes'], state['enrolled_count'],
+                      state['total_count'], state['waitlist_count'], state['timeslots'])
+
 
 class Timeslot:
     """
     Example:
         TH 17:00-19:00 DH2020
 
-        Assumed start_time and end_time are in HH:MM 24-hour format.
+        Assumed start_time and end_time are in HH:MM 24-hour format, or [hour, minute] pairs.
+        They are stored as minutes since midnight in start and end.
         room_name_1 is used if term is F or S.
         room_name_2 is also used if term is Y.
 
         If term is F or S, then room_name_2 has unpredictable value.
     """
+    __slots__ = ('weekday', 'start', 'end', 'room_name_1', 'room_name_2', 'term', 'mask')
 
     def __init__(self, weekday, start_time, end_time, room_name_1, room_name_2):
-        self.weekday = weekday
-        self.start_time = [int(x) for x in start_time.strip().split(':')]
-        self.end_time = [int(x) for x in end_time.strip().split(':')]
-        self.room_name_1 = room_name_1 if room_name_1 is not None else ""
-        self.room_name_2 = room_name_2 if room_name_2 is not None else ""
+        self.weekday = sys.intern(weekday)
+        self.start = to_minutes(start_time)
+        self.end = to_minutes(end_time)
+        # room names repeat across many timeslots, so only one copy of each is kept
+        self.room_name_1 = sys.intern(room_name_1) if room_name_1 is not None else ""
+        self.room_name_2 = sys.intern(room_name_2) if room_name_2 is not None else ""
+
+        # term is set by the owning Course. mask holds the occupied buckets within a single term.
+        self.term = None
+        self.mask = intern_mask(slot_mask(self.weekday, self.start, self.end))
+
+    @property
+    def start_time(self):
+        return [self.start // 60, self.start % 60]
+
+    @property
+    def end_time(self):
+        return [self.end // 60, self.end % 60]
 
     def is_conflict(self, other):
         """
-        This timeslot does not conflict with the other if:
-            - this timeslot starts and ends before or right as the other timeslot starts
-            - this timeslot starts and ends after or right as the other timeslot ends
+        Two timeslots conflict if they take place in a common term and share an occupied bucket.
+        Touching timeslots (one ends right as the other starts) do not conflict.
         """
-        if self.term != other.term:
-            return False
+        return (term_mask(self.mask, self.term) & term_mask(other.mask, other.term)) != 0
+
+    def to_string(self, indent_spaces=0):
+        return "{0}{1} {2:02}:{3:02}-{4:02}:{5:02} {6}".format(' ' * indent_spaces, self.weekday, *self.start_time,
+                                                             *self.end_time, self.room_name_1)
+
+    def __getstate__(self):
+        return {
+            'end_time': self.end_time,
+            'room_name_1': self.room_name_1,
+            'room_name_2': self.room_name_2,
+            'start_time': self.start_time,
+            'weekday': self.weekday
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['weekday'], state['start_time'], state['end_time'], state['room_name_1'],
+                      state['room_name_2'])
+
+
+def to_minutes(t):
+    """
+    Convert a "HH:MM" string or an [hour, minute] pair to minutes since midnight.
+    """
+    if isinstance(t, str):
+        t = t.strip().split(':')
+    return int(t[0]) * 60 + int(t[1])
 
-        if self.weekday != other.weekday:
-            return False
 
-        self_start_time = self.start_time[0] * 60 + self.start_time[1]
-        other_start_time = other.start_time[0] * 60 + other.start_time[1]
-        self_end_time = self.end_time[0] * 60 + self.end_time[1]
-        other_end_time = other.end_time[0] * 60 + other.end_time[1]
+# Many sections share the same time footprint, so equal masks are stored only once.
+# The pool is only needed while a session is being built: the loaders clear it once the courses hold their masks,
+# so that a long-running process that loads session after session does not keep the masks of all of them.
+mask_pool = {}
 
-        # if self.start_time <= other.start_time and self.end_time <= other.start_time:
-        if self_start_time <= other_start_time and self_end_time <= other_end_time:
-            return False
 
-        # if self.start_time >= other.end_time and self.end_time >= other.end_time:
-        if self_start_time >= other_end_time and self_end_time >= other_end_time:
-            return False
+def intern_mask(mask):
+    return mask_pool.setdefault(mask, mask)
 
-        return True
+
+def clear_mask_pool():
+    mask_pool.clear()
+
+
+def slot_mask(weekday, start, end):
+    """
+    Bitmask of the buckets covered by [start, end) on weekday, within a single term.
+    start and end are in minutes since midnight. Partially covered buckets are counted as occupied.
+    """
+    if weekday not in mask_weekday:
+        raise Exception("Invalid weekday " + str(weekday))
+
+    start_slot = start // mask_slot_minutes
+    end_slot = -(-end // mask_slot_minutes)
+    if end_slot <= start_slot:
+        return 0
+
+    return ((1 << (end_slot - start_slot)) - 1) << (mask_weekday[weekday] * mask_day_slots + start_slot)
+
+
+def term_mask(mask, term):
+    """
+    Place a single-term mask into the fall and / or winter half of a two-term mask.
+
+    A term of None (a timeslot or section not attached to a Course yet) is treated as both terms,
+    so that a missing term can never hide a conflict.
+    """
+    if term == 'F':
+        return mask
+    elif term == 'S':
+        return mask << mask_term_bits
+    elif term == 'Y' or term is None:
+        return mask | (mask << mask_term_bits)
+    raise Exception("Invalid term " + str(term))
+
+
+def timeslot_from_dict(d):
+    return Timeslot(d['weekday'], d['start_time'], d['end_time'], d['room_name_1'], d['room_name_2'])
+
+
+def section_from_dict(d):
+    return SingleSection(d['section_id'], d['instructors_list'], d['notes'], d['enrolled_count'],
+                         d['total_count'], d['waitlist_count'], [timeslot_from_dict(t) for t in d['timeslots']])
+
+
+def course_from_dict(d):
+    """
+    Rebuild a Course from the dict form written by the scrapers (jsonpickle with unpicklable=False).
+    """
+    c_sections_dict = {sectype: [section_from_dict(s) for s in secs] for sectype, secs in d['course_sections'].items()}
+    return Course(d['course_code'], d['course_name'], d['course_info'], d['enrl_controls'], d['term'], c_sections_dict)
+
+
+def index_sections(courses):
+    """
+    Number every section of a session in file order (courses, then LEC/TUT/PRA, then listed order).
+
+    :return: list of all sections, where each section is at the position of its index.
+    """
+    all_sections = []
+    for course in courses:
+        for sectype in sectypes:
+            for sec in course.course_sections.get(sectype, ()):
+                sec.index = len(all_sections)
+                all_sections.append(sec)
+    return all_sections
+
+
+def load_courses(filepath):
+    """
+    Load a course_data_<campus>_<session> file as a list of Course objects, with sections indexed.
+    """
+    with open(filepath, 'r', encoding='utf8') as f:
+        courses = [course_from_dict(c) for c in json.load(f)]
+    index_sections(courses)
+    clear_mask_pool()
+    return courses
@@ -0,0 +1,412 @@
+"""
+Binary course data format.
+
+The same data as a course_data_<campus>_<session> JSON file, laid out as fixed-width columns so the file can be
+memory-mapped and read without parsing it first. Every column is a little endian array, and strings are stored once
+in a string table and referenced by id.
+
+File layout:
+    magic       4s      b'TTCB'
+    version     H
+    n_columns   H
+    directory   n_columns * (name 16s, format c, 7 pad bytes, offset Q, count Q)
+    columns     each column starts at an 8-byte aligned offset
+
+Columns:
+    courses:    c_code, c_name, c_info, c_enrl (string ids), c_term (ord of F/S/Y),
+                c_sec_start, c_sec_count (the sections of a course are contiguous)
+    sections:   s_course, s_type (index into sectypes), s_id, s_instr, s_notes (string ids),
+                s_enrolled, s_total, s_waitlist, s_closed, s_slot_start, s_slot_count
+    timeslots:  t_section, t_weekday, t_room1, t_room2 (string ids), t_start, t_end (minutes since midnight)
+    strings:    str_off (n_strings + 1 offsets into str_data), str_data (utf8)
+
+Sections are in index_sections order, so a section's position is also its index.
+
+USAGE: python3 course_bin.py course_data_utm_20199 [course_data_stg_artsci_20199 ...]
+"""
+from array import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from course import *
+
+BIN_MAGIC = b'TTCB'
+BIN_VERSION = 1
+BIN_HEADER = struct.Struct('<4sHH')
+BIN_COLUMN = struct.Struct('<16sc7xQQ')
+
+# separates the entries of instructors_list within a single string
+INSTRUCTOR_SEP = '\x1f'
+
+bin_columns = (
+    ('c_code', 'I'), ('c_name', 'I'), ('c_info', 'I'), ('c_enrl', 'I'), ('c_term', 'B'),
+    ('c_sec_start', 'I'), ('c_sec_count', 'I'),
+    ('s_course', 'I'), ('s_type', 'B'), ('s_id', 'I'), ('s_instr', 'I'), ('s_notes', 'I'),
+    ('s_enrolled', 'i'), ('s_total', 'i'), ('s_waitlist', 'i'), ('s_closed', 'B'),
+    ('s_slot_start', 'I'), ('s_slot_count', 'I'),
+    ('t_section', 'I'), ('t_weekday', 'I'), ('t_room1', 'I'), ('t_room2', 'I'), ('t_start', 'H'), ('t_end', 'H'),
+    ('str_off', 'I'), ('str_data', 'B'),
+)
+
+
+def bin_path(course_data_path):
+    return course_data_path + ".bin"
+
+
+def save_course_bin(filepath, courses):
+    """
+    Write a list of Course objects in the binary format.
+    """
+    if sys.byteorder != 'little':
+        raise Exception("The binary course format is only supported on little endian machines.")
+
+    cols = {name: array(fmt) for name, fmt in bin_columns}
+    string_ids = {}
+    strings = []
+
+    def str_id(s):
+        if s not in string_ids:
+            string_ids[s] = len(strings)
+            strings.append(s)
+        return string_ids[s]
+
+    for course in courses:
+        cols['c_code'].append(str_id(course.course_code))
+        cols['c_name'].append(str_id(course.course_name))
+        cols['c_info'].append(str_id(course.course_info))
+        cols['c_enrl'].append(str_id(course.enrl_controls))
+        cols['c_term'].append(ord(course.term))
+        cols['c_sec_start'].append(len(cols['s_course']))
+
+        for type_idx, sectype in enumerate(sectypes):
+            for sec in course.course_sections.get(sectype, ()):
+                cols['s_course'].append(len(cols['c_code']) - 1)
+                cols['s_type'].append(type_idx)
+                cols['s_id'].append(str_id(sec.section_id))
+                cols['s_instr'].append(str_id(INSTRUCTOR_SEP.join(sec.instructors_list)))
+                cols['s_notes'].append(str_id(sec.notes))
+                cols['s_enrolled'].append(sec.enrolled_count)
+                cols['s_total'].append(sec.total_count)
+                cols['s_waitlist'].append(sec.waitlist_count)
+                cols['s_closed'].append(1 if sec.is_closed else 0)
+                cols['s_slot_start'].append(len(cols['t_section']))
+                cols['s_slot_count'].append(len(sec.timeslots))
+
+                for slot in sec.timeslots:
+                    cols['t_section'].append(len(cols['s_course']) - 1)
+                    cols['t_weekday'].append(str_id(slot.weekday))
+                    cols['t_room1'].append(str_id(slot.room_name_1))
+                    cols['t_room2'].append(str_id(slot.room_name_2))
+                    cols['t_start'].append(slot.start)
+                    cols['t_end'].append(slot.end)
+
+        cols['c_sec_count'].append(len(cols['s_course']) - cols['c_sec_start'][-1])
+
+    str_data = bytearray()
+    for s in strings:
+        cols['str_off'].append(len(str_data))
+        str_data += s.encode('utf8')
+    cols['str_off'].append(len(str_data))
+    cols['str_data'].frombytes(bytes(str_data))
+
+    offset = BIN_HEADER.size + BIN_COLUMN.size * len(bin_columns)
+    directory = []
+    for name, fmt in bin_columns:
+        offset = (offset + 7) // 8 * 8
+        directory.append(BIN_COLUMN.pack(name.encode('ascii'), fmt.encode('ascii'), offset, len(cols[name])))
+        offset += len(cols[name]) * cols[name].itemsize
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filepath)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(BIN_HEADER.pack(BIN_MAGIC, BIN_VERSION, len(bin_columns)))
+            for entry in directory:
+                f.write(entry)
+            for name, fmt in bin_columns:
+                f.write(b'\0' * (-f.tell() % 8))
+                f.write(cols[name].tobytes())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class CourseFile:
+    """
+    Memory-mapped binary course data. Columns are exposed as zero-copy memoryviews, e.g. file.s_enrolled[i].
+
+    Courses can be read through CourseView objects, which only decode the fields that are accessed,
+    or materialized into regular Course objects with CourseView.to_course.
+    """
+
+    def __init__(self, filepath):
+        if sys.byteorder != 'little':
+            raise Exception("The binary course format is only supported on little endian machines.")
+
+        with open(filepath, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_columns = BIN_HEADER.unpack_from(self.mm, 0)
+        if magic != BIN_MAGIC or version != BIN_VERSION:
+            raise Exception("Unsupported binary course file: " + filepath)
+
+        buf = memoryview(self.mm)
+        self.columns = {}
+        for i in range(n_columns):
+            name, fmt, offset, count = BIN_COLUMN.unpack_from(self.mm, BIN_HEADER.size + i * BIN_COLUMN.size)
+            fmt = fmt.decode('ascii')
+            size = struct.calcsize(fmt)
+            self.columns[name.rstrip(b'\0').decode('ascii')] = buf[offset:offset + count * size].cast(fmt)
+
+        for name, column in self.columns.items():
+            setattr(self, name, column)
+
+        self.n_courses = len(self.c_code)
+        self.n_sections = len(self.s_course)
+        self.n_timeslots = len(self.t_section)
+
+    def string(self, str_id):
+        return str(self.str_data[self.str_off[str_id]:self.str_off[str_id + 1]], 'utf8')
+
+    def __len__(self):
+        return self.n_courses
+
+    def __getitem__(self, idx):
+        if idx < 0 or idx >= self.n_courses:
+            raise IndexError(idx)
+        return CourseView(self, idx)
+
+    def __iter__(self):
+        return (CourseView(self, i) for i in range(self.n_courses))
+
+    def course_code(self, idx):
+        return self.string(self.c_code[idx])
+
+    def find(self, code_prefix):
+        """
+        Views of every course whose code starts with code_prefix. Relies on the file being sorted by course code,
+        as written by the scrapers.
+        """
+        codes = _CourseCodes(self)
+        idx = bisect.bisect_left(codes, code_prefix)
+        found = []
+        while idx < self.n_courses and self.course_code(idx).startswith(code_prefix):
+            found.append(CourseView(self, idx))
+            idx += 1
+        return found
+
+    def to_courses(self):
+        """
+        Materialize every course as a Course object, with sections indexed.
+        """
+        courses = [view.to_course() for view in self]
+        index_sections(courses)
+        clear_mask_pool()
+        return courses
+
+    def close(self):
+        for column in self.columns.values():
+            column.release()
+        self.columns = {}
+        self.mm.close()
+
+
+class _CourseCodes:
+    """
+    Sequence of course codes for bisect, decoding only the codes that are probed.
+    """
+
+    def __init__(self, course_file):
+        self.course_file = course_file
+
+    def __len__(self):
+        return self.course_file.n_courses
+
+    def __getitem__(self, idx):
+        return self.course_file.course_code(idx)
+
+
+class CourseView:
+    __slots__ = ('file', 'idx')
+
+    def __init__(self, course_file, idx):
+        self.file = course_file
+        self.idx = idx
+
+    @property
+    def course_code(self):
+        return self.file.string(self.file.c_code[self.idx])
+
+    @property
+    def course_name(self):
+        return self.file.string(self.file.c_name[self.idx])
+
+    @property
+    def course_info(self):
+        return self.file.string(self.file.c_info[self.idx])
+
+    @property
+    def enrl_controls(self):
+        return self.file.string(self.file.c_enrl[self.idx])
+
+    @property
+    def term(self):
+        return chr(self.file.c_term[self.idx])
+
+    @property
+    def course_sections(self):
+        start = self.file.c_sec_start[self.idx]
+        c_sections_dict = {}
+        for sec_idx in range(start, start + self.file.c_sec_count[self.idx]):
+            sectype = sectypes[self.file.s_type[sec_idx]]
+            c_sections_dict.setdefault(sectype, []).append(SectionView(self.file, sec_idx))
+        return c_sections_dict
+
+    def to_course(self):
+        c_sections_dict = {sectype: [sec.to_section() for sec in secs]
+                           for sectype, secs in self.course_sections.items()}
+        return Course(self.course_code, self.course_name, self.course_info, self.enrl_controls, self.term,
+                      c_sections_dict)
+
+
+class SectionView:
+    __slots__ = ('file', 'index')
+
+    def __init__(self, course_file, index):
+        self.file = course_file
+        self.index = index
+
+    @property
+    def section_id(self):
+        return self.file.string(self.file.s_id[self.index])
+
+    @property
+    def instructors_list(self):
+        s = self.file.string(self.file.s_instr[self.index])
+        return s.split(INSTRUCTOR_SEP) if len(s) > 0 else []
+
+    @property
+    def instructors(self):
+        return ' | '.join(self.instructors_list)
+
+    @property
+    def notes(self):
+        return self.file.string(self.file.s_notes[self.index])
+
+    @property
+    def enrolled_count(self):
+        return self.file.s_enrolled[self.index]
+
+    @property
+    def total_count(self):
+        return self.file.s_total[self.index]
+
+    @property
+    def waitlist_count(self):
+        return self.file.s_waitlist[self.index]
+
+    @property
+    def is_closed(self):
+        return self.file.s_closed[self.index] == 1
+
+    @property
+    def timeslots(self):
+        start = self.file.s_slot_start[self.index]
+        return [TimeslotView(self.file, i) for i in range(start, start + self.file.s_slot_count[self.index])]
+
+    def to_section(self):
+        return SingleSection(self.section_id, self.instructors_list, self.notes, self.enrolled_count,
+                             self.total_count, self.waitlist_count, [ts.to_timeslot() for ts in self.timeslots])
+
+
+class TimeslotView:
+    __slots__ = ('file', 'idx')
+
+    def __init__(self, course_file, idx):
+        self.file = course_file
+        self.idx = idx
+
+    @property
+    def weekday(self):
+        return self.file.string(self.file.t_weekday[self.idx])
+
+    @property
+    def start(self):
+        return self.file.t_start[self.idx]
+
+    @property
+    def end(self):
+        return self.file.t_end[self.idx]
+
+    @property
+    def start_time(self):
+        return [self.start // 60, self.start % 60]
+
+    @property
+    def end_time(self):
+        return [self.end // 60, self.end % 60]
+
+    @property
+    def room_name_1(self):
+        return self.file.string(self.file.t_room1[self.idx])
+
+    @property
+    def room_name_2(self):
+        return self.file.string(self.file.t_room2[self.idx])
+
+    def to_timeslot(self):
+        return Timeslot(self.weekday, self.start_time, self.end_time, self.room_name_1, self.room_name_2)
+
+
+def has_current_bin(course_data_path):
+    """
+    :return: True if the binary file exists and was written after the JSON file.
+    """
+    path = bin_path(course_data_path)
+    if not os.path.isfile(path):
+        return False
+    return not os.path.isfile(course_data_path) or os.path.getmtime(path) >= os.path.getmtime(course_data_path)
+
+
+def open_course_data(course_data_path):
+    """
+    Open a session's courses for reading: the memory-mapped CourseFile if the binary file is up to date,
+    otherwise Course objects loaded from JSON. Either way the result is a sequence of objects with the same
+    course / section / timeslot attributes.
+    """
+    if has_current_bin(course_data_path):
+        return CourseFile(bin_path(course_data_path))
+    return load_courses(course_data_path)
+
+
+def load_course_data(course_data_path):
+    """
+    Load a session's courses as Course objects with sections indexed, from the binary file if it is up to date,
+    otherwise from JSON.
+    """
+    if has_current_bin(course_data_path):
+        course_file = CourseFile(bin_path(course_data_path))
+        courses = course_file.to_courses()
+        course_file.close()
+        return courses
+    return load_courses(course_data_path)
+
+
+def convert_course_data(course_data_path):
+    """
+    Convert a course_data_* JSON file into the binary format, saved next to it.
+
+    :return: the number of courses converted.
+    """
+    courses = load_courses(course_data_path)
+    save_course_bin(bin_path(course_data_path), courses)
+    return len(courses)
+
+
+if __name__ == "__main__":
+    for course_data_path in sys.argv[1:]:
+        n = convert_course_data(course_data_path)
+        print("{0}: {1} courses".format(bin_path(course_data_path), n))
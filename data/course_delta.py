@@ -0,0 +1,178 @@
+"""
+Change detection between two scrapes of the same session.
+
+Every course is hashed on its parsed content. When a scraper writes course_data_<campus>_<session>, the courses
+whose hash differs from the previous file are compared section by section, and the difference is written next to
+it as course_data_<campus>_<session>.delta:
+
+    {
+        "base": <fingerprint of the previous file>,
+        "target": <fingerprint of the new file>,
+        "added": [<course>, ...],
+        "removed": [<course code>, ...],
+        "changed": [{"course_code": ..., "fields": {<header field>: <new value>, ...},
+                     "sections": {"added": [[<sectype>, <section>], ...], "removed": [<section id>, ...],
+                                  "changed": [[<sectype>, <section>], ...]},
+                     "order": {<sectype>: [<section id>, ...], ...}}, ...]
+    }
+
+"order" is only present when sections were added or removed, and gives the new order of the sections.
+
+Courses and sections are in the same dict form as the course data file. A client holding the file with
+fingerprint "base" can rebuild the new file with apply_delta, instead of downloading the whole file again.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import jsonpickle
+
+logger = logging.getLogger(__name__)
+
+course_header_fields = ('course_name', 'course_info', 'enrl_controls', 'term')
+
+
+def delta_path(course_data_path):
+    return course_data_path + ".delta"
+
+
+def course_hash(course_dict):
+    return hashlib.sha1(json.dumps(course_dict, sort_keys=True, separators=(',', ':')).encode('utf8')).hexdigest()
+
+
+def courses_fingerprint(hashes):
+    """
+    :param hashes: dict of course code to course hash.
+    """
+    h = hashlib.sha1()
+    for code in sorted(hashes):
+        h.update(code.encode('utf8'))
+        h.update(hashes[code].encode('ascii'))
+    return h.hexdigest()
+
+
+def sections_by_id(course_dict):
+    return {sec['section_id']: (sectype, sec)
+            for sectype, secs in course_dict['course_sections'].items() for sec in secs}
+
+
+def diff_course(old, new):
+    fields = {k: new[k] for k in course_header_fields if old[k] != new[k]}
+
+    old_secs = sections_by_id(old)
+    new_secs = sections_by_id(new)
+
+    sections = {
+        'added': [[sectype, sec] for sec_id, (sectype, sec) in new_secs.items() if sec_id not in old_secs],
+        'removed': [sec_id for sec_id in old_secs if sec_id not in new_secs],
+        'changed': [[sectype, sec] for sec_id, (sectype, sec) in new_secs.items()
+                    if sec_id in old_secs and old_secs[sec_id] != (sectype, sec)]
+    }
+
+    change = {'course_code': new['course_code'], 'fields': fields, 'sections': sections}
+    if len(sections['added']) > 0 or len(sections['removed']) > 0:
+        change['order'] = {sectype: [sec['section_id'] for sec in secs]
+                           for sectype, secs in new['course_sections'].items()}
+    return change
+
+
+def compute_delta(old_courses, new_courses):
+    """
+    :param old_courses: list of courses in dict form, from the previous file.
+    :param new_courses: list of courses in dict form.
+    """
+    old_by_code = {c['course_code']: c for c in old_courses}
+    new_by_code = {c['course_code']: c for c in new_courses}
+    old_hashes = {code: course_hash(c) for code, c in old_by_code.items()}
+    new_hashes = {code: course_hash(c) for code, c in new_by_code.items()}
+
+    return {
+        'base': courses_fingerprint(old_hashes),
+        'target': courses_fingerprint(new_hashes),
+        'added': [c for code, c in new_by_code.items() if code not in old_by_code],
+        'removed': [code for code in old_by_code if code not in new_by_code],
+        'changed': [diff_course(old_by_code[code], c) for code, c in new_by_code.items()
+                    if code in old_by_code and old_hashes[code] != new_hashes[code]]
+    }
+
+
+def apply_delta(old_courses, delta):
+    """
+    Rebuild the new list of courses (in dict form, sorted by course code) from the previous one and a delta.
+    """
+    by_code = {c['course_code']: c for c in old_courses}
+
+    if courses_fingerprint({code: course_hash(c) for code, c in by_code.items()}) != delta['base']:
+        raise Exception("The delta does not apply to these courses.")
+
+    for code in delta['removed']:
+        del by_code[code]
+
+    for c in delta['added']:
+        by_code[c['course_code']] = c
+
+    for change in delta['changed']:
+        course = json.loads(json.dumps(by_code[change['course_code']]))
+        course.update(change['fields'])
+
+        c_sections = course['course_sections']
+        for sectype in c_sections:
+            c_sections[sectype] = [sec for sec in c_sections[sectype]
+                                   if sec['section_id'] not in change['sections']['removed']]
+
+        for sectype, sec in change['sections']['changed']:
+            c_sections[sectype] = [sec if s['section_id'] == sec['section_id'] else s for s in c_sections[sectype]]
+
+        for sectype, sec in change['sections']['added']:
+            c_sections.setdefault(sectype, []).append(sec)
+
+        if 'order' in change:
+            c_sections = {sectype: sorted(c_sections[sectype], key=lambda s: ids.index(s['section_id']))
+                          for sectype, ids in change['order'].items()}
+        course['course_sections'] = c_sections
+        by_code[change['course_code']] = course
+
+    if courses_fingerprint({code: course_hash(c) for code, c in by_code.items()}) != delta['target']:
+        raise Exception("Applying the delta did not give the expected courses.")
+
+    return [by_code[code] for code in sorted(by_code)]
+
+
+def save_course_data(filepath, course_list, compressOutput=False):
+    """
+    Write a scraped list of Course objects, together with a delta against the previously written file if there is one.
+
+    The new data is written first. If the delta cannot be computed, e.g. because the previous file is corrupt or in an
+    older format, that is logged and any older delta is removed, but the new data is kept.
+    """
+    openFunc = gzip.open if compressOutput else open
+    encoded = jsonpickle.encode(course_list, unpicklable=False)
+
+    # only read here, and decoded once the new data is safely written
+    old_data = None
+    if os.path.isfile(filepath):
+        with open(filepath, 'rb') as f:
+            old_data = f.read()
+
+    with openFunc(filepath, 'wb') as f:
+        f.write(str.encode(encoded, encoding='utf8'))
+
+    if old_data is None:
+        return
+
+    try:
+        if compressOutput:
+            old_data = gzip.decompress(old_data)
+        delta = compute_delta(json.loads(old_data.decode('utf8')), json.loads(encoded))
+    except Exception:
+        logger.exception("%s: could not compute the changes since the previous scrape", filepath)
+        # a delta left from an earlier scrape does not lead to the new file
+        if os.path.isfile(delta_path(filepath)):
+            os.remove(delta_path(filepath))
+        return
+
+    print("{0}: {1} added, {2} removed, {3} changed courses".format(
+        filepath, len(delta['added']), len(delta['removed']), len(delta['changed'])))
+    with openFunc(delta_path(filepath), 'wb') as f:
+        f.write(str.encode(json.dumps(delta), encoding='utf8'))
@@ -0,0 +1,90 @@
+"""
+Lookup structures for a loaded set of courses.
+
+    - course codes are kept sorted, so every course starting with a prefix is found by bisection.
+    - every 3-character substring (trigram) of each course code and name maps to the courses containing it,
+      so a keyword search only has to check the courses that contain all trigrams of the keyword.
+
+Search results are the same as checking every course with "keyword in course_code or keyword in course_name".
+"""
+import bisect
+
+NGRAM_LEN = 3
+
+
+def ngrams(text):
+    return set(text[i:i + NGRAM_LEN] for i in range(len(text) - NGRAM_LEN + 1))
+
+
+class CourseIndex:
+    def __init__(self, courses):
+        """
+        :param courses: Course objects, possibly from several sessions. They are not modified.
+        """
+        self.courses = sorted(courses, key=lambda c: c.course_code)
+        self.codes = [c.course_code for c in self.courses]
+
+        # trigram -> set of positions in self.courses
+        self.postings = {}
+        for pos, course in enumerate(self.courses):
+            for gram in ngrams(course.course_code) | ngrams(course.course_name):
+                if gram not in self.postings:
+                    self.postings[gram] = set()
+                self.postings[gram].add(pos)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def find_prefix(self, prefix):
+        """
+        :return: every course whose code starts with prefix, sorted by course code.
+        """
+        start = bisect.bisect_left(self.codes, prefix)
+        end = start
+        while end < len(self.codes) and self.codes[end].startswith(prefix):
+            end += 1
+        return self.courses[start:end]
+
+    def get_course(self, prefix):
+        """
+        :return: the only course whose code starts with prefix. Raises an exception if there is not exactly one.
+        """
+        search_result = self.find_prefix(prefix)
+
+        if len(search_result) == 0:
+            raise Exception("No match found.")
+        elif len(search_result) > 1:
+            raise Exception("More than one match found.")
+
+        return search_result[0]
+
+    def candidates(self, keyword):
+        """
+        :return: positions of the courses that may contain keyword, or None if every course may contain it.
+        """
+        if len(keyword) < NGRAM_LEN:
+            return None
+
+        found = None
+        for gram in sorted(ngrams(keyword), key=lambda g: len(self.postings.get(g, ()))):
+            found = set(self.postings.get(gram, ())) if found is None else found & self.postings.get(gram, set())
+            if len(found) == 0:
+                break
+        return found
+
+    def search(self, *keywords):
+        """
+        :return: every course with a code or name containing each of the keywords, sorted by course code.
+        """
+        positions = None
+        for keyword in sorted(keywords, key=len, reverse=True):
+            found = self.candidates(keyword)
+            if found is not None:
+                positions = found if positions is None else positions & found
+
+        if positions is None:
+            courses = self.courses
+        else:
+            courses = [self.courses[pos] for pos in sorted(positions)]
+
+        return [c for c in courses if all(q in c.course_code or q in c.course_name for q in keywords)]
@@ -0,0 +1,145 @@
+"""
+Streaming reader for course_data_<campus>_<session> files.
+
+The file is read in chunks and each course is decoded from the top-level array as soon as it is complete, so only
+one course is held in memory at a time. The filters are applied to the decoded dict, so no Course / SingleSection /
+Timeslot objects are built for courses that are filtered out.
+
+With lazy=True, stream_courses yields LazyCourse objects, which keep the decoded section dicts of the course and only
+build its SingleSection and Timeslot objects when course_sections is first read. Each course is still decoded once,
+by json's C decoder; what is saved is building the objects and their occupancy masks, about 40% of the time of
+streaming a whole file, for the courses whose sections are never read. The dicts take about twice the memory of the
+objects, so a list of LazyCourses is larger than a list of Courses until their sections are read.
+
+Sections are not indexed (see index_sections), since that needs the whole session.
+"""
+import codecs
+import gzip
+import json
+import re
+import sys
+from course import *
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+campus_digits = {'STG': '1', 'UTSC': '3', 'UTM': '5'}
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+def iter_course_dicts(filepath, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yield the decoded dict of each course in the file, in file order.
+    Gzip compressed files are also accepted.
+    """
+    with open(filepath, 'rb') as f:
+        is_gzip = f.read(2) == b'\x1f\x8b'
+
+    with (gzip.open if is_gzip else open)(filepath, 'rb') as f:
+        utf8 = codecs.getincrementaldecoder('utf8')()
+        buf = ''
+        pos = 0
+        started = False
+        eof = False
+
+        while True:
+            pos = _whitespace.match(buf, pos).end()
+            if pos < len(buf):
+                c = buf[pos]
+                if not started:
+                    if c != '[':
+                        raise Exception("Expected a list of courses: " + filepath)
+                    started = True
+                    pos += 1
+                    continue
+                if c == ',':
+                    pos += 1
+                    continue
+                if c == ']':
+                    return
+                try:
+                    course_dict, end = _decoder.raw_decode(buf, pos)
+                    yield course_dict
+                    pos = end
+                    continue
+                except json.JSONDecodeError:
+                    pass  # the course continues in the next chunk
+
+            if eof:
+                raise Exception("Unexpected end of file: " + filepath)
+            chunk = f.read(chunk_size)
+            eof = len(chunk) == 0
+            buf = buf[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
+
+
+class LazyCourse:
+    """
+    A course whose sections are only built when course_sections is first read.
+    Until then only the header fields and the decoded dicts of the sections are kept.
+    """
+    __slots__ = ('course_code', 'course_name', 'course_info', 'term', 'enrl_controls', '_section_dicts', '_sections')
+
+    def __init__(self, course_dict):
+        self.course_code = course_dict['course_code']
+        self.course_name = course_dict['course_name']
+        self.course_info = course_dict['course_info']
+        self.term = sys.intern(course_dict['term'])
+        self.enrl_controls = course_dict['enrl_controls']
+        self._section_dicts = course_dict['course_sections']
+        self._sections = None
+
+    @property
+    def course_sections(self):
+        if self._sections is None:
+            self._sections = {sectype: [section_from_dict(s) for s in secs]
+                              for sectype, secs in self._section_dicts.items()}
+            for secs in self._sections.values():
+                for sec in secs:
+                    sec.set_term(self.term)
+            self._section_dicts = None
+            # the sections are built one course at a time, long after stream_courses has cleared the pool
+            clear_mask_pool()
+        return self._sections
+
+    def to_course(self):
+        return Course(self.course_code, self.course_name, self.course_info, self.enrl_controls, self.term,
+                      self.course_sections)
+
+    def to_string(self):
+        return self.to_course().to_string()
+
+
+def course_filter(campus=None, term=None, prefix=None):
+    """
+    :param campus: campus name ('UTM', 'STG', 'UTSC') or campus digit of the course code ('5', '1', '3').
+    :param term: 'F', 'S' or 'Y'.
+    :param prefix: start of the course code, e.g. 'CSC' or 'CSC1'.
+    :return: predicate on courses in dict form.
+    """
+    digit = campus_digits.get(campus, campus)
+
+    def predicate(header):
+        code = header['course_code']
+        return ((digit is None or code[7:8] == digit) and
+                (term is None or header['term'] == term) and
+                (prefix is None or code.startswith(prefix)))
+
+    return predicate
+
+
+def stream_courses(filepath, campus=None, term=None, prefix=None, lazy=False):
+    """
+    Yield the courses of a course_data_<campus>_<session> file one at a time as Course objects, optionally filtered.
+
+    :param lazy: yield LazyCourse objects instead, whose sections are only built when they are first read.
+    """
+    predicate = course_filter(campus, term, prefix)
+    try:
+        for course_dict in iter_course_dicts(filepath):
+            if not predicate(course_dict):
+                continue
+            yield LazyCourse(course_dict) if lazy else course_from_dict(course_dict)
+    finally:
+        clear_mask_pool()
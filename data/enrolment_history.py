@@ -0,0 +1,349 @@
+"""
+Enrolment history of a session, built up from repeated scrapes.
+
+Each scrape appends one frame to course_data_<campus>_<session>.history with the enrolled count, capacity and
+waitlist of every section at that time. Frames are only ever appended, and each is compressed on its own:
+
+File layout, repeated once per frame:
+    magic       4s      b'TTEH'
+    time        q       seconds since the epoch
+    n_sections  I
+    flags       B       FRAME_KEYS if the frame lists its sections
+    length      I       length of the compressed payload
+    payload     zlib of:
+                    if FRAME_KEYS: key_length I, then "<course code> <section type> <section id>" lines (utf8)
+                    enrolled, capacity, waitlist: n_sections little endian int32 each
+
+A frame only lists its sections when they differ from the frame before it, and otherwise has the same sections in
+the same order. Counts are stored as the change since the frame before (0 for new sections), so a section whose
+counts did not change between scrapes compresses to almost nothing.
+
+A frame cut off by a crash is ignored when reading, and overwritten by the next frame appended.
+
+The last frame is also saved on its own to course_data_<campus>_<session>.history.last, as b'TTEL', the length of the
+history file (Q), then the frame with its sections listed and its counts stored as they are. Appending a frame only
+reads that file, unless the history file no longer has that length, in which case every frame is decoded instead.
+
+USAGE: python3 enrolment_history.py course_data_utm_20199 CSC108H5F [LEC0101]
+    prints the fill rate of the course's lectures (or of one section) at every scrape, and when it may be full.
+       python3 enrolment_history.py record course_data_utm_20199 [course_data_utm_20199 ...]
+    appends the current course data, timed by the file's modification time, e.g. to add scrapes from before.
+"""
+from array import array
+from datetime import datetime
+from operator import add, sub
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from course import *
+from course_stream import stream_courses
+from time import time as now
+
+HISTORY_MAGIC = b'TTEH'
+FRAME_HEADER = struct.Struct('<4sqIBI')
+FRAME_KEYS = 1
+
+LAST_MAGIC = b'TTEL'
+LAST_HEADER = struct.Struct('<4sQ')
+
+# number of the latest frames that time_until_full fits the enrolment trend to
+DEFAULT_TREND_FRAMES = 12
+
+
+def history_path(course_data_path):
+    return course_data_path + ".history"
+
+
+def last_frame_path(filepath):
+    return filepath + ".last"
+
+
+def empty_counts():
+    return array('i'), array('i'), array('i')
+
+
+def section_counts(courses):
+    """
+    :return: (list of (course code, section type, section id) of every section in file order, counts), where counts
+        are the enrolled, capacity and waitlist arrays in the same order. A section listed more than once, such as
+        a course that a scrape found on two pages, keeps only its first counts, since frames are read back as a
+        dict of key -> position.
+    """
+    keys = []
+    seen = set()
+    counts = empty_counts()
+    for course in courses:
+        for sectype in sectypes:
+            for sec in course.course_sections.get(sectype, ()):
+                key = (course.course_code, sectype, sec.section_id)
+                if key in seen:
+                    continue
+                seen.add(key)
+                keys.append(key)
+                counts[0].append(sec.enrolled_count)
+                counts[1].append(sec.total_count)
+                counts[2].append(sec.waitlist_count)
+    return keys, counts
+
+
+def encode_frame(t, keys, counts, prev_keys, prev_counts, level=9):
+    """
+    :param keys: list of the (course code, section type, section id) of each position in counts.
+    :param prev_keys: keys dict of the frame before, which the counts are stored as changes from.
+    :param level: zlib compression level of the payload.
+    :return: the frame, header included.
+    """
+    flags = 0
+    payload = b''
+    if len(prev_keys) == len(keys) and all(prev_keys.get(key) == i for i, key in enumerate(keys)):
+        deltas = [array('i', map(sub, column, prev_column)) for column, prev_column in zip(counts, prev_counts)]
+    else:
+        flags |= FRAME_KEYS
+        key_text = '\n'.join(' '.join(key) for key in keys).encode('utf8')
+        payload += struct.pack('<I', len(key_text)) + key_text
+        positions = [prev_keys.get(key) for key in keys]
+        deltas = [array('i', (v - (prev_column[j] if j is not None else 0) for j, v in zip(positions, column)))
+                  for column, prev_column in zip(counts, prev_counts)]
+
+    payload = zlib.compress(payload + b''.join(d.tobytes() for d in deltas), level)
+    return FRAME_HEADER.pack(HISTORY_MAGIC, t, len(keys), flags, len(payload)) + payload
+
+
+def decode_frames(data, filepath):
+    """
+    Yield (end, (time, keys, enrolled, capacity, waitlist)) for every complete frame in data, where end is the offset
+    just after the frame. A frame that was cut off ends the frames.
+    """
+    keys = {}
+    counts = empty_counts()
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        magic, t, n, flags, length = FRAME_HEADER.unpack_from(data, offset)
+        if magic != HISTORY_MAGIC:
+            raise Exception("Unsupported enrolment history file: " + filepath)
+        if offset + FRAME_HEADER.size + length > len(data):
+            break
+
+        payload = zlib.decompress(data[offset + FRAME_HEADER.size:offset + FRAME_HEADER.size + length])
+        pos = 0
+        if flags & FRAME_KEYS:
+            key_length, = struct.unpack_from('<I', payload, 0)
+            lines = payload[4:4 + key_length].decode('utf8').split('\n') if key_length > 0 else []
+            new_keys = {tuple(line.split(' ', 2)): i for i, line in enumerate(lines)}
+            pos = 4 + key_length
+
+            # carry the counts of sections that were already listed over to their new positions
+            positions = [keys.get(key) for key in new_keys]
+            counts = tuple(array('i', (prev_column[j] if j is not None else 0 for j in positions))
+                           for prev_column in counts)
+            keys = new_keys
+
+        if len(keys) != n:
+            raise Exception("Corrupt enrolment history file: " + filepath)
+
+        deltas = []
+        for _ in counts:
+            column = array('i')
+            column.frombytes(payload[pos:pos + 4 * n])
+            deltas.append(column)
+            pos += 4 * n
+        counts = tuple(array('i', map(add, column, delta)) for column, delta in zip(counts, deltas))
+
+        offset += FRAME_HEADER.size + length
+        yield offset, (t, keys) + counts
+
+
+class EnrolmentHistory:
+    """
+    The frames of a history file. Each frame is (time, keys, enrolled, capacity, waitlist), where keys is a dict of
+    (course code, section type, section id) -> position in the count arrays. Frames with the same sections share the
+    same keys dict.
+
+    The frames are decoded each time they are read, and only the readers go through all of them. The counts of the
+    last frame are also saved on their own, to <history file>.last, so that appending a frame only reads that file.
+    """
+
+    def __init__(self, filepath):
+        if sys.byteorder != 'little':
+            raise Exception("The enrolment history format is only supported on little endian machines.")
+        self.filepath = filepath
+
+    def read(self):
+        if not os.path.isfile(self.filepath):
+            return b''
+        with open(self.filepath, 'rb') as f:
+            return f.read()
+
+    def frames(self):
+        """
+        Yield every frame, oldest first.
+        """
+        for end, frame in decode_frames(self.read(), self.filepath):
+            yield frame
+
+    def __len__(self):
+        """
+        :return: the number of complete frames, read from the frame headers only.
+        """
+        if not os.path.isfile(self.filepath):
+            return 0
+        n = 0
+        with open(self.filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+            while offset + FRAME_HEADER.size <= size:
+                f.seek(offset)
+                magic, t, n_sections, flags, length = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+                if magic != HISTORY_MAGIC:
+                    raise Exception("Unsupported enrolment history file: " + self.filepath)
+                offset += FRAME_HEADER.size + length
+                if offset > size:
+                    break
+                n += 1
+        return n
+
+    def last_frame(self):
+        """
+        :return: (end of the last complete frame, last frame), or (0, None) if there is none. Read from the .last file
+            if it was saved with the history as it is, otherwise by decoding every frame.
+        """
+        try:
+            with open(last_frame_path(self.filepath), 'rb') as f:
+                data = f.read()
+            magic, end = LAST_HEADER.unpack_from(data, 0)
+            if magic == LAST_MAGIC and end == os.path.getsize(self.filepath):
+                for _, frame in decode_frames(data[LAST_HEADER.size:], last_frame_path(self.filepath)):
+                    return end, frame
+        except (OSError, struct.error):
+            pass
+
+        end, frame = 0, None
+        for end, frame in decode_frames(self.read(), self.filepath):
+            pass
+        return end, frame
+
+    def save_last_frame(self, end, t, keys, counts):
+        """
+        Save the counts of the last frame, stored against no frame, and the end of the history file they belong to.
+        """
+        path = last_frame_path(self.filepath)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(LAST_HEADER.pack(LAST_MAGIC, end))
+                # rewritten on every append and only read back by the next, so it is compressed quickly
+                f.write(encode_frame(t, keys, counts, {}, empty_counts(), level=1))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def append(self, courses, t=None):
+        """
+        Append the current counts of every section of courses as a new frame, timed t (seconds since the epoch),
+        or now if t is None.
+        """
+        t = int(now() if t is None else t)
+
+        keys, counts = section_counts(courses)
+        end, last = self.last_frame()
+        if last is not None:
+            prev_t, prev_keys, *prev_counts = last
+        else:
+            prev_keys, prev_counts = {}, empty_counts()
+        frame = encode_frame(t, keys, counts, prev_keys, prev_counts)
+
+        with open(self.filepath, 'r+b' if os.path.isfile(self.filepath) else 'wb') as f:
+            # drop a frame that was cut off, if there is one
+            f.seek(end)
+            f.truncate()
+            f.write(frame)
+            end = f.tell()
+
+        self.save_last_frame(end, t, keys, counts)
+
+    def series(self, course_code, section_id=None, sectype='LEC'):
+        """
+        :param section_id: the section to follow. If None, the counts of all sections of sectype in the course are
+            added up.
+        :return: list of (time, enrolled, capacity, waitlist), one for every frame that has the section or course.
+        """
+        result = []
+        for t, keys, enrolled, capacity, waitlist in self.frames():
+            if section_id is not None:
+                positions = [keys[key] for key in ((course_code, section_id[:3], section_id),) if key in keys]
+            else:
+                positions = [i for key, i in keys.items() if key[0] == course_code and key[1] == sectype]
+            if len(positions) > 0:
+                result.append((t, sum(enrolled[i] for i in positions), sum(capacity[i] for i in positions),
+                               sum(waitlist[i] for i in positions)))
+        return result
+
+    def fill_rate(self, course_code, section_id=None, sectype='LEC'):
+        """
+        :return: list of (time, enrolled / capacity), see series. The fill rate is 0 while the capacity is 0.
+        """
+        return [(t, enrolled / capacity if capacity > 0 else 0)
+                for t, enrolled, capacity, waitlist in self.series(course_code, section_id, sectype)]
+
+    def time_until_full(self, course_code, section_id=None, sectype='LEC', n_frames=DEFAULT_TREND_FRAMES):
+        """
+        Estimate when the section (or the course's sections of sectype) will be full, by fitting a straight line
+        to the enrolled counts of the latest n_frames frames.
+
+        :return: seconds from the latest frame until it is full, 0 if it is already full, or None if the enrolment
+            is not going up or there are fewer than two frames.
+        """
+        points = self.series(course_code, section_id, sectype)[-n_frames:]
+        if len(points) == 0:
+            return None
+
+        t_last, enrolled, capacity, waitlist = points[-1]
+        if enrolled >= capacity:
+            return 0
+        if len(points) < 2:
+            return None
+
+        t_mean = sum(p[0] for p in points) / len(points)
+        e_mean = sum(p[1] for p in points) / len(points)
+        var = sum((p[0] - t_mean) ** 2 for p in points)
+        if var == 0:
+            return None
+        slope = sum((p[0] - t_mean) * (p[1] - e_mean) for p in points) / var
+        if slope <= 0:
+            return None
+        return (capacity - enrolled) / slope
+
+
+def record_history(course_data_path, t=None):
+    """
+    Append the courses of a course data file to its history.
+
+    :return: the number of frames in the history.
+    """
+    history = EnrolmentHistory(history_path(course_data_path))
+    history.append(list(stream_courses(course_data_path)), t)
+    return len(history)
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "record":
+        for course_data_path in sys.argv[2:]:
+            n = record_history(course_data_path, os.path.getmtime(course_data_path))
+            print("{0}: {1} scrapes".format(history_path(course_data_path), n))
+        exit()
+
+    history = EnrolmentHistory(history_path(sys.argv[1]))
+    course_code = sys.argv[2]
+    section_id = sys.argv[3] if len(sys.argv) > 3 else None
+
+    for t, enrolled, capacity, waitlist in history.series(course_code, section_id):
+        print("{0}  {1}/{2} ({3})".format(datetime.fromtimestamp(t), enrolled, capacity, waitlist))
+
+    seconds = history.time_until_full(course_code, section_id)
+    if seconds is None:
+        print("Not filling up.")
+    else:
+        print("Full in {0:.1f} hours.".format(seconds / 3600))
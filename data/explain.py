@@ -0,0 +1,182 @@
+"""
+Explain why a set of courses cannot be arranged into a timetable.
+
+A conflict set is a minimal set of courses with no conflict-free timetable: removing any one course of it
+leaves a set that can be arranged. A removal set is a minimal set of courses whose removal leaves a set that
+can be arranged. Every removal set contains at least one course of every conflict set, and the other way around.
+
+Both are found together with the MARCO algorithm, on subsets of courses stored as bitmasks:
+    - pick a subset ("seed") that is not known to contain a conflict set or to be contained in an arrangeable set.
+    - if it can be arranged, grow it one course at a time into a maximal arrangeable set; the rest is a removal set.
+    - otherwise shrink it one course at a time into a conflict set.
+
+The solver is only run on the seeds and while growing and shrinking, which is a few runs per set found instead
+of one for each of the 2^n subsets. Whether a subset can be arranged is also answered without the solver when it
+contains a known conflict set, or lies within a known arrangeable set. Single courses and pairs are checked first,
+since most conflicts come from two courses whose sections always clash.
+
+USAGE: python3 explain.py course_data_utm_20199 CSC108H5F MAT135H5F ...
+"""
+import itertools
+import sys
+from course import *
+from solver import build_matrix
+
+
+def bits(mask):
+    """
+    :return: positions of the set bits of mask, lowest first.
+    """
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+
+class Explainer:
+    def __init__(self, courses, ignore_closed=True):
+        """
+        :param courses: list of Course objects that were requested together.
+        :param ignore_closed: leave out sections that are marked as closed, as in solver.find_schedules.
+        """
+        self.courses = list(courses)
+        self.ignore_closed = ignore_closed
+        self.full = (1 << len(self.courses)) - 1
+
+        self.n_solves = 0
+        self.sat_cache = {}
+
+        # conflict sets (MUS) and maximal arrangeable sets (MSS) found so far
+        self.unsat_cores = []
+        self.max_sat = []
+
+    def courses_of(self, mask):
+        return [self.courses[i] for i in bits(mask)]
+
+    def is_feasible(self, mask):
+        """
+        :return: True if the courses in mask can be arranged into a conflict-free timetable.
+        """
+        if mask in self.sat_cache:
+            return self.sat_cache[mask]
+
+        if any(core & mask == core for core in self.unsat_cores):
+            result = False
+        elif any(mask & sat == mask for sat in self.max_sat):
+            result = True
+        else:
+            self.n_solves += 1
+            matrix = build_matrix(self.courses_of(mask), self.ignore_closed, collapse=True)
+            result = next(matrix.solve(), None) is not None
+
+        self.sat_cache[mask] = result
+        return result
+
+    def add_core(self, core):
+        if core not in self.unsat_cores:
+            self.unsat_cores.append(core)
+
+    def find_small_cores(self):
+        """
+        Find the conflict sets of one or two courses.
+        """
+        n = len(self.courses)
+        for i in range(n):
+            if not self.is_feasible(1 << i):
+                self.add_core(1 << i)
+
+        for i in range(n):
+            for j in range(i + 1, n):
+                pair = (1 << i) | (1 << j)
+                if not any(core & pair == core for core in self.unsat_cores) and not self.is_feasible(pair):
+                    self.add_core(pair)
+
+    def shrink(self, mask):
+        """
+        Shrink an unarrangeable set into a conflict set.
+        """
+        for i in bits(mask):
+            if not self.is_feasible(mask & ~(1 << i)):
+                mask &= ~(1 << i)
+        return mask
+
+    def grow(self, mask):
+        """
+        Grow an arrangeable set into a maximal arrangeable set.
+        """
+        for i in bits(self.full & ~mask):
+            if self.is_feasible(mask | (1 << i)):
+                mask |= 1 << i
+        return mask
+
+    def next_seed(self):
+        """
+        :return: a largest subset that neither contains a known conflict set nor lies within a known maximal
+            arrangeable set, or None if every subset is accounted for.
+        """
+        # only the known sets are checked here, no subset is solved
+        for size in range(len(self.courses), 0, -1):
+            for positions in itertools.combinations(range(len(self.courses)), size):
+                mask = sum(1 << i for i in positions)
+                if any(core & mask == core for core in self.unsat_cores):
+                    continue
+                if any(mask & sat == mask for sat in self.max_sat):
+                    continue
+                return mask
+        return None
+
+    def explain(self):
+        """
+        :return: (list of conflict sets, list of removal sets), each a list of lists of courses, smallest first.
+        """
+        self.find_small_cores()
+
+        while True:
+            seed = self.next_seed()
+            if seed is None:
+                break
+            if self.is_feasible(seed):
+                self.max_sat.append(self.grow(seed))
+            else:
+                self.add_core(self.shrink(seed))
+
+        conflict_sets = sorted(self.unsat_cores, key=lambda m: (bin(m).count('1'), m))
+        removal_sets = sorted((self.full & ~sat for sat in self.max_sat), key=lambda m: (bin(m).count('1'), m))
+        return [self.courses_of(m) for m in conflict_sets], [self.courses_of(m) for m in removal_sets if m]
+
+
+def explain_infeasible(courses, ignore_closed=True):
+    """
+    Find out which courses cannot be taken together, and which courses to remove so that the rest can be arranged.
+
+    :return: (list of conflict sets, list of removal sets), each a list of lists of courses, smallest first.
+        Both are empty if the courses can be arranged.
+    """
+    return Explainer(courses, ignore_closed).explain()
+
+
+def smallest_removal_sets(courses, ignore_closed=True):
+    """
+    :return: the removal sets with the fewest courses.
+    """
+    removal_sets = explain_infeasible(courses, ignore_closed)[1]
+    return [r for r in removal_sets if len(r) == len(removal_sets[0])]
+
+
+if __name__ == "__main__":
+    course_data_path = sys.argv[1]
+    by_code = {course.course_code: course for course in load_courses(course_data_path)}
+    chosen = [by_code[code] for code in sys.argv[2:]]
+
+    conflict_sets, removal_sets = explain_infeasible(chosen)
+    if len(conflict_sets) == 0:
+        print("These courses can be arranged.")
+    else:
+        print("Courses that cannot be taken together:")
+        for courses in conflict_sets:
+            print("    " + " ".join(c.course_code for c in courses))
+        print("Remove one of:")
+        for courses in removal_sets:
+            print("    " + " ".join(c.course_code for c in courses))
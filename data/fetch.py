@@ -0,0 +1,132 @@
+"""
+HTTP fetching shared by the scrapers.
+
+All requests go through one pooled requests.Session, which retries connection errors and 429/5xx responses
+with exponential backoff. Once the retries of a 429/5xx response run out, the last response is returned to fetch,
+which raises requests.HTTPError for it like for any other unsuccessful response. fetch_all downloads a list of pages concurrently over that session.
+
+When a page is fetched into a cache file, its ETag / Last-Modified validators are remembered in FETCH_CACHE_FILE,
+and the next fetch is a conditional request that reuses the cache file if the server answers 304 Not Modified.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import tempfile
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+FETCH_TIMEOUT = (10, 120)  # (connect, read) seconds
+FETCH_RETRIES = 4
+FETCH_BACKOFF = 1.0  # sleeps 0, 2, 4, 8... seconds between retries
+FETCH_WORKERS = 8
+
+FETCH_CACHE_FILE = "fetch_cache.json"
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+_validators_lock = threading.Lock()
+
+
+def make_session(retries=FETCH_RETRIES, backoff=FETCH_BACKOFF, pool_size=FETCH_WORKERS):
+    # raise_on_status=False hands the last response back instead of raising RetryError, see fetch
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=('GET',), raise_on_status=False)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def load_validators():
+    if not os.path.isfile(FETCH_CACHE_FILE):
+        return {}
+    with open(FETCH_CACHE_FILE, 'r') as f:
+        return json.load(f)
+
+
+def save_validator(url, validator):
+    with _validators_lock:
+        validators = load_validators()
+        if validator:
+            validators[url] = validator
+        else:
+            validators.pop(url, None)
+
+        # a private temporary file, so scrapers running side by side cannot write into each other's
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(FETCH_CACHE_FILE)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(validators, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, FETCH_CACHE_FILE)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def fetch(url, session=None, timeout=FETCH_TIMEOUT, cache_file=None):
+    """
+    :param cache_file: if given, the body is also saved to this file, and later fetches of the same url
+        only download the page again if the server reports that it has changed.
+    :return: the body of the response. Raises requests.HTTPError if the final response is not successful, also when
+        it was retried, and requests.ConnectionError if the server could not be reached within the retries.
+    """
+    headers = {}
+    if cache_file is not None and os.path.isfile(cache_file):
+        with _validators_lock:
+            validator = load_validators().get(url, {})
+        if 'etag' in validator:
+            headers['If-None-Match'] = validator['etag']
+        if 'last_modified' in validator:
+            headers['If-Modified-Since'] = validator['last_modified']
+
+    r = (session or get_session()).get(url, timeout=timeout, headers=headers)
+    r.raise_for_status()
+
+    if cache_file is None:
+        return r.content
+
+    if r.status_code == 304:
+        logger.info("Not modified: %s", url)
+        with open(cache_file, 'rb') as f:
+            return f.read()
+
+    with open(cache_file, 'wb') as f:
+        f.write(r.content)
+
+    validator = {}
+    if 'ETag' in r.headers:
+        validator['etag'] = r.headers['ETag']
+    if 'Last-Modified' in r.headers:
+        validator['last_modified'] = r.headers['Last-Modified']
+    save_validator(url, validator)
+
+    return r.content
+
+
+def fetch_all(urls, session=None, max_workers=FETCH_WORKERS, cache_files=None):
+    """
+    Fetch every url concurrently.
+
+    :param cache_files: optional list with a cache file for each url, see fetch.
+    :return: list of response bodies, in the same order as urls.
+    """
+    session = session or get_session()
+    cache_files = cache_files or [None] * len(urls)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda url, cache_file: fetch(url, session, cache_file=cache_file),
+                                 urls, cache_files))
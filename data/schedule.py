@@ -1,41 +1,152 @@
-from time import strptime, strftime, time
-from copy import deepcopy
 from course import *
-
-n_weekday = 5
-
-weekday_tt = {
-    'MO': 0,
-    'TU': 1,
-    'WE': 2,
-    'TH': 3,
-    'FR': 4
-}
+from availability import OPEN, status_names, section_status
 
 weekday_disp = {
     0: 'MON',
     1: 'TUE',
     2: 'WED',
     3: 'THU',
-    4: 'FRI'
+    4: 'FRI',
+    5: 'SAT',
+    6: 'SUN'
 }
 
+# the weekly lists have a day for every weekday of the occupancy masks. Weekends are only displayed when they have
+# classes, but their timeslots are still listed, so that their conflicts can be reported like any other.
+n_sched_days = len(mask_weekday)
+
+class SectionCheck:
+    """
+    Result of checking one section against a schedule.
+
+    conflicts is a list of (position in section.timeslots, (Course, SingleSection, TimeSlot) of the schedule) pairs,
+    left empty if the section is not open.
+    """
+    __slots__ = ('course', 'sectype', 'section', 'status', 'conflicts')
+
+    def __init__(self, course, sectype, section, status, conflicts):
+        self.course = course
+        self.sectype = sectype
+        self.section = section
+        self.status = status
+        self.conflicts = conflicts
+
+    @property
+    def ok(self):
+        return self.status == OPEN and len(self.conflicts) == 0
+
+    def to_string(self):
+        s_parts = [self.section.to_string(indent_spaces=4, show_timeslots=False, show_notes=False).split('\n')[0]]
+        if self.status != OPEN:
+            s_parts.append("(" + status_names[self.status] + ")")
+        s_parts.append('\n')
+
+        conflicts = dict(self.conflicts)
+        for i, slot in enumerate(self.section.timeslots):
+            s_parts.append(slot.to_string(indent_spaces=8))
+            if i in conflicts:
+                cst = conflicts[i]
+                s_parts.append(" conflict with {0:<9} {1:<7} {2}".format(cst[0].course_code, cst[1].section_id,
+                                                                         cst[2].to_string()))
+            elif self.status == OPEN:
+                s_parts.append(" (no conflict)")
+            s_parts.append('\n')
+        return ''.join(s_parts)
+
+
+class AddCheck:
+    """
+    Result of checking a course against a schedule: whether it can be added, and a SectionCheck for every section
+    that was checked. The report is only rendered when to_string is called.
+    """
+    __slots__ = ('course', 'ok', 'sections', 'listing')
+
+    def __init__(self, course, ok, sections, listing):
+        """
+        :param listing: render the report as a listing of the course, with the sections that can be added first.
+        """
+        self.course = course
+        self.ok = ok
+        self.sections = sections
+        self.listing = listing
+
+    def conflicts(self):
+        """
+        :return: list of (section, timeslot, (Course, SingleSection, TimeSlot) of the schedule) for every conflict.
+        """
+        return [(check.section, check.section.timeslots[i], cst)
+                for check in self.sections for i, cst in check.conflicts]
+
+    def to_string(self):
+        if not self.listing:
+            return self.course.course_code + "\n" + ''.join(check.to_string() for check in self.sections) + "\n"
+
+        return (self.course.course_code + ": " + self.course.course_name + "\n"
+                + ''.join(check.to_string() for check in self.sections if check.ok)
+                + ''.join(check.to_string() for check in self.sections if not check.ok))
+
+
 class Schedule:
-    def __init__(self):
+    def __init__(self, availability=None):
         # LTP stands for LEC-TUT-PRA tuple.
         self.course_ltp_list = []
 
+        # optional AvailabilityIndex of the session, used to look up whether sections are open by section index.
+        self.availability = availability
+
+        # OR of the occupancy masks of every section in the schedule, kept up to date by add_course and rm_course.
+        # a section can be added without conflict exactly when its mask does not overlap it, which takes one AND
+        # however many sections are scheduled.
+        self.occupancy = 0
+        # buckets covered by more than one scheduled section (which add_course allows), as bucket -> number of sections
+        # beyond the first, and their bits, so that rm_course only clears the buckets no other section covers.
+        self.overlaps = {}
+        self.overlap_bits = 0
+
         # this is a list where each element is another list of (Course, SingleSection, TimeSlot) tuples, sorted by starting time.
-        self.wk_sched_F = None
-        self.wk_sched_S = None
+        # kept up to date by add_course and rm_course. Y course timeslots are in both terms.
+        self.wk_sched_F = [list() for i in range(n_sched_days)]
+        self.wk_sched_S = [list() for i in range(n_sched_days)]
 
     def make_copy(self):
-        new_sched = Schedule()
+        new_sched = Schedule(self.availability)
         new_sched.course_ltp_list = list(self.course_ltp_list)
-        #n ew_sched.wk_sched_F = list(self.wk_sched_F)
-        # new_sched.wk_sched_S = list(self.wk_sched_S)
+        new_sched.occupancy = self.occupancy
+        new_sched.overlaps = dict(self.overlaps)
+        new_sched.overlap_bits = self.overlap_bits
+        new_sched.wk_sched_F = [list(day) for day in self.wk_sched_F]
+        new_sched.wk_sched_S = [list(day) for day in self.wk_sched_S]
         return new_sched
 
+    def section_status(self, sec):
+        if self.availability is not None:
+            return self.availability.section_status(sec)
+        return section_status(sec)
+
+    def term_scheds(self, term):
+        """
+        :return: the weekly schedules a timeslot of the given term appears in.
+        """
+        if term == 'F':
+            return (self.wk_sched_F,)
+        elif term == 'S':
+            return (self.wk_sched_S,)
+        return (self.wk_sched_F, self.wk_sched_S)
+
+    def find_conflict(self, slotOther):
+        """
+        :return: the (Course, SingleSection, TimeSlot) tuple of the first scheduled timeslot on the same day
+            that conflicts with slotOther, or None if there is none.
+        """
+        if term_mask(slotOther.mask, slotOther.term) & self.occupancy == 0:
+            return None
+
+        for wk_sched in self.term_scheds(slotOther.term):
+            for cst in wk_sched[mask_weekday[slotOther.weekday]]:
+                if cst[2].is_conflict(slotOther):
+                    return cst
+        return None
+
     def add_course(self, course: Course, lec_sec, tut_sec=None, pra_sec=None):
         """
         csd = course.course_sections_dict
@@ -61,8 +172,47 @@ class Schedule:
                                      course.get_section('PRA', pra_sec_name)))
         """
         self.course_ltp_list.append((course, lec_sec, tut_sec, pra_sec))
+
+        for section in (lec_sec, tut_sec, pra_sec):
+            if section is None:
+                continue
+            self.add_occupancy(section.mask)
+            for timeslot in section.timeslots:
+                for wk_sched in self.term_scheds(timeslot.term):
+                    day = wk_sched[mask_weekday[timeslot.weekday]]
+                    i = len(day)
+                    while i > 0 and day[i - 1][2].start > timeslot.start:
+                        i -= 1
+                    day.insert(i, (course, section, timeslot))
         return True
 
+    def add_occupancy(self, mask):
+        m = self.occupancy & mask
+        while m:
+            low = m & -m
+            bucket = low.bit_length() - 1
+            self.overlaps[bucket] = self.overlaps.get(bucket, 0) + 1
+            self.overlap_bits |= low
+            m ^= low
+        self.occupancy |= mask
+
+    def rm_occupancy(self, mask):
+        """
+        Take the mask of a removed section out of the occupancy, in time proportional to its overlaps with the other
+        sections rather than to the size of the schedule.
+        """
+        shared = mask & self.overlap_bits
+        m = shared
+        while m:
+            low = m & -m
+            bucket = low.bit_length() - 1
+            self.overlaps[bucket] -= 1
+            if self.overlaps[bucket] == 0:
+                del self.overlaps[bucket]
+                self.overlap_bits ^= low
+            m ^= low
+        self.occupancy &= ~(mask & ~shared)
+
     def rm_course(self, course: Course):
         crs_idx = -1
         for i in range(len(self.course_ltp_list)):
@@ -73,195 +223,121 @@ class Schedule:
         if crs_idx == -1:
             return False
         else:
-            self.course_ltp_list.pop(crs_idx)
+            course_ltp = self.course_ltp_list.pop(crs_idx)
+
+            for section in course_ltp[1:]:
+                if section is None:
+                    continue
+                self.rm_occupancy(section.mask)
+                for timeslot in section.timeslots:
+                    for wk_sched in self.term_scheds(timeslot.term):
+                        day = wk_sched[mask_weekday[timeslot.weekday]]
+                        day[:] = [cst for cst in day if cst[0] is not course_ltp[0]]
             return True
 
-    def check_add_course_sections(self, courseOther: Course, *sectionsOther, ignore_full_closed=False):
+    def section_check(self, course, sectype, sec, check_status=True):
         """
-
-        :param courseOther:
-        :param sectionsOther:
-        :return:
+        :param check_status: if False, treat the section as open even if it is full or closed.
+        :return: SectionCheck of adding sec. Conflicts are only looked for if the section is open.
         """
-        csd = courseOther.course_sections_dict
-
-        s_out = courseOther.course_code + "\n"
-
-        sectionConflictFound = False
-
-        for secOther in filter(lambda s: s is not None, sectionsOther):
-            s_this = ""
-            s_this += secOther.to_string(indent_spaces=4, show_timeslots=False).split('\n')[0]
-            if not ignore_full_closed:
-                if not secOther.is_room():
-                    s_this += "(full)"
-                    sectionConflictFound = True
-                elif secOther.is_closed():
-                    s_this += "(closed)"
-                    sectionConflictFound = True
-
-            s_this += '\n'
-
-            for slotOther in secOther.timeslots:
-                s_this += slotOther.to_string(indent_spaces=8) + " "
-                slotConflictFound = False
-                for course_ltp in self.course_ltp_list:
-                    courseThis = self.course_ltp_list[0][0]
-                    for secThis in course_ltp[1:]:
-                        if secThis is None:
-                            continue
-
-                        for slotThis in secThis.timeslots:
-                            # slotThis, slotOther
-                            if slotThis.is_conflict(slotOther):
-                                s_this += "conflict with {0:<9} {1:<7} {2}".format(courseThis.course_code, secThis.section_id, slotThis.to_string())
-                                slotConflictFound = True
-                                break
-
-                        if slotConflictFound:
-                            break
-                    if slotConflictFound:
-                        break
-
-                if not slotConflictFound:
-                    s_this += '(no conflict)'
-                else:
-                    sectionConflictFound = True
-                s_this += '\n'
-
-            s_out += s_this
-
-        s_out += "\n"
+        status = self.section_status(sec) if check_status else OPEN
+        conflicts = []
+        # only look for the conflicting timeslots if the section overlaps the schedule at all
+        if status == OPEN and sec.mask & self.occupancy != 0:
+            for i, slot in enumerate(sec.timeslots):
+                cst = self.find_conflict(slot)
+                if cst is not None:
+                    conflicts.append((i, cst))
+        return SectionCheck(course, sectype, sec, status, conflicts)
+
+    def can_add_course_sections(self, courseOther: Course, *sectionsOther, ignore_full_closed=False):
+        """
+        Same as check_course_sections(...).ok, without finding out what is in the way.
+        """
+        for secOther in sectionsOther:
+            if secOther is None:
+                continue
+            if not ignore_full_closed and self.section_status(secOther) != OPEN:
+                return False
+            if secOther.mask & self.occupancy != 0:
+                return False
+        return True
 
-        return (not sectionConflictFound, s_out)
+    def check_course_sections(self, courseOther: Course, *sectionsOther, ignore_full_closed=False):
+        """
+        Check adding the given sections of a course. None sections are skipped.
 
+        :param ignore_full_closed: allow sections that are full or closed.
+        :return: AddCheck, ok if none of the sections conflicts with the schedule (or is full or closed).
+        """
+        checks = [self.section_check(courseOther, secOther.section_id[:3], secOther, not ignore_full_closed)
+                  for secOther in sectionsOther if secOther is not None]
+        return AddCheck(courseOther, all(check.ok for check in checks), checks, listing=False)
 
-    def check_add_course(self, courseOther: Course):
+    def check_add_course_sections(self, courseOther: Course, *sectionsOther, ignore_full_closed=False):
         """
-        A course can be added if there is a non-conflicting LEC section that is open.
+        :return: tuple of (can add, report string), see check_course_sections.
+        """
+        result = self.check_course_sections(courseOther, *sectionsOther, ignore_full_closed=ignore_full_closed)
+        return (result.ok, result.to_string())
 
-        Cases of conflict:
+    def can_add_course(self, courseOther: Course):
+        """
+        Same as check_course(...).ok, without finding out what is in the way.
+        """
+        for sectype in sectypes:
+            if sectype in courseOther.course_sections:
+                if not any(sec.mask & self.occupancy == 0 and self.section_status(sec) == OPEN
+                           for sec in courseOther.course_sections[sectype]):
+                    return False
+        return True
 
-        Any of below:
+    def check_course(self, courseOther: Course):
+        """
+        A course can be added if, for each of its section types, there is an open section that does not conflict
+        with the schedule. Cases of conflict, any of below:
         1. All LEC sections are either conflict or full.
         2. All TUT sections are either conflict or full.
         3. All PRA sections are either conflict or full.
 
-        Display conflict reason
-
-        Open Spots:
-
+        :return: AddCheck with every section of the course. Its report lists the sections that can be added first:
 
-        All Conflicted or Full:
-        MAT324
-            LEC102  60/60 (15)
-                TH 17:00-19:00 DH2020    conflict with CSC324 LEC101 FR 5:00p - 7:00p
-                FR 19:00-21:00 IB120
-            TUT104 4:00p - 5:30p  15/60        conflict with CSC324 LEC101 5:00p - 7:00p
-
-
-        Return the tuple of (is_conflict, report_string)
+        MAT324H5S: Topics in Geometry
+            LEC0102  Sanders, T.                   60/60 (15)(full)
+                TH 17:00-19:00 DH 2020
+            TUT0104                                15/60 (0)
+                TH 16:00-17:30 IB 120 conflict with CSC324H5S LEC0101 TH 17:00-19:00 DH 2010
         """
-        
-        csd = courseOther.course_sections
-
-        #assert("LEC" in csd)
-        #assert(len(csd["LEC"]) > 0)
-
-        conflic = { 'LEC': False, 'TUT': False, 'PRA': False }
-
-        s_ok_secs = ""
-        s_conflict_secs = ""
-
+        checks = []
+        ok = True
         for sectype in sectypes:
-            if sectype in csd:
-                secTypeAllConflicting = True
-                for secOther in csd[sectype]:
-
-                    s_this = ""
-                    s_this += secOther.to_string(indent_spaces=4, show_timeslots=False, show_notes=False).split('\n')[0]
-
-                    sectionConflictFound = False
-
-                    if not secOther.is_room():
-                        s_this += "(full)"
-                        sectionConflictFound = True
-                    elif secOther.is_closed():
-                        s_this += "(closed)"
-                        sectionConflictFound = True
-
-                    s_this += '\n'
-                    slotConflictFound = False
-                    for slotOther in secOther.timeslots:
-                        s_this += slotOther.to_string(indent_spaces=8) + " "
-
-                        for course_ltp in self.course_ltp_list:
-                            courseThis = course_ltp[0]
-                            for secThis in course_ltp[1:]:
-                                if secThis is None:
-                                    continue
-                                # secThis: part-of-schedule Section
-                                # courseThis: part-of-schedule Course
-                                # secOther: add-to-schedule Section
-                                # courseOther: add-to-schedule Course
-                                for slotThis in secThis.timeslots:
-                                    # slotThis, slotOther
-                                    if slotThis.is_conflict(slotOther):
-                                        s_this += "conflict with {0:<9} {1:<7} {2}".format(courseThis.course_code, secThis.section_id, slotThis.to_string())
-                                        slotConflictFound = True
-                                        break
-
-                                if slotConflictFound:
-                                    break
-                            if slotConflictFound:
-                                break
-
-                    if not slotConflictFound:
-                        s_this += '(no conflict)'
-                    else:
-                        sectionConflictFound = True
-                    s_this += '\n'
-
-                if not sectionConflictFound:
-                    secTypeAllConflicting = False
-                    s_ok_secs += s_this
-                else:
-                    s_conflict_secs += s_this
-
-
-                conflic[sectype] = secTypeAllConflicting
-
-        s_out = courseOther.course_code + ": " + courseOther.course_name + "\n" + s_ok_secs + s_conflict_secs
-
-        return ((not any(conflic[sec] for sec in sectypes)), s_out)
+            if sectype in courseOther.course_sections:
+                type_checks = [self.section_check(courseOther, sectype, secOther)
+                               for secOther in courseOther.course_sections[sectype]]
+                ok = ok and any(check.ok for check in type_checks)
+                checks += type_checks
+        return AddCheck(courseOther, ok, checks, listing=True)
 
+    def check_add_course(self, courseOther: Course):
+        """
+        :return: tuple of (can add, report string), see check_course.
+        """
+        result = self.check_course(courseOther)
+        return (result.ok, result.to_string())
 
     def build_wcs_list(self):
-        # this is a list where each element is another list of (Course, SingleSection, TimeSlot) tuples, sorted by section starting time.
-        self.wk_sched_F = [list() for i in range(n_weekday)]
-        self.wk_sched_S = [list() for i in range(n_weekday)]
-
-        # parse ltp sections into list
-        for course_ltp in self.course_ltp_list:
-            course = course_ltp[0]
-            for section in course_ltp[1:]:
-                if section is None:
-                    continue
-                for timeslot in section.timeslots:
-                    idx = weekday_tt[timeslot.weekday]
-                    term = timeslot.term
-                    if term == 'F':
-                        self.wk_sched_F[idx].append((course, section, timeslot))
-                    elif term == 'S':
-                        self.wk_sched_S[idx].append((course, section, timeslot))
-
-
-        # sort each day by start time
-        for day in self.wk_sched_F:
-            day.sort(key=lambda cst: cst[2].start_time)
+        """
+        Rebuild occupancy, wk_sched_F and wk_sched_S from course_ltp_list, e.g. after course_ltp_list was changed directly.
+        add_course and rm_course keep them up to date otherwise.
+        """
+        course_ltp_list = self.course_ltp_list
+        self.course_ltp_list = []
+        self.occupancy = 0
+        self.wk_sched_F = [list() for i in range(n_sched_days)]
+        self.wk_sched_S = [list() for i in range(n_sched_days)]
 
-        for day in self.wk_sched_S:
-            day.sort(key=lambda cst: cst[2].start_time)
+        for course_ltp in course_ltp_list:
+            self.add_course(*course_ltp)
 
     def to_string(self, ltp_header=False):
         """
@@ -279,8 +355,6 @@ class Schedule:
 
         FRI
         """
-        self.build_wcs_list()
-
         s_out = ""
 
         if ltp_header:
@@ -293,7 +367,9 @@ class Schedule:
         def appending(wk_sched):
             s_out2 = ""
 
-            for w in range(n_weekday):
+            for w in range(n_sched_days):
+                if w >= n_weekday and len(wk_sched[w]) == 0:
+                    continue
                 s_out2 += weekday_disp[w] + '\n'
 
                 for cst in wk_sched[w]:
@@ -307,7 +383,7 @@ class Schedule:
                         ),
                                                                               course.course_code,
                                                                               section.section_id,
-                                                                              timeslot.room_name,
+                                                                              timeslot.room_name_1,
                                                                               section.instructors)
 
                 s_out2 += "\n"
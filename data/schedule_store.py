@@ -0,0 +1,160 @@
+"""
+Persistent schedules, saved as the course codes and section ids they are made of.
+
+A schedule file is a journal of JSON lines. The first line names the course data the schedule was made from:
+    {"course_data": "course_data_utm_20199"}
+and every following line is one change to the schedule:
+    {"op": "add", "course": "CSC108H5F", "sections": ["LEC0101", "PRA0101"]}
+    {"op": "rm", "course": "CSC108H5F"}
+
+Each add_course or rm_course appends one line, so saving after a command does not depend on the size of the schedule.
+Once the journal holds more than max_journal changes beyond the courses in the schedule, it is rewritten to one add
+per course. The rewrite goes to a temporary file that replaces the journal, so a crash leaves either file whole.
+
+On load, the changes are replayed against the loaded courses. A course or section that is no longer in the course
+data is left out of the schedule and listed in ScheduleStore.missing.
+
+USAGE: python3 schedule_store.py course_data_utm_20199 sched.jsonl
+    prints the saved schedule.
+"""
+import json
+import os
+import sys
+import tempfile
+from course import *
+from course_bin import load_course_data
+from schedule import Schedule
+
+DEFAULT_MAX_JOURNAL = 200
+
+
+def session_name(course_data_path):
+    return os.path.basename(course_data_path)
+
+
+class ScheduleStore:
+    def __init__(self, filepath, course_data_path, max_journal=DEFAULT_MAX_JOURNAL):
+        """
+        :param course_data_path: course data file the schedule is made from. Only its file name is saved.
+        :param max_journal: number of changes the journal may hold beyond one add per course before it is rewritten.
+        """
+        self.filepath = filepath
+        self.session = session_name(course_data_path)
+        self.max_journal = max_journal
+
+        # (course code, section id or None) of the saved entries that could not be found on load
+        self.missing = []
+        self.n_lines = 0
+
+    def load(self, courses):
+        """
+        :param courses: the loaded Course objects of the session.
+        :return: the saved Schedule, or an empty one if nothing was saved yet.
+            Raises an exception if the schedule was saved for a different session.
+        """
+        by_code = {course.course_code: course for course in courses}
+        sched = Schedule()
+        self.missing = []
+        self.n_lines = 0
+
+        if not os.path.isfile(self.filepath):
+            self._rewrite(sched)
+            return sched
+
+        saved = {}
+        truncated = False
+        with open(self.filepath, 'r', encoding='utf8') as f:
+            header = json.loads(f.readline())
+            if header.get('course_data') != self.session:
+                raise Exception("{0} was saved for {1}, not {2}.".format(
+                    self.filepath, header.get('course_data'), self.session))
+
+            for line in f:
+                if not line.endswith('\n'):
+                    # the last change was cut off while being written
+                    truncated = True
+                    break
+                entry = json.loads(line)
+                if entry['op'] == 'add':
+                    saved[entry['course']] = entry['sections']
+                elif entry['op'] == 'rm':
+                    saved.pop(entry['course'], None)
+                self.n_lines += 1
+
+        for code, sec_ids in saved.items():
+            course = by_code.get(code)
+            if course is None:
+                self.missing.append((code, None))
+                continue
+
+            chosen = {}
+            for sec_id in sec_ids:
+                sec = self._find_section(course, sec_id)
+                if sec is None:
+                    self.missing.append((code, sec_id))
+                else:
+                    chosen[sec_id[:3]] = sec
+            if len(chosen) == len(sec_ids):
+                sched.add_course(course, chosen.get('LEC'), chosen.get('TUT'), chosen.get('PRA'))
+
+        if truncated or self.missing or self.n_lines > len(sched.course_ltp_list) + self.max_journal:
+            self._rewrite(sched)
+        return sched
+
+    @staticmethod
+    def _find_section(course, sec_id):
+        for sec in course.course_sections.get(sec_id[:3], ()):
+            if sec.section_id == sec_id:
+                return sec
+        return None
+
+    def add_course(self, sched, course, *sections):
+        """
+        Add the course to sched, and save the change.
+        """
+        sched.add_course(course, *sections)
+        self._append(sched, {'op': 'add', 'course': course.course_code,
+                             'sections': [sec.section_id for sec in sections if sec is not None]})
+
+    def rm_course(self, sched, course):
+        """
+        Remove the course from sched, and save the change.
+
+        :return: False if the course was not in sched.
+        """
+        if not sched.rm_course(course):
+            return False
+        self._append(sched, {'op': 'rm', 'course': course.course_code})
+        return True
+
+    def _append(self, sched, entry):
+        if self.n_lines >= len(sched.course_ltp_list) + self.max_journal:
+            self._rewrite(sched)
+            return
+
+        with open(self.filepath, 'a', encoding='utf8') as f:
+            f.write(json.dumps(entry) + '\n')
+        self.n_lines += 1
+
+    def _rewrite(self, sched):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.filepath)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf8') as f:
+                f.write(json.dumps({'course_data': self.session}) + '\n')
+                for cltp in sched.course_ltp_list:
+                    f.write(json.dumps({'op': 'add', 'course': cltp[0].course_code,
+                                        'sections': [sec.section_id for sec in cltp[1:] if sec is not None]}) + '\n')
+            os.replace(tmp_path, self.filepath)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.n_lines = len(sched.course_ltp_list)
+
+
+if __name__ == "__main__":
+    course_data_path = sys.argv[1]
+    store = ScheduleStore(sys.argv[2], course_data_path)
+    sched = store.load(load_course_data(course_data_path))
+    for code, sec_id in store.missing:
+        print("Not found: {0} {1}".format(code, sec_id or ""))
+    print(sched.to_string(ltp_header=True))
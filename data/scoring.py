@@ -0,0 +1,222 @@
+"""
+Scoring of schedules by timetable preferences.
+
+A metric measures one property of a Schedule, such as the number of days on campus or the minutes of gaps
+between classes. Most metrics are read straight off the schedule's occupancy mask (see Schedule.occupancy):
+the mask is cut into one bitmask per day and term, and counting or locating set bits in those gives the
+occupied minutes, the first and last class, and so on, without going through the timeslots.
+
+A preference is a dict of metric name -> weight, and the score of a schedule is the weighted sum of its metrics.
+Higher scores are better, so metrics to be kept low get negative weights.
+
+USAGE: python3 scoring.py course_data_utm_20199 short_days CSC108H5F MAT135H5F ...
+    prints the 5 best schedules of the given courses for a preference in preference_weights,
+    found with solver.find_best_schedules.
+"""
+import heapq
+import re
+import sys
+from course import *
+from schedule import *
+
+day_bits = (1 << mask_day_slots) - 1
+
+
+def window_mask(start, end):
+    """
+    :return: mask of the buckets within a single day covering [start, end), in minutes since midnight.
+    """
+    return ((1 << (end // mask_slot_minutes)) - 1) ^ ((1 << (start // mask_slot_minutes)) - 1)
+
+
+morning_window = window_mask(0, 12 * 60)
+afternoon_window = window_mask(12 * 60, 17 * 60)
+evening_window = window_mask(17 * 60, 24 * 60)
+
+
+def bit_count(mask):
+    return bin(mask).count('1')
+
+
+def day_masks(occupancy):
+    """
+    :return: list of the occupied buckets of each day of the week, weekends included, for the fall term then the
+        winter term.
+    """
+    return [(occupancy >> (term * mask_term_bits + day * mask_day_slots)) & day_bits
+            for term in range(2) for day in range(n_sched_days)]
+
+
+def first_minute(day):
+    return ((day & -day).bit_length() - 1) * mask_slot_minutes
+
+
+def last_minute(day):
+    return day.bit_length() * mask_slot_minutes
+
+
+def days_on_campus(sched, days):
+    return sum(1 for day in days if day)
+
+
+def total_span(sched, days):
+    """
+    Minutes from the start of the first class to the end of the last class, summed over all days.
+    """
+    return sum(last_minute(day) - first_minute(day) for day in days if day)
+
+
+def gap_minutes(sched, days):
+    """
+    Minutes without class between the first and last class, summed over all days.
+    """
+    return sum(last_minute(day) - first_minute(day) - bit_count(day) * mask_slot_minutes for day in days if day)
+
+
+def earliest_start(sched, days):
+    return min((first_minute(day) for day in days if day), default=24 * 60)
+
+
+def latest_end(sched, days):
+    return max((last_minute(day) for day in days if day), default=0)
+
+
+def morning_minutes(sched, days):
+    return sum(bit_count(day & morning_window) for day in days) * mask_slot_minutes
+
+
+def afternoon_minutes(sched, days):
+    return sum(bit_count(day & afternoon_window) for day in days) * mask_slot_minutes
+
+
+def evening_minutes(sched, days):
+    return sum(bit_count(day & evening_window) for day in days) * mask_slot_minutes
+
+
+def building(room_name):
+    """
+    :return: building code of a room, e.g. 'MN' for 'MN 1270', or None if the room is unknown.
+    """
+    m = re.match(r'[A-Za-z]+', room_name)
+    return m.group().upper() if m else None
+
+
+def building_changes(sched, days):
+    """
+    Number of times two classes in a row on the same day are in different buildings, as a proxy for walking distance.
+    """
+    changes = 0
+    for wk_sched in (sched.wk_sched_F, sched.wk_sched_S):
+        for day in wk_sched:
+            buildings = [b for b in (building(cst[2].room_name_1) for cst in day) if b is not None]
+            changes += sum(1 for b1, b2 in zip(buildings, buildings[1:]) if b1 != b2)
+    return changes
+
+
+class Metric:
+    def __init__(self, func, monotone, lowest, highest, by_time=True):
+        """
+        :param func: function of (Schedule, day_masks) returning a number.
+        :param monotone: 1 if the metric can only grow as sections are added to a schedule, -1 if it can only shrink,
+            0 if it can go either way.
+        :param lowest: lowest possible value.
+        :param highest: highest possible value.
+        :param by_time: True if the value only depends on the times of the classes, i.e. on the occupancy mask.
+        """
+        self.func = func
+        self.monotone = monotone
+        self.lowest = lowest
+        self.highest = highest
+        self.by_time = by_time
+
+
+n_days = 2 * n_sched_days
+metrics = {
+    'days_on_campus': Metric(days_on_campus, 1, 0, n_days),
+    'total_span': Metric(total_span, 1, 0, n_days * 24 * 60),
+    'gap_minutes': Metric(gap_minutes, 0, 0, n_days * 24 * 60),
+    'earliest_start': Metric(earliest_start, -1, 0, 24 * 60),
+    'latest_end': Metric(latest_end, 1, 0, 24 * 60),
+    'morning_minutes': Metric(morning_minutes, 1, 0, n_days * 12 * 60),
+    'afternoon_minutes': Metric(afternoon_minutes, 1, 0, n_days * 5 * 60),
+    'evening_minutes': Metric(evening_minutes, 1, 0, n_days * 7 * 60),
+    # inserting a class between two others never removes a change of building
+    'building_changes': Metric(building_changes, 1, 0, n_days * mask_day_slots, by_time=False),
+}
+
+# the preferences offered by the website (see src/components/schedule.tsx), and a few more
+preference_weights = {
+    'morning': {'evening_minutes': -2, 'afternoon_minutes': -1},
+    'noon': {'morning_minutes': -1, 'evening_minutes': -1},
+    'evening': {'morning_minutes': -2, 'afternoon_minutes': -1},
+    'short_days': {'total_span': -1},
+    'free_days': {'days_on_campus': -600, 'gap_minutes': -1},
+    'compact': {'gap_minutes': -1, 'building_changes': -30},
+}
+
+# used when a request or wishlist does not name a preference or a number of schedules
+DEFAULT_PREFERENCE = 'compact'
+DEFAULT_K = 5
+
+
+def make_scorer(weights):
+    """
+    :param weights: dict of metric name -> weight.
+    :return: function returning the score of a Schedule.
+    """
+    weighted = [(metrics[name].func, weight) for name, weight in weights.items()]
+
+    def score(sched):
+        days = day_masks(sched.occupancy)
+        return sum(weight * func(sched, days) for func, weight in weighted)
+
+    return score
+
+
+def make_bound(weights):
+    """
+    :param weights: dict of metric name -> weight.
+    :return: function returning, for a partial Schedule, an upper bound on the score of every schedule
+        that can be made by adding more sections to it.
+    """
+    weighted = []
+    rest = 0
+    for name, weight in weights.items():
+        metric = metrics[name]
+        if metric.monotone * weight < 0:
+            # the metric only moves against the weight from here, so its current value is the best it can do
+            weighted.append((metric.func, weight))
+        else:
+            rest += weight * (metric.highest if weight > 0 else metric.lowest)
+
+    def bound(sched):
+        days = day_masks(sched.occupancy)
+        return rest + sum(weight * func(sched, days) for func, weight in weighted)
+
+    return bound
+
+
+def top_k(schedules, k, weights):
+    """
+    Pick the k best schedules, holding no more than k of them at a time.
+
+    :param schedules: iterable of Schedule objects, e.g. the generator returned by solver.find_schedules.
+    :param weights: dict of metric name -> weight.
+    :return: list of (score, Schedule), best first. Schedules with equal scores keep their order.
+    """
+    score = make_scorer(weights)
+    best = heapq.nlargest(k, ((score(sched), -i, sched) for i, sched in enumerate(schedules)))
+    return [(s, sched) for s, i, sched in best]
+
+
+if __name__ == "__main__":
+    from solver import find_best_schedules
+
+    course_data_path = sys.argv[1]
+    weights = preference_weights[sys.argv[2]]
+    by_code = {course.course_code: course for course in load_courses(course_data_path)}
+    chosen = [by_code[code] for code in sys.argv[3:]]
+
+    for s, sched in find_best_schedules(chosen, 5, weights):
+        print("score: {0}".format(s))
+        print(sched.to_string(ltp_header=True))
@@ -1,50 +1,73 @@
 from scrape_courses_utm import scrape_utm
 from scrape_courses_stg import scrape_stg_artsci
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import sys
-import os
-
-if (len(sys.argv) == 1):
-    print("scrape_all.py [session_id] [campus] [compress]")
-    print("[session_id] is the year + 9 for fall/winter and 5 for summer courses")
-    print("e.g. 20199 is 2019 fall/winter, while 20195 is 2019 summer.")
-    print("")
-    print("[campuses] is either nothing or one or more of the supported campuses:")
-    print("UTM, STG_ARTSCI")
-    print("To scrape all campuses, don't pass in any value for [campus].")
-    print("Example command: scrape_all.py 20199")
-    print("Example command 2: scrape_all.py 20199 UTM STG_ARTSCI")
-    print("")
-    print("To re-parse already existing data, pass in 'local' as an argument.")
-    exit()
-
-session = sys.argv[1]
-
-# convert each input argument into lower case
-rest_args = set(x.lower() for x in sys.argv[2:])
-# if none of the campuses were specified, then scrape all campuses
-ALL = len(rest_args.intersection(set(('utm', 'stg_artsci', 'utsc')))) == 0
-
-UTM = 'utm' in rest_args
-STG_ARTSCI = 'stg_artsci' in rest_args
-
-LOCAL = 'local' in rest_args
-COMPRESS = 'compress' in rest_args
-
-has_scraped = False
-
-if ALL or UTM:
-    print("--- scrape utm courses ---")
-    scrape_utm(session, LOCAL, compressOutput=COMPRESS)
-    has_scraped = True
-
-if ALL or STG_ARTSCI:
-    print("--- scrape stg artsci courses ---")
-    scrape_stg_artsci(session, LOCAL, compressOutput=COMPRESS)
-    has_scraped = True
-
-if has_scraped:
-    with open("crs_data_last_updated.txt", "w") as f:
-        f.write(datetime.now().strftime('%Y %m %d %H:%M:%S'))
-
-# os.system("node generateIndices.mjs")
\ No newline at end of file
+
+
+def main():
+    if (len(sys.argv) == 1):
+        print("scrape_all.py [session_id] [campus] [compress] [binary]")
+        print("[session_id] is the year + 9 for fall/winter and 5 for summer courses")
+        print("e.g. 20199 is 2019 fall/winter, while 20195 is 2019 summer.")
+        print("")
+        print("[campuses] is either nothing or one or more of the supported campuses:")
+        print("UTM, STG_ARTSCI")
+        print("To scrape all campuses, don't pass in any value for [campus].")
+        print("Example command: scrape_all.py 20199")
+        print("Example command 2: scrape_all.py 20199 UTM STG_ARTSCI")
+        print("")
+        print("To re-parse already existing data, pass in 'local' as an argument.")
+        print("The memory-mappable binary format is also written unless the output is compressed;")
+        print("to write it for compressed output as well, pass in 'binary' as an argument.")
+        exit()
+
+    # fetch reports pages that did not change through logging
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    session = sys.argv[1]
+
+    # convert each input argument into lower case
+    rest_args = set(x.lower() for x in sys.argv[2:])
+    # if none of the campuses were specified, then scrape all campuses
+    ALL = len(rest_args.intersection(set(('utm', 'stg_artsci', 'utsc')))) == 0
+
+    UTM = 'utm' in rest_args
+    STG_ARTSCI = 'stg_artsci' in rest_args
+
+    LOCAL = 'local' in rest_args
+    COMPRESS = 'compress' in rest_args
+    # the binary format is written by default, as the interfaces open it in preference to the JSON file
+    BINARY = not COMPRESS or 'binary' in rest_args
+
+    campus_scrapers = []
+
+    if ALL or UTM:
+        campus_scrapers.append(('utm', scrape_utm))
+
+    if ALL or STG_ARTSCI:
+        campus_scrapers.append(('stg_artsci', scrape_stg_artsci))
+
+    def scrape_campus(campus, scrape_func):
+        print("--- scrape {0} courses ---".format(campus))
+        scrape_func(session, LOCAL, compressOutput=COMPRESS, binaryOutput=BINARY)
+
+    # campuses are scraped in parallel, and any failure is raised once all of them have finished
+    with ThreadPoolExecutor(max_workers=max(1, len(campus_scrapers))) as executor:
+        futures = [executor.submit(scrape_campus, campus, scrape_func) for campus, scrape_func in campus_scrapers]
+        for future in futures:
+            future.result()
+
+    has_scraped = len(campus_scrapers) > 0
+
+    if has_scraped:
+        with open("crs_data_last_updated.txt", "w") as f:
+            f.write(datetime.now().strftime('%Y %m %d %H:%M:%S'))
+
+    # os.system("node generateIndices.mjs")
+
+
+# the guard keeps process pool workers from re-running the scrape when they import this module
+if __name__ == "__main__":
+    main()
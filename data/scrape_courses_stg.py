@@ -3,23 +3,26 @@
 
 # https://timetable.iit.artsci.utoronto.ca/api/20199/courses?org=&code=&section=F&studyyear=&daytime=&weekday=&prof=&breadth=&online=&waitlist=&available=&title=
 
-import jsonpickle
 import json
 from course import *
 from schedule import *
-import requests
-import gzip
+from fetch import fetch, fetch_all
+from course_bin import save_course_bin, bin_path
+from course_delta import save_course_data
+from enrolment_history import EnrolmentHistory, history_path
+
+
+STG_ARTSCI_BASE_URL = "https://timetable.iit.artsci.utoronto.ca"
 
 
 def get_url(session, term):
-    return "https://timetable.iit.artsci.utoronto.ca/api/{0}/courses?org=&code=&section={1}&studyyear=&daytime=&weekday=&prof=&breadth=&online=&waitlist=&available=&title=".format(
+    return STG_ARTSCI_BASE_URL + "/api/{0}/courses?org=&code=&section={1}&studyyear=&daytime=&weekday=&prof=&breadth=&online=&waitlist=&available=&title=".format(
         session, term
     )
 
 
 def get_stg_json(session, term):
-    r = requests.get(get_url(session, term))
-    return r.content
+    return fetch(get_url(session, term))
 
 
 def load_from_stg_json(filepath):
@@ -94,21 +97,26 @@ def load_from_stg_json(filepath):
     return course_list
 
 
-def scrape_stg_artsci(session, useLocal=False, compressOutput=False):
+def scrape_stg_artsci(session, useLocal=False, compressOutput=False, binaryOutput=False):
     parsed_list = []
+    terms = ('F', 'S', 'Y')
+    filenames = ["stg_artsci_{0}_{1}.json".format(session, term) for term in terms]
 
-    for term in ('F', 'S', 'Y'):
-        filename = "stg_artsci_{0}_{1}.json".format(session, term)
-        if not useLocal:
-            with open(filename, 'wb') as f:
-                f.write(get_stg_json(session, term))
+    if not useLocal:
+        fetch_all([get_url(session, term) for term in terms], cache_files=filenames)
 
+    for filename in filenames:
         parsed_list.extend(load_from_stg_json(filename))
 
     parsed_list.sort(key=lambda c: c.course_code)
-    openFunc = gzip.open if compressOutput else open
     fName = "course_data_stg_artsci_{0}".format(session) + ("_production" if compressOutput else "")
-    with openFunc(fName, 'wb') as f:
-        f.write(str.encode(jsonpickle.encode(parsed_list, unpicklable=False), encoding='utf8'))
+    save_course_data(fName, parsed_list, compressOutput)
+
+    if binaryOutput:
+        save_course_bin(bin_path(fName), parsed_list)
+
+    # re-parsed local pages are not a new point in time
+    if not useLocal:
+        EnrolmentHistory(history_path(fName)).append(parsed_list)
 
 # "https://timetable.iit.artsci.utoronto.ca/api/{0}/courses?org=&code=&section={1}&studyyear=&daytime=&weekday=&prof=&breadth=&online=&waitlist=&available=&title=".format(session_id, term)
@@ -2,12 +2,24 @@
 # -*- coding: utf-8 -*-
 
 import jsonpickle
-import requests
 from lxml import html
-import json
 from course import *
 from schedule import *
-import gzip
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from fetch import fetch, fetch_all
+from course_bin import save_course_bin, bin_path
+from course_delta import save_course_data
+from enrolment_history import EnrolmentHistory, history_path
+
+UTM_BASE_URL = "https://student.utm.utoronto.ca"
+
+COURSE_NODES_XPATH = "/html/body/div/div[starts-with(@class, 'course')]"
+
+# pages larger than this are split into chunks of PARSE_CHUNK_COURSES courses for parsing
+PARSE_CHUNK_MIN_BYTES = 256 * 1024
+PARSE_CHUNK_COURSES = 100
+
 
 def get_url(year_of_study, session):
     """
@@ -17,19 +29,18 @@ def get_url(year_of_study, session):
     :return:
     """
 
-    return "https://student.utm.utoronto.ca/timetable/timetable?yos={0}&subjectarea=&session={1}&courseCode=&sname=&delivery=&courseTitle=".format(
+    return UTM_BASE_URL + "/timetable/timetable?yos={0}&subjectarea=&session={1}&courseCode=&sname=&delivery=&courseTitle=".format(
         year_of_study, session)
 
 
 def get_raw_tt(year_of_study, session):
-    r = requests.get(get_url(year_of_study, session))
-    return r.content
+    return fetch(get_url(year_of_study, session))
 
 
 def parse_data(data):
     tree = html.fromstring(data)
 
-    course_nodes = tree.xpath("/html/body/div/div[starts-with(@class, 'course')]")
+    course_nodes = tree.xpath(COURSE_NODES_XPATH)
 
     course_list = []
 
@@ -116,13 +127,49 @@ def parse_data(data):
     return course_list
 
 
+def split_page(data, chunk_courses=PARSE_CHUNK_COURSES):
+    """
+    Split a large timetable page into standalone pages of at most chunk_courses course divs each,
+    which parse_data can parse independently of each other.
+
+    :return: list of pages, in the same course order as the original page.
+    """
+    if len(data) < PARSE_CHUNK_MIN_BYTES:
+        return [data]
+
+    course_nodes = html.fromstring(data).xpath(COURSE_NODES_XPATH)
+
+    # chunks are passed on as decoded text, so that characters are not re-interpreted when parsed again
+    chunks = []
+    for i in range(0, len(course_nodes), chunk_courses):
+        chunk_html = "".join(html.tostring(node, encoding='unicode', with_tail=False)
+                             for node in course_nodes[i:i + chunk_courses])
+        chunks.append("<html><body><div>" + chunk_html + "</div></body></html>")
+    return chunks
+
+
+def parse_pages(rawdata_list, max_workers=None):
+    """
+    Parse several timetable pages across a process pool.
+
+    The workers are spawned rather than forked: scrape_all runs the campus scrapers in threads, and a process forked
+    while another thread holds a lock (in requests, urllib3 or logging) starts with that lock held forever.
+
+    :return: list of courses, in the same order as parsing each page one after the other.
+    """
+    chunks = [chunk for rawdata in rawdata_list for chunk in split_page(rawdata)]
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return [course for course_list in executor.map(parse_data, chunks) for course in course_list]
+
+
 def save_term_data(yr_of_study, term_code):
     parsed_list = parse_data(get_raw_tt(yr_of_study, term_code))
     with open(term_code + "_" + yr_of_study, 'w') as f:
         f.write(jsonpickle.encode(parsed_list, unpicklable=False))
 
 
-def scrape_utm(session, useLocal=False, compressOutput=False):
+def scrape_utm(session, useLocal=False, compressOutput=False, binaryOutput=False):
     """
 
     :param session: 20199
@@ -130,28 +177,31 @@ def scrape_utm(session, useLocal=False, compressOutput=False):
     :return:
     """
     all_list = []
+    years_of_study = [str(x) for x in range(1, 5)]
+    filenames = ["utm_{0}_{1}".format(session, yr_of_study) for yr_of_study in years_of_study]
 
-    for yr_of_study in [str(x) for x in range(1, 5)]:
-        print("Retrieve data for year " + yr_of_study)
-
-        filename = "utm_{0}_{1}".format(session, yr_of_study)
-
-        if useLocal:
+    if useLocal:
+        rawdata_list = []
+        for filename in filenames:
             with open(filename, 'rb') as f:
-                rawdata = f.read()
-        else:
-            rawdata = get_raw_tt(yr_of_study, session)
-
-            with open(filename, 'wb') as f:
-                f.write(rawdata)
+                rawdata_list.append(f.read())
+    else:
+        print("Retrieve data for years " + ", ".join(years_of_study))
+        rawdata_list = fetch_all([get_url(yr_of_study, session) for yr_of_study in years_of_study],
+                                 cache_files=filenames)
 
-        all_list.extend(parse_data(rawdata))
+    all_list.extend(parse_pages(rawdata_list))
 
     all_list.sort(key=lambda c: c.course_code)
-    openFunc = gzip.open if compressOutput else open
     fName = "course_data_utm_{0}".format(session) + ("_production" if compressOutput else "")
-    with openFunc(fName, 'wb') as f:
-        f.write(str.encode(jsonpickle.encode(all_list, unpicklable=False), encoding='utf8'))
+    save_course_data(fName, all_list, compressOutput)
+
+    if binaryOutput:
+        save_course_bin(bin_path(fName), all_list)
+
+    # re-parsed local pages are not a new point in time
+    if not useLocal:
+        EnrolmentHistory(history_path(fName)).append(all_list)
 
 # save_term_data('1', '20199')
 """
@@ -0,0 +1,458 @@
+"""
+Timetable solver.
+
+Arranging courses is an exact cover problem:
+    - every (course, section type) pair is a primary column, which must be covered exactly once.
+    - every section is a row, covering the column of its own course and section type.
+    - every pair of conflicting sections shares a secondary column, which may be covered at most once.
+
+Choosing a section therefore removes every section that conflicts with it, and the column with the fewest
+remaining sections is always branched on first. A column that runs out of sections ends the branch immediately.
+
+Sections of the same course and type that take place at exactly the same times (e.g. tutorials that only differ in
+room or TA) conflict with exactly the same sections. With collapse=True they share one row, and each cover found is
+expanded into one schedule per combination of the sections in its rows (see expand_solution).
+
+This is the same formulation as find_sched in src/components/schedule.tsx, solved with Knuth's dancing links.
+
+USAGE: python3 solver.py course_data_utm_20199 CSC108H5F MAT135H5F ...
+    counts the schedules of the given courses, and checks the count against a brute force search.
+"""
+import heapq
+import itertools
+import sys
+from course import *
+from schedule import *
+from scoring import make_scorer, make_bound, metrics, building
+
+
+class DLXNode:
+    __slots__ = ('left', 'right', 'up', 'down', 'col', 'row')
+
+    def __init__(self, col=None, row=None):
+        self.left = self.right = self.up = self.down = self
+        self.col = col
+        self.row = row
+
+
+class DLXColumn(DLXNode):
+    __slots__ = ('size', 'name')
+
+    def __init__(self, name):
+        super().__init__()
+        self.col = self
+        self.size = 0
+        self.name = name
+
+
+class DLXMatrix:
+    """
+    Sparse 0/1 matrix stored as circular doubly linked lists.
+
+    Only primary columns are linked into the header list, so secondary columns are never chosen to be covered,
+    but covering a row that uses one still removes every other row sharing it.
+    """
+
+    def __init__(self, col_names, n_primary_cols, rows):
+        """
+        :param col_names: a name for every column. The first n_primary_cols columns are primary.
+        :param n_primary_cols: number of columns that must be covered exactly once.
+        :param rows: list of (row_info, list of column indices).
+        """
+        self.root = DLXColumn(None)
+        self.cols = [DLXColumn(name) for name in col_names]
+
+        for col in self.cols[:n_primary_cols]:
+            col.right = self.root
+            col.left = self.root.left
+            self.root.left.right = col
+            self.root.left = col
+
+        for row_info, col_ids in rows:
+            first = None
+            for col_id in col_ids:
+                col = self.cols[col_id]
+                node = DLXNode(col, row_info)
+
+                node.down = col
+                node.up = col.up
+                col.up.down = node
+                col.up = node
+                col.size += 1
+
+                if first is None:
+                    first = node
+                else:
+                    node.right = first
+                    node.left = first.left
+                    first.left.right = node
+                    first.left = node
+
+    @staticmethod
+    def cover(col):
+        col.right.left = col.left
+        col.left.right = col.right
+
+        i = col.down
+        while i is not col:
+            j = i.right
+            while j is not i:
+                j.down.up = j.up
+                j.up.down = j.down
+                j.col.size -= 1
+                j = j.right
+            i = i.down
+
+    @staticmethod
+    def uncover(col):
+        i = col.up
+        while i is not col:
+            j = i.left
+            while j is not i:
+                j.col.size += 1
+                j.down.up = j
+                j.up.down = j
+                j = j.left
+            i = i.up
+
+        col.right.left = col
+        col.left.right = col
+
+    def choose_column(self):
+        best = None
+        c = self.root.right
+        while c is not self.root:
+            if best is None or c.size < best.size:
+                best = c
+                if best.size <= 1:
+                    break
+            c = c.right
+        return best
+
+    def solve(self):
+        """
+        Lazily yield every exact cover, as a list of row infos.
+
+        The matrix is modified during the search, so a generator must be exhausted (or discarded)
+        before solve is called again.
+        """
+        return self._search([])
+
+    def _search(self, selections):
+        if self.root.right is self.root:
+            yield [node.row for node in selections]
+            return
+
+        col = self.choose_column()
+        if col.size == 0:
+            return
+
+        self.cover(col)
+
+        r = col.down
+        while r is not col:
+            selections.append(r)
+
+            j = r.right
+            while j is not r:
+                self.cover(j.col)
+                j = j.right
+
+            yield from self._search(selections)
+
+            j = r.left
+            while j is not r:
+                self.uncover(j.col)
+                j = j.left
+
+            selections.pop()
+            r = r.down
+
+        self.uncover(col)
+
+    def solve_best(self, k, state, extend, bound, score, count=None):
+        """
+        Branch and bound search for the k exact covers with the highest scores.
+
+        The rows of the chosen column are tried in order of their bound, best first, and a row is skipped
+        once its bound cannot beat the k-th best score found so far.
+
+        :param state: state of the empty selection, e.g. an empty Schedule.
+        :param extend: function of (state, row info) returning a new state with the row added.
+        :param bound: function of a state returning an upper bound on the score of every cover extending it.
+        :param score: function of the state of a complete cover returning its score.
+        :param count: optional function of a cover's row infos returning the number of covers it stands for,
+            e.g. for rows of equivalent sections. Enough covers are kept to stand for k.
+            Each cover counts as 1 by default.
+        :return: list of (score, list of row infos), best first. Covers with equal scores are in the order found.
+            Empty if k is less than 1.
+        """
+        if k < 1:
+            return []
+
+        best = []  # min-heap of (score, -order found, row infos, count)
+        self._n_found = 0
+        self._n_kept = 0
+        self._search_best(k, [], state, extend, bound, score, count, best)
+        return [(s, rows) for s, _, rows, n in sorted(best, reverse=True)]
+
+    def _search_best(self, k, selections, state, extend, bound, score, count, best):
+        if self.root.right is self.root:
+            rows = [node.row for node in selections]
+            entry = (score(state), -self._n_found, rows, 1 if count is None else count(rows))
+            self._n_found += 1
+            if self._n_kept >= k and entry[:2] <= best[0][:2]:
+                return
+
+            heapq.heappush(best, entry)
+            self._n_kept += entry[3]
+            # drop the worst covers while the others still stand for k
+            while self._n_kept - best[0][3] >= k:
+                self._n_kept -= heapq.heappop(best)[3]
+            return
+
+        col = self.choose_column()
+        if col.size == 0:
+            return
+
+        children = []
+        r = col.down
+        while r is not col:
+            child = extend(state, r.row)
+            children.append((bound(child), r, child))
+            r = r.down
+        children.sort(key=lambda c: -c[0])
+
+        self.cover(col)
+
+        for b, r, child in children:
+            if self._n_kept >= k and b <= best[0][0]:
+                # children are sorted by bound, so none of the rest can enter the top k either
+                break
+
+            selections.append(r)
+
+            j = r.right
+            while j is not r:
+                self.cover(j.col)
+                j = j.right
+
+            self._search_best(k, selections, child, extend, bound, score, count, best)
+
+            j = r.left
+            while j is not r:
+                self.uncover(j.col)
+                j = j.left
+
+            selections.pop()
+
+        self.uncover(col)
+
+
+def section_classes(sections, key=None):
+    """
+    Group sections that take place at the same times into equivalence classes.
+
+    :param key: function of a section returning what must be equal within a class, the occupancy mask by default.
+    :return: list of lists of sections, in order of the first section of each class.
+    """
+    classes = {}
+    for sec in sections:
+        classes.setdefault(sec.mask if key is None else key(sec), []).append(sec)
+    return list(classes.values())
+
+
+def room_key(sec):
+    """
+    Equivalence key for scoring by metrics that read the buildings of the timeslots, not only the occupancy mask.
+    """
+    return sec.mask, tuple(sorted((slot.weekday, slot.start, building(slot.room_name_1) or '')
+                                  for slot in sec.timeslots))
+
+
+def class_key(weights):
+    """
+    :return: the key for section_classes under which equivalent sections give schedules with equal scores.
+    """
+    return None if all(metrics[name].by_time for name in weights) else room_key
+
+
+def expand_solution(solution):
+    """
+    :param solution: list of (course, section type, list of equivalent sections),
+        from a matrix built with collapse=True.
+    :return: generator of lists of (course, section type, section), one for every combination of the sections.
+    """
+    for secs in itertools.product(*(row_info[2] for row_info in solution)):
+        yield [(course, sectype, sec) for (course, sectype, _), sec in zip(solution, secs)]
+
+
+def count_solution(solution):
+    """
+    :return: the number of solutions expand_solution gives for solution.
+    """
+    n = 1
+    for row_info in solution:
+        n *= len(row_info[2])
+    return n
+
+
+def build_matrix(courses, ignore_closed=True, collapse=False, key=None, availability=None):
+    """
+    Build the exact cover matrix for the given courses.
+
+    Each row info is a (course, section type, section) tuple, or with collapse=True a
+    (course, section type, list of equivalent sections) tuple.
+
+    :param collapse: give sections of the same course and type that are equivalent under key a single row.
+    :param key: see section_classes.
+    :param availability: optional AvailabilityIndex. If given, only open sections are used.
+    """
+    col_names = []
+    rows = []
+
+    # a course listed twice would need two disjoint sections of each type, which the columns cannot express
+    codes = [course.course_code for course in courses]
+    if len(set(codes)) != len(codes):
+        raise Exception("The same course was given more than once.")
+
+    for course in courses:
+        for sectype in sectypes:
+            if sectype not in course.course_sections:
+                continue
+
+            col_id = len(col_names)
+            col_names.append((course.course_code, sectype))
+
+            secs = [sec for sec in course.course_sections[sectype] if not (ignore_closed and sec.is_closed)]
+            if availability is not None:
+                secs = availability.open_sections(secs)
+            if collapse:
+                rows += [((course, sectype, secs_class), [col_id]) for secs_class in section_classes(secs, key)]
+            else:
+                rows += [((course, sectype, sec), [col_id]) for sec in secs]
+
+    n_primary_cols = len(col_names)
+
+    # secondary columns: one for each pair of conflicting sections in different columns.
+    # the sections of a class conflict with the same sections, so the first one stands for all of them.
+    for idx1 in range(len(rows)):
+        (_, _, sec_a), cols_a = rows[idx1]
+        if collapse:
+            sec_a = sec_a[0]
+        for idx2 in range(idx1 + 1, len(rows)):
+            (_, _, sec_b), cols_b = rows[idx2]
+            if cols_a[0] == cols_b[0]:
+                continue
+            if collapse:
+                sec_b = sec_b[0]
+
+            if sec_a.is_conflict(sec_b):
+                col_id = len(col_names)
+                col_names.append((idx1, idx2))
+                cols_a.append(col_id)
+                cols_b.append(col_id)
+
+    return DLXMatrix(col_names, n_primary_cols, rows)
+
+
+def solution_to_schedule(solution):
+    """
+    Convert a list of (course, section type, section) tuples into a Schedule.
+    """
+    chosen = {}
+    for course, sectype, sec in solution:
+        if course.course_code not in chosen:
+            chosen[course.course_code] = (course, {})
+        chosen[course.course_code][1][sectype] = sec
+
+    sched = Schedule()
+    for course, secs in chosen.values():
+        sched.add_course(course, secs.get('LEC'), secs.get('TUT'), secs.get('PRA'))
+    return sched
+
+
+def schedule_sections(sched):
+    """
+    :return: dict of course code -> list of the section ids chosen in a Schedule, the form the tools answer with.
+    """
+    return {cltp[0].course_code: [sec.section_id for sec in cltp[1:] if sec is not None]
+            for cltp in sched.course_ltp_list}
+
+
+def find_schedules(courses, ignore_closed=True, collapse=True, availability=None):
+    """
+    Lazily enumerate every conflict-free LEC/TUT/PRA assignment for the given courses.
+
+    :param courses: list of Course objects to be arranged together. Each course may only be given once.
+    :param ignore_closed: leave out sections that are marked as closed.
+    :param collapse: search over classes of sections at the same times, see build_matrix.
+        Schedules that only differ in equivalent sections are then listed together.
+    :param availability: optional AvailabilityIndex, to leave out every section that is not open.
+    :return: generator of Schedule objects.
+    """
+    if not collapse:
+        for solution in build_matrix(courses, ignore_closed, availability=availability).solve():
+            yield solution_to_schedule(solution)
+        return
+
+    for solution in build_matrix(courses, ignore_closed, collapse=True, availability=availability).solve():
+        for expanded in expand_solution(solution):
+            yield solution_to_schedule(expanded)
+
+
+def find_best_schedules(courses, k, weights, ignore_closed=True, availability=None):
+    """
+    Find the k best conflict-free LEC/TUT/PRA assignments for a preference, without enumerating all of them.
+
+    Sections that would give equal scores are searched as one, see class_key.
+
+    :param weights: dict of metric name -> weight, see scoring.preference_weights.
+    :param availability: optional AvailabilityIndex, to leave out every section that is not open.
+    :return: list of (score, Schedule), best first.
+    """
+    def extend(sched, row_info):
+        course, sectype, secs = row_info
+        new_sched = sched.make_copy()
+        new_sched.add_course(course, secs[0])
+        return new_sched
+
+    matrix = build_matrix(courses, ignore_closed, collapse=True, key=class_key(weights),
+                          availability=availability)
+    results = matrix.solve_best(k, Schedule(), extend, make_bound(weights), make_scorer(weights),
+                                count_solution)
+    best = []
+    for s, solution in results:
+        for expanded in itertools.islice(expand_solution(solution), k - len(best)):
+            best.append((s, solution_to_schedule(expanded)))
+    return best
+
+
+def count_brute_force(courses, ignore_closed=True):
+    """
+    Count the conflict-free assignments by trying every combination of sections, to check find_schedules against.
+    """
+    choices = []
+    for course in courses:
+        for sectype in sectypes:
+            if sectype in course.course_sections:
+                choices.append([sec for sec in course.course_sections[sectype]
+                                if not (ignore_closed and sec.is_closed)])
+
+    count = 0
+    for combination in itertools.product(*choices):
+        if not any(sec_a.is_conflict(sec_b) for sec_a, sec_b in itertools.combinations(combination, 2)):
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    course_data_path = sys.argv[1]
+    by_code = {course.course_code: course for course in load_courses(course_data_path)}
+    chosen = [by_code[code] for code in sys.argv[2:]]
+
+    n_found = sum(1 for _ in find_schedules(chosen))
+    n_expected = count_brute_force(chosen)
+    print("{0} schedules, brute force: {1}".format(n_found, n_expected))
+    if n_found != n_expected:
+        raise Exception("The solver and the brute force search disagree.")
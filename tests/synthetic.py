@@ -0,0 +1,68 @@
+"""
+Small random sessions for the tests, built from the same constructors the scrapers use.
+"""
+import random
+from course import Course, SingleSection, Timeslot, index_sections
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR')
+ROOMS = ('DH2020', 'DH2010', 'IB120', 'CC1080', 'MN1210')
+
+
+def make_timeslot(rng):
+    start = rng.randrange(9 * 60, 18 * 60, 30)
+    return Timeslot(rng.choice(WEEKDAYS), [start // 60, start % 60], [(start + 60 * rng.choice((1, 2))) // 60,
+                                                                      start % 60], rng.choice(ROOMS), "")
+
+
+def make_section(rng, section_id, same_times_as=None):
+    """
+    :param same_times_as: a section to take the times of, in other rooms, like tutorials that only differ in room or TA.
+    """
+    enrolled = rng.randrange(0, 60)
+    total = rng.choice((enrolled, 60))
+    notes = "Closed" if rng.random() < 0.1 else ""
+    if same_times_as is None:
+        timeslots = [make_timeslot(rng) for _ in range(rng.randint(1, 2))]
+    else:
+        timeslots = [Timeslot(slot.weekday, [slot.start // 60, slot.start % 60], [slot.end // 60, slot.end % 60],
+                              rng.choice(ROOMS), "") for slot in same_times_as.timeslots]
+    return SingleSection(section_id, ["Instructor, " + section_id], notes, enrolled, total, 0, timeslots)
+
+
+def make_course(rng, code, max_sections=3, same_times_rate=0):
+    sections = {}
+    for sectype in ('LEC', 'TUT', 'PRA'):
+        if sectype != 'LEC' and rng.random() < 0.5:
+            continue
+        secs = []
+        for i in range(rng.randint(1, max_sections)):
+            same_times_as = secs[-1] if same_times_rate > 0 and len(secs) > 0 and rng.random() < same_times_rate \
+                else None
+            secs.append(make_section(rng, "{0}{1:04}".format(sectype, 101 + i), same_times_as))
+        sections[sectype] = secs
+    return Course(code, "Course " + code, "", "", rng.choice(('F', 'S', 'Y')), sections)
+
+
+def make_session(seed, n_courses=6, max_sections=3, same_times_rate=0):
+    """
+    :param same_times_rate: chance of a section taking place at the same times as the section listed before it.
+    :return: list of Course objects with codes AAA101H5F, AAA102H5F, ..., with sections indexed.
+    """
+    rng = random.Random(seed)
+    courses = [make_course(rng, "AAA{0}H5F".format(101 + i), max_sections, same_times_rate)
+               for i in range(n_courses)]
+    index_sections(courses)
+    return courses
+
+
+def state_of(obj):
+    """
+    :return: obj as nested dicts and lists of its __getstate__ fields, the form the scrapers write as JSON.
+    """
+    if isinstance(obj, dict):
+        return {key: state_of(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [state_of(value) for value in obj]
+    if hasattr(obj, '__getstate__') and not isinstance(obj, (str, int, float, bool, type(None))):
+        return state_of(obj.__getstate__())
+    return obj
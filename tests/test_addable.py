@@ -0,0 +1,87 @@
+import random
+import pytest
+from synthetic import make_session
+from course import index_sections, sectypes
+from availability import OPEN
+from addable import AddableIndex, BLOCK_CONFLICT, BLOCK_SCHEDULED, BLOCK_UNAVAILABLE
+from schedule import Schedule
+
+
+def random_schedule(rng, courses, availability=None, n_courses=2):
+    """
+    :return: a Schedule of up to n_courses courses with randomly chosen sections that do not conflict, which may be
+        full or closed.
+    """
+    sched = Schedule(availability)
+    for course in rng.sample(courses, n_courses):
+        if any(len(secs) == 0 for secs in course.course_sections.values()):
+            continue
+        chosen = {sectype: rng.choice(secs) for sectype, secs in course.course_sections.items()}
+        if all(sec.mask & sched.occupancy == 0 for sec in chosen.values()):
+            sched.add_course(course, chosen.get('LEC'), chosen.get('TUT'), chosen.get('PRA'))
+    return sched
+
+
+def expected_reasons(sched, course):
+    """
+    :return: dict of section type -> reason the section type blocks course, checked one section at a time.
+    """
+    if any(cltp[0].course_code == course.course_code for cltp in sched.course_ltp_list):
+        return {sectype: BLOCK_SCHEDULED for sectype in course.course_sections}
+    reasons = {}
+    for sectype, secs in course.course_sections.items():
+        open_secs = [sec for sec in secs if sched.section_status(sec) == OPEN]
+        if len(open_secs) == 0:
+            reasons[sectype] = BLOCK_UNAVAILABLE
+        elif all(sec.mask & sched.occupancy for sec in open_secs):
+            reasons[sectype] = BLOCK_CONFLICT
+    return reasons
+
+
+def with_empty_sectypes(courses):
+    """
+    Empty a section type of every fourth course, as a course listing tutorials that are all cancelled would have.
+    """
+    for course in courses[::4]:
+        sectype = 'TUT' if 'TUT' in course.course_sections else 'PRA'
+        course.course_sections[sectype] = []
+    index_sections(courses)
+    return courses
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_check_all_matches_can_add_course(seed):
+    rng = random.Random(seed)
+    courses = with_empty_sectypes(make_session(seed, n_courses=12))
+    index = AddableIndex(courses)
+    for _ in range(5):
+        sched = random_schedule(rng, courses, index.availability)
+        scheduled = set(cltp[0].course_code for cltp in sched.course_ltp_list)
+        addable, blocked = index.check_all(sched)
+
+        assert [c.course_code for c in addable] == \
+               [c.course_code for c in courses if c.course_code not in scheduled and sched.can_add_course(c)]
+        assert index.addable(sched) == addable
+        for course in courses:
+            assert blocked.get(course.course_code, {}) == expected_reasons(sched, course)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_refresh_availability_follows_updates(seed):
+    rng = random.Random(seed)
+    courses = make_session(seed, n_courses=12)
+    index = AddableIndex(courses)
+    sched = random_schedule(rng, courses, index.availability)
+
+    # fill up or open some sections, as a scrape that only changes enrolment counts would
+    changed = [sec for course in courses for sectype in sectypes for sec in course.course_sections.get(sectype, ())
+               if rng.random() < 0.3]
+    for sec in changed:
+        sec.enrolled_count = sec.total_count if sec.enrolled_count < sec.total_count else 0
+        sec.total_count = max(sec.total_count, 1)
+    index.availability.update(changed)
+    index.refresh_availability()
+
+    scheduled = set(cltp[0].course_code for cltp in sched.course_ltp_list)
+    assert [c.course_code for c in index.addable(sched)] == \
+           [c.course_code for c in courses if c.course_code not in scheduled and sched.can_add_course(c)]
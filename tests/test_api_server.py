@@ -0,0 +1,67 @@
+import json
+import pytest
+from synthetic import make_session
+from course_bin import bin_path, save_course_bin
+from api_server import ApiServer
+from scoring import DEFAULT_K, DEFAULT_PREFERENCE, preference_weights
+from solver import find_best_schedules, schedule_sections
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    course_data_path = str(tmp_path_factory.mktemp('api') / "course_data_test")
+    courses = make_session(2, n_courses=6)
+    save_course_bin(bin_path(course_data_path), courses)
+    server = ApiServer(course_data_path)
+    server.courses = courses
+    return server
+
+
+def post(server, path, body):
+    return server.dispatch('POST', path, json.dumps(body).encode('utf8'))
+
+
+@pytest.mark.parametrize('body', [
+    {'courses': [0, 1], 'k': 2},
+    {'courses': [2, 3, 4], 'k': 4, 'preference': 'morning'},
+    {'courses': [1, 3]},
+])
+def test_solve_matches_the_solver(server, body):
+    courses = [server.courses[i] for i in body['courses']]
+    status, response = post(server, '/solve', dict(body, courses=[course.course_code for course in courses]))
+    assert status == 200
+    expected = find_best_schedules(courses, body.get('k', DEFAULT_K),
+                                   preference_weights[body.get('preference', DEFAULT_PREFERENCE)])
+    assert len(expected) > 0
+    assert response['schedules'] == [{'score': score, 'sections': schedule_sections(sched)}
+                                     for score, sched in expected]
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/check', {'schedule': [], 'course': 'A'}),
+    ('/check', {'schedule': {'A': 'LEC0101'}, 'course': 'A'}),
+    ('/check', {'schedule': {'A': [1]}, 'course': 'A'}),
+    ('/check', {'course': 5}),
+    ('/check', {'course': 'A', 'sections': 'LEC0101'}),
+    ('/addable', {'q': 5}),
+    ('/solve', {'courses': 'A'}),
+    ('/solve', {'courses': [5]}),
+    ('/solve', {'courses': [], 'k': 0}),
+    ('/solve', {'courses': [], 'k': True}),
+    ('/solve', {'courses': [], 'k': '5'}),
+    ('/solve', {'courses': [], 'preference': 5}),
+])
+def test_bad_fields_are_rejected(server, path, body):
+    status, response = post(server, path, body)
+    assert status == 400
+    assert 'error' in response
+
+
+def test_handler_failure_is_answered(server, monkeypatch):
+    def fail(self, session, query, body):
+        raise AttributeError('boom')
+
+    monkeypatch.setitem(server.routes, ('GET', '/status'), fail)
+    status, response = server.dispatch('GET', '/status', b'')
+    assert status == 500
+    assert 'boom' in response['error']
@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import random
+import pytest
+from synthetic import make_course, make_session
+from course import index_sections
+from course_bin import bin_path, save_course_bin
+from scoring import make_scorer, preference_weights
+from solver import find_best_schedules, find_schedules, schedule_sections
+import batch_solve
+
+
+@pytest.fixture(scope='module')
+def session(tmp_path_factory):
+    """
+    :return: (course data path, courses). Sections often share their times, so that schedules tie on scores
+        that only depend on time, and the BBB courses have one section of each type, so that they do not branch.
+    """
+    courses = make_session(5, n_courses=6, same_times_rate=0.5)
+    rng = random.Random(5)
+    courses += [make_course(rng, "BBB{0}H5F".format(101 + i), max_sections=1) for i in range(3)]
+    index_sections(courses)
+    course_data_path = str(tmp_path_factory.mktemp('batch') / "course_data_test")
+    save_course_bin(bin_path(course_data_path), courses)
+    return course_data_path, courses
+
+
+def wishlists(courses):
+    codes = [course.course_code for course in courses]
+    lists = [codes[0:3], codes[2:5], codes[3:6], codes[6:9], codes[1:2] + codes[6:8]]
+    return [{'id': "{0}-{1}-{2}".format(i, preference, k), 'courses': wishlist, 'preference': preference, 'k': k}
+            for i, wishlist in enumerate(lists) for preference in ('morning', 'compact') for k in (1, 3, 50)]
+
+
+def run(session, wishlist_list, tmp_path, processes=2):
+    course_data_path, courses = session
+    wishlist_path = tmp_path / "wishlists.jsonl"
+    output_path = tmp_path / "schedules.jsonl"
+    wishlist_path.write_text("".join(json.dumps(wishlist) + "\n" for wishlist in wishlist_list))
+    assert batch_solve.batch_solve(course_data_path, str(wishlist_path), str(output_path), processes) == \
+        len(wishlist_list)
+    with open(str(output_path)) as f:
+        return {result['id']: result for result in map(json.loads, f)}
+
+
+def sections_key(sections):
+    return json.dumps(sections, sort_keys=True)
+
+
+def test_merged_top_k_matches_single_process(session, tmp_path):
+    course_data_path, courses = session
+    by_code = {course.course_code: course for course in courses}
+    wishlist_list = wishlists(courses)
+    assert any(len(batch_solve.split_wishlist([by_code[code] for code in wishlist['courses']])) == 1
+               for wishlist in wishlist_list)
+    results = run(session, wishlist_list, tmp_path)
+
+    n_ties = 0
+    for wishlist in wishlist_list:
+        chosen = [by_code[code] for code in wishlist['courses']]
+        weights = preference_weights[wishlist['preference']]
+        expected = [(score, schedule_sections(sched))
+                    for score, sched in find_best_schedules(chosen, wishlist['k'], weights)]
+        found = [(schedule['score'], schedule['sections']) for schedule in results[wishlist['id']]['schedules']]
+        assert [score for score, _ in found] == [score for score, _ in expected]
+        if len(found) == 0:
+            continue
+
+        # the schedules scoring above the k-th score are the same; those tied with it may be any of the ties
+        cutoff = expected[-1][0] if len(expected) == wishlist['k'] else None
+        assert sorted(sections_key(sections) for score, sections in found if score != cutoff) == \
+            sorted(sections_key(sections) for score, sections in expected if score != cutoff)
+        score = make_scorer(weights)
+        tied = set(sections_key(schedule_sections(sched))
+                   for sched in find_schedules(chosen, collapse=False) if score(sched) == cutoff)
+        at_cutoff = [sections_key(sections) for s, sections in found if s == cutoff]
+        assert len(set(at_cutoff)) == len(at_cutoff) and set(at_cutoff) <= tied
+        n_ties += len(found) - len(set(score for score, _ in found))
+    assert n_ties > 0
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                    reason="the patched search only reaches forked workers")
+def test_failing_task_is_reported_without_ending_the_batch(session, tmp_path, monkeypatch):
+    course_data_path, courses = session
+    wishlist_list = wishlists(courses)
+    expected = run(session, wishlist_list, tmp_path)
+
+    # fail one branch of the first wishlist, which branches on the open lectures of its first course
+    first = courses[0]
+    open_lectures = [sec.section_id for sec in first.course_sections['LEC'] if not sec.is_closed]
+    assert wishlist_list[0]['courses'][0] == first.course_code and len(open_lectures) > 1
+
+    def find_best_failing(chosen, k, weights, *args, **kwargs):
+        if chosen[0].course_code == first.course_code and \
+                [sec.section_id for sec in chosen[0].course_sections['LEC']] == open_lectures[1:2]:
+            raise RuntimeError("boom")
+        return find_best_schedules(chosen, k, weights, *args, **kwargs)
+
+    monkeypatch.setattr(batch_solve, 'find_best_schedules', find_best_failing)
+    results = run(session, wishlist_list, tmp_path)
+    assert set(results) == set(expected)
+    for wishlist in wishlist_list:
+        if wishlist['courses'] == wishlist_list[0]['courses']:
+            assert results[wishlist['id']] == {'id': wishlist['id'], 'error': "RuntimeError: boom"}
+        else:
+            assert results[wishlist['id']] == expected[wishlist['id']]
+
+
+def test_invalid_wishlist_is_reported(session, tmp_path):
+    course_data_path, courses = session
+    wishlist_list = [{'id': 'unknown', 'courses': ['XXX999H5F']}, {'id': 'ok', 'courses': [courses[0].course_code]}]
+    results = run(session, wishlist_list, tmp_path, processes=1)
+    assert 'Unknown course' in results['unknown']['error']
+    assert len(results['ok']['schedules']) > 0
@@ -0,0 +1,55 @@
+import os
+import pytest
+from synthetic import make_session, state_of
+from course import load_courses, sectypes
+from course_bin import CourseFile, save_course_bin
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def round_trip(courses, tmp_path):
+    filepath = str(tmp_path / "courses.bin")
+    save_course_bin(filepath, courses)
+    course_file = CourseFile(filepath)
+    try:
+        return course_file, course_file.to_courses()
+    except BaseException:
+        course_file.close()
+        raise
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_round_trip(seed, tmp_path):
+    courses = make_session(seed, n_courses=10)
+    course_file, loaded = round_trip(courses, tmp_path)
+    try:
+        assert state_of(loaded) == state_of(courses)
+        assert [sec.mask for c in loaded for secs in c.course_sections.values() for sec in secs] == \
+               [sec.mask for c in courses for secs in c.course_sections.values() for sec in secs]
+        # the views decode the same fields without materializing the courses
+        assert [view.course_code for view in course_file] == [c.course_code for c in courses]
+        assert state_of([view.to_course() for view in course_file]) == state_of(courses)
+    finally:
+        course_file.close()
+
+
+def test_sections_keep_their_index(tmp_path):
+    courses = make_session(1, n_courses=10)
+    course_file, loaded = round_trip(courses, tmp_path)
+    try:
+        for course in loaded:
+            for secs in course.course_sections.values():
+                for sec in secs:
+                    assert course_file.s_enrolled[sec.index] == sec.enrolled_count
+                    assert sectypes[course_file.s_type[sec.index]] == sec.section_id[:3]
+    finally:
+        course_file.close()
+
+
+def test_round_trip_of_checked_in_session(tmp_path):
+    courses = load_courses(os.path.join(DATA_DIR, 'course_data_utm_20199'))
+    course_file, loaded = round_trip(courses, tmp_path)
+    try:
+        assert state_of(loaded) == state_of(courses)
+    finally:
+        course_file.close()
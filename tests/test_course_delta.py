@@ -0,0 +1,104 @@
+import copy
+import gzip
+import json
+import logging
+import random
+import pytest
+from synthetic import make_session, make_section, state_of
+
+pytest.importorskip('jsonpickle')
+from course_delta import apply_delta, compute_delta, delta_path, save_course_data
+
+
+def session_dicts(seed, n_courses=12):
+    return state_of(make_session(seed, n_courses))
+
+
+def mutate(courses, rng):
+    """
+    :return: a copy of courses with some courses added, removed and changed, sorted by course code.
+    """
+    courses = copy.deepcopy(courses)
+    for course in rng.sample(courses, 2):
+        courses.remove(course)
+    courses += session_dicts(rng.randrange(1000), 2)[:1]
+    courses[-1]['course_code'] = "BBB{0}H5S".format(rng.randrange(100, 500))
+
+    for course in rng.sample(courses, 4):
+        change = rng.randrange(4)
+        lectures = course['course_sections']['LEC']
+        if change == 0:
+            lectures[0]['enrolled_count'] += 1
+        elif change == 1:
+            course['course_name'] += " (renamed)"
+        elif change == 2:
+            lectures.insert(0, state_of(make_section(rng, "LEC9{0:03}".format(rng.randrange(1000)))))
+        elif len(lectures) > 1:
+            del lectures[-1]
+            lectures.reverse()
+    return sorted(courses, key=lambda c: c['course_code'])
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_apply_delta_rebuilds_the_new_courses(seed):
+    old = session_dicts(seed)
+    new = mutate(old, random.Random(seed))
+    delta = compute_delta(old, new)
+    assert apply_delta(old, delta) == new
+
+
+def test_unchanged_courses_give_an_empty_delta():
+    old = session_dicts(0)
+    delta = compute_delta(old, copy.deepcopy(old))
+    assert delta['added'] == [] and delta['removed'] == [] and delta['changed'] == []
+    assert delta['base'] == delta['target']
+
+
+def test_one_changed_section_is_the_only_change():
+    old = session_dicts(1)
+    new = copy.deepcopy(old)
+    new[3]['course_sections']['LEC'][0]['enrolled_count'] += 1
+    delta = compute_delta(old, new)
+    assert delta['added'] == [] and delta['removed'] == []
+    assert len(delta['changed']) == 1
+    assert delta['changed'][0]['sections'] == {'added': [], 'removed': [],
+                                              'changed': [['LEC', new[3]['course_sections']['LEC'][0]]]}
+
+
+def test_delta_does_not_apply_to_other_courses():
+    old = session_dicts(2)
+    delta = compute_delta(old, mutate(old, random.Random(2)))
+    with pytest.raises(Exception):
+        apply_delta(session_dicts(3), delta)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_saved_delta_applies_to_the_previous_file(compress, tmp_path):
+    filepath = str(tmp_path / "course_data_test")
+    save_course_data(filepath, make_session(4), compress)
+    assert not (tmp_path / "course_data_test.delta").exists()
+
+    courses = make_session(4)
+    courses[0].course_name += " (renamed)"
+    save_course_data(filepath, courses, compress)
+    open_func = gzip.open if compress else open
+    with open_func(delta_path(filepath), 'rb') as f:
+        delta = json.loads(f.read().decode('utf8'))
+    assert apply_delta(state_of(make_session(4)), delta) == state_of(courses)
+
+
+def test_corrupt_previous_file_still_saves_the_new_data(tmp_path, caplog):
+    filepath = str(tmp_path / "course_data_test")
+    with open(filepath, 'w') as f:
+        f.write('{"not": "a course list"')
+    with open(delta_path(filepath), 'w') as f:
+        f.write('{}')
+
+    courses = make_session(5)
+    with caplog.at_level(logging.ERROR):
+        save_course_data(filepath, courses)
+
+    with open(filepath, 'r') as f:
+        assert json.load(f) == state_of(courses)
+    assert not (tmp_path / "course_data_test.delta").exists()
+    assert "could not compute the changes" in caplog.text
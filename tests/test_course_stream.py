@@ -0,0 +1,44 @@
+import gzip
+import json
+import pytest
+from synthetic import make_session, state_of
+from course_stream import LazyCourse, stream_courses
+
+
+@pytest.fixture(params=[False, True], ids=['json', 'gzip'])
+def course_data(request, tmp_path):
+    courses = make_session(6, n_courses=10)
+    filepath = str(tmp_path / "course_data_test")
+    text = json.dumps(state_of(courses))
+    with (gzip.open if request.param else open)(filepath, 'wt', encoding='utf8') as f:
+        f.write(text)
+    return filepath, courses
+
+
+def test_stream_matches_the_courses(course_data):
+    filepath, courses = course_data
+    assert state_of(list(stream_courses(filepath))) == state_of(courses)
+
+
+def test_lazy_courses_build_their_sections_when_read(course_data):
+    filepath, courses = course_data
+    lazy = list(stream_courses(filepath, lazy=True))
+    assert all(isinstance(course, LazyCourse) and course._sections is None for course in lazy)
+    assert [course.course_code for course in lazy] == [course.course_code for course in courses]
+
+    first = lazy[0].course_sections
+    assert lazy[0].course_sections is first
+    assert all(course._sections is None for course in lazy[1:])
+    assert state_of([course.to_course() for course in lazy]) == state_of(courses)
+    assert [sec.mask for course in lazy for secs in course.course_sections.values() for sec in secs] == \
+           [sec.mask for course in courses for secs in course.course_sections.values() for sec in secs]
+
+
+def test_filters(course_data):
+    filepath, courses = course_data
+    for lazy in (False, True):
+        assert [c.course_code for c in stream_courses(filepath, prefix="AAA10", lazy=lazy)] == \
+               [c.course_code for c in courses if c.course_code.startswith("AAA10")]
+        assert [c.course_code for c in stream_courses(filepath, term='F', campus='UTM', lazy=lazy)] == \
+               [c.course_code for c in courses if c.term == 'F']
+        assert list(stream_courses(filepath, campus='STG', lazy=lazy)) == []
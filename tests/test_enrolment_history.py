@@ -0,0 +1,101 @@
+import copy
+import os
+import random
+import pytest
+from synthetic import make_session
+from course import sectypes
+from enrolment_history import EnrolmentHistory, last_frame_path
+
+
+def scrapes(seed, n_scrapes=6):
+    """
+    Yield (courses, {(course code, section type, section id): (enrolled, capacity, waitlist)}) of each scrape, with
+    counts that change and courses that come and go between scrapes. The counts of the courses change in place.
+    """
+    rng = random.Random(seed)
+    courses = make_session(seed, n_courses=8)
+    for _ in range(n_scrapes):
+        listed = [course for course in courses if rng.random() < 0.8] if rng.random() < 0.5 else courses
+        counts = {}
+        for course in listed:
+            for sectype in sectypes:
+                for sec in course.course_sections.get(sectype, ()):
+                    sec.enrolled_count = rng.randint(0, sec.total_count)
+                    sec.waitlist_count = rng.randint(0, 5)
+                    counts[(course.course_code, sectype, sec.section_id)] = \
+                        (sec.enrolled_count, sec.total_count, sec.waitlist_count)
+        yield listed, counts
+
+
+def frame_counts(frame):
+    t, keys, enrolled, capacity, waitlist = frame
+    return {key: (enrolled[i], capacity[i], waitlist[i]) for key, i in keys.items()}
+
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('keep_last', [True, False])
+def test_frames_read_back(seed, keep_last, tmp_path):
+    filepath = str(tmp_path / "courses.history")
+    expected = []
+    for t, (courses, counts) in enumerate(scrapes(seed)):
+        if not keep_last and os.path.isfile(last_frame_path(filepath)):
+            os.remove(last_frame_path(filepath))
+        EnrolmentHistory(filepath).append(courses, t)
+        expected.append(counts)
+
+    history = EnrolmentHistory(filepath)
+    assert len(history) == len(expected)
+    assert [frame_counts(frame) for frame in history.frames()] == expected
+    assert [frame[0] for frame in history.frames()] == list(range(len(expected)))
+
+
+def test_stale_last_frame_is_ignored(tmp_path):
+    filepath = str(tmp_path / "courses.history")
+    history = EnrolmentHistory(filepath)
+    expected = []
+    for t, (courses, counts) in enumerate(scrapes(3, n_scrapes=3)):
+        if t == 2:
+            # a .last file from before the second frame must not be taken as the last frame
+            with open(last_frame_path(filepath), 'wb') as f:
+                f.write(first_last)
+        history.append(courses, t)
+        expected.append(counts)
+        if t == 0:
+            with open(last_frame_path(filepath), 'rb') as f:
+                first_last = f.read()
+    assert [frame_counts(frame) for frame in history.frames()] == expected
+
+
+def test_cut_off_frame_is_overwritten(tmp_path):
+    filepath = str(tmp_path / "courses.history")
+    history = EnrolmentHistory(filepath)
+    expected = []
+    for t, (courses, counts) in enumerate(scrapes(4, n_scrapes=3)):
+        if t == 2:
+            with open(filepath, 'r+b') as f:
+                f.truncate(os.path.getsize(filepath) - 3)
+            assert len(history) == 1
+            expected.pop()
+        history.append(courses, t)
+        expected.append(counts)
+    assert [frame_counts(frame) for frame in history.frames()] == expected
+
+
+def test_sections_listed_twice_are_recorded_once(tmp_path):
+    filepath = str(tmp_path / "courses.history")
+    history = EnrolmentHistory(filepath)
+    expected = []
+    for t, (courses, counts) in enumerate(scrapes(5, n_scrapes=4)):
+        if t in (1, 2):
+            # the scrape found a course twice, the second time with other counts
+            again = copy.deepcopy(courses[0])
+            for sectype in sectypes:
+                for sec in again.course_sections.get(sectype, ()):
+                    sec.enrolled_count += 1
+            courses = courses + [again]
+        history.append(courses, t)
+        expected.append(counts)
+
+    frames = list(history.frames())
+    assert [frame_counts(frame) for frame in frames] == expected
+    assert [len(frame[2]) for frame in frames] == [len(counts) for counts in expected]
@@ -0,0 +1,61 @@
+import itertools
+import pytest
+from synthetic import make_session
+from explain import explain_infeasible, smallest_removal_sets
+from solver import count_brute_force
+
+
+def brute_force(courses, ignore_closed):
+    """
+    :return: (conflict sets, removal sets) as sets of frozensets of course codes, found by checking every subset.
+    """
+    codes = [course.course_code for course in courses]
+    feasible = {}
+    for size in range(len(courses) + 1):
+        for subset in itertools.combinations(range(len(courses)), size):
+            feasible[frozenset(subset)] = count_brute_force([courses[i] for i in subset], ignore_closed) > 0
+
+    everything = frozenset(range(len(courses)))
+    # feasibility only gets lost by adding courses, so minimality only needs checking one course at a time
+    conflict_sets = {subset for subset, ok in feasible.items()
+                     if not ok and all(feasible[subset - {i}] for i in subset)}
+    removal_sets = {everything - subset for subset, ok in feasible.items()
+                    if ok and subset != everything and all(not feasible[subset | {i}] for i in everything - subset)}
+
+    def named(sets):
+        return {frozenset(codes[i] for i in s) for s in sets}
+
+    return named(conflict_sets), named(removal_sets)
+
+
+def as_sets(course_lists):
+    return {frozenset(course.course_code for course in courses) for courses in course_lists}
+
+
+@pytest.mark.parametrize('seed', range(12))
+@pytest.mark.parametrize('ignore_closed', [True, False])
+def test_explain_matches_brute_force(seed, ignore_closed):
+    courses = make_session(seed, n_courses=6, max_sections=2)
+    conflict_sets, removal_sets = explain_infeasible(courses, ignore_closed)
+    expected_conflicts, expected_removals = brute_force(courses, ignore_closed)
+
+    assert as_sets(conflict_sets) == expected_conflicts
+    assert as_sets(removal_sets) == expected_removals
+    assert len(conflict_sets) == len(expected_conflicts) and len(removal_sets) == len(expected_removals)
+    for sets in (conflict_sets, removal_sets):
+        assert [len(s) for s in sets] == sorted(len(s) for s in sets)
+
+    smallest = smallest_removal_sets(courses, ignore_closed)
+    fewest = min((len(s) for s in expected_removals), default=0)
+    assert as_sets(smallest) == {s for s in expected_removals if len(s) == fewest}
+
+
+def test_feasible_courses_are_not_explained():
+    for seed in range(20):
+        courses = make_session(seed, n_courses=3)
+        if count_brute_force(courses) > 0:
+            break
+    else:
+        pytest.fail("no arrangeable session")
+    assert explain_infeasible(courses) == ([], [])
+    assert smallest_removal_sets(courses) == []
@@ -0,0 +1,94 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import pytest
+
+requests = pytest.importorskip('requests')
+import fetch
+
+PAGE = b'<html>timetable</html>'
+ETAG = '"v1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    /flaky answers 503 to the first server.n_failures requests, then the page.
+    /etag answers the page with an ETag, or 304 when the request already has it.
+    """
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, dict(self.headers)))
+        if self.path == '/flaky' and server.n_flaky < server.n_failures:
+            server.n_flaky += 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path == '/etag' and self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(PAGE)))
+            if self.path == '/etag':
+                self.send_header('ETag', ETAG)
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    server.n_flaky = 0
+    server.n_failures = 2
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, "http://127.0.0.1:{0}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session():
+    s = fetch.make_session(backoff=0)
+    yield s
+    s.close()
+
+
+def test_retries_on_503(stub_server, session):
+    server, base_url = stub_server
+    assert fetch.fetch(base_url + '/flaky', session) == PAGE
+    assert [path for path, headers in server.requests] == ['/flaky'] * 3
+
+
+def test_gives_up_after_the_retries(stub_server):
+    server, base_url = stub_server
+    server.n_failures = 10
+    with pytest.raises(requests.HTTPError) as excinfo:
+        fetch.fetch(base_url + '/flaky', fetch.make_session(retries=2, backoff=0))
+    assert excinfo.value.response.status_code == 503
+    assert len(server.requests) == 3
+
+
+def test_conditional_fetch_reuses_the_cache_file(stub_server, session, tmp_path, monkeypatch):
+    server, base_url = stub_server
+    monkeypatch.setattr(fetch, 'FETCH_CACHE_FILE', str(tmp_path / "fetch_cache.json"))
+    cache_file = str(tmp_path / "page.html")
+
+    assert fetch.fetch(base_url + '/etag', session, cache_file=cache_file) == PAGE
+    assert 'If-None-Match' not in server.requests[0][1]
+    assert fetch.load_validators()[base_url + '/etag'] == {'etag': ETAG}
+
+    # the page is unchanged, so the server answers 304 and the cached copy is returned
+    assert fetch.fetch(base_url + '/etag', session, cache_file=cache_file) == PAGE
+    assert server.requests[1][1].get('If-None-Match') == ETAG
+    assert not any(p.suffix == '.tmp' for p in tmp_path.iterdir())
+
+
+def test_fetch_all_keeps_the_order_of_the_urls(stub_server, session):
+    server, base_url = stub_server
+    urls = [base_url + '/page{0}'.format(i) for i in range(6)]
+    assert fetch.fetch_all(urls, session) == [PAGE] * 6
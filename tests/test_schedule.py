@@ -0,0 +1,80 @@
+import random
+import pytest
+from synthetic import make_session
+from course import Course, SingleSection, Timeslot
+from schedule import Schedule
+from solver import find_schedules
+
+
+def weekend_course(code, weekday, start, end, term='F'):
+    slot = Timeslot(weekday, start, end, "DH2020", "")
+    return Course(code, "Weekend " + code, "", "", term, {'LEC': [SingleSection("LEC0101", [], "", 0, 10, 0, [slot])]})
+
+
+def test_weekend_sections_are_added_checked_and_removed():
+    sat = weekend_course("SAT101H5F", 'SA', "10:00", "12:00")
+    overlapping = weekend_course("SAT102H5F", 'SA', "11:00", "13:00")
+    sunday = weekend_course("SUN101H5F", 'SU', "11:00", "13:00")
+
+    sched = Schedule()
+    sched.add_course(sat, sat.course_sections['LEC'][0])
+    assert "SAT" in sched.to_string() and "SUN" not in sched.to_string()
+
+    check = sched.check_course(overlapping)
+    assert not check.ok and not sched.can_add_course(overlapping)
+    assert [cst[0].course_code for sec, slot, cst in check.conflicts()] == ["SAT101H5F"]
+    assert sched.can_add_course(sunday) and sched.check_course(sunday).ok
+
+    assert sched.rm_course(sat)
+    assert sched.occupancy == 0 and sched.can_add_course(overlapping)
+    assert "SAT" not in sched.to_string()
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_check_course_agrees_with_can_add_course(seed):
+    courses = make_session(seed, n_courses=8)
+    sched = next(find_schedules(courses[:2], ignore_closed=False), None)
+    if sched is None:
+        pytest.skip("the first two courses cannot be arranged")
+    for course in courses[2:]:
+        assert sched.check_course(course).ok == sched.can_add_course(course)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_rm_course_restores_the_weekly_lists(seed):
+    courses = make_session(seed, n_courses=3)
+    sched = next(find_schedules(courses, ignore_closed=False), None)
+    if sched is None:
+        pytest.skip("the courses cannot be arranged")
+    before = sched.make_copy()
+    course = courses[0]
+    assert sched.rm_course(course)
+    sched.add_course(course, *[sec for cltp in before.course_ltp_list if cltp[0] is course for sec in cltp[1:]])
+    assert sched.occupancy == before.occupancy
+    assert [[len(day) for day in wk] for wk in (sched.wk_sched_F, sched.wk_sched_S)] == \
+           [[len(day) for day in wk] for wk in (before.wk_sched_F, before.wk_sched_S)]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_occupancy_follows_overlapping_adds_and_removals(seed):
+    rng = random.Random(seed)
+    courses = make_session(seed, n_courses=8)
+    sched = Schedule()
+    for _ in range(30):
+        scheduled = [cltp[0] for cltp in sched.course_ltp_list]
+        if scheduled and rng.random() < 0.4:
+            assert sched.rm_course(rng.choice(scheduled))
+        else:
+            # sections are added without checking for conflicts, as a forced add would, so that they overlap
+            course = rng.choice([c for c in courses if c not in scheduled] or courses)
+            if course in scheduled:
+                continue
+            chosen = {sectype: rng.choice(secs) for sectype, secs in course.course_sections.items()}
+            sched.add_course(course, chosen.get('LEC'), chosen.get('TUT'), chosen.get('PRA'))
+        expected = 0
+        for cltp in sched.course_ltp_list:
+            for section in cltp[1:]:
+                if section is not None:
+                    expected |= section.mask
+        assert sched.occupancy == expected
+        assert sched.make_copy().occupancy == expected
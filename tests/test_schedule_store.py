@@ -0,0 +1,109 @@
+import random
+import pytest
+from synthetic import make_session
+from schedule_store import ScheduleStore
+from solver import schedule_sections
+
+
+def random_changes(store, sched, courses, rng, n_changes):
+    """
+    Add and remove random courses with random sections through the store.
+    """
+    for _ in range(n_changes):
+        scheduled = [cltp[0] for cltp in sched.course_ltp_list]
+        if scheduled and rng.random() < 0.4:
+            assert store.rm_course(sched, rng.choice(scheduled))
+        else:
+            course = rng.choice(courses)
+            if course in scheduled:
+                store.rm_course(sched, course)
+            chosen = {sectype: rng.choice(secs) for sectype, secs in course.course_sections.items()}
+            store.add_course(sched, course, chosen.get('LEC'), chosen.get('TUT'), chosen.get('PRA'))
+
+
+def n_lines(filepath):
+    with open(filepath, 'r', encoding='utf8') as f:
+        return sum(1 for _ in f)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_changes_are_replayed(seed, tmp_path):
+    filepath = str(tmp_path / "sched.jsonl")
+    courses = make_session(seed, n_courses=8)
+    store = ScheduleStore(filepath, "course_data_test")
+    sched = store.load(courses)
+    random_changes(store, sched, courses, random.Random(seed), 30)
+
+    reloaded = ScheduleStore(filepath, "course_data_test")
+    assert schedule_sections(reloaded.load(courses)) == schedule_sections(sched)
+    assert reloaded.missing == []
+
+
+@pytest.mark.parametrize('max_journal', [0, 3, 10])
+def test_journal_is_compacted(max_journal, tmp_path):
+    filepath = str(tmp_path / "sched.jsonl")
+    courses = make_session(1, n_courses=8)
+    rng = random.Random(max_journal)
+    store = ScheduleStore(filepath, "course_data_test", max_journal=max_journal)
+    sched = store.load(courses)
+    for _ in range(40):
+        random_changes(store, sched, courses, rng, 1)
+        # the header, then at most max_journal changes beyond one add per course
+        assert n_lines(filepath) <= 1 + len(sched.course_ltp_list) + max_journal
+    assert schedule_sections(ScheduleStore(filepath, "course_data_test").load(courses)) == schedule_sections(sched)
+
+    # a journal written with a larger limit is compacted on load
+    store = ScheduleStore(filepath, "course_data_test", max_journal=0)
+    sched = store.load(courses)
+    assert n_lines(filepath) == 1 + len(sched.course_ltp_list)
+
+
+def test_cut_off_change_is_dropped(tmp_path):
+    filepath = str(tmp_path / "sched.jsonl")
+    courses = make_session(2, n_courses=8)
+    store = ScheduleStore(filepath, "course_data_test")
+    sched = store.load(courses)
+    random_changes(store, sched, courses, random.Random(2), 10)
+    expected = schedule_sections(sched)
+    with open(filepath, 'a', encoding='utf8') as f:
+        f.write('{"op": "rm", "cour')
+
+    store = ScheduleStore(filepath, "course_data_test")
+    sched = store.load(courses)
+    assert schedule_sections(sched) == expected
+    with open(filepath, 'r', encoding='utf8') as f:
+        assert f.read().endswith('\n')
+
+    # changes made after the recovery are saved on whole lines
+    random_changes(store, sched, courses, random.Random(3), 5)
+    assert schedule_sections(ScheduleStore(filepath, "course_data_test").load(courses)) == schedule_sections(sched)
+
+
+def test_missing_courses_and_sections_are_listed(tmp_path):
+    filepath = str(tmp_path / "sched.jsonl")
+    courses = make_session(4, n_courses=4)
+    store = ScheduleStore(filepath, "course_data_test")
+    sched = store.load(courses)
+    for course in courses[:2]:
+        store.add_course(sched, course, course.course_sections['LEC'][0])
+
+    gone = courses[0]
+    changed = courses[1]
+    changed.course_sections['LEC'][0].section_id = "LEC9999"
+    store = ScheduleStore(filepath, "course_data_test")
+    sched = store.load(courses[1:])
+    assert sched.course_ltp_list == []
+    assert sorted(store.missing) == sorted([(gone.course_code, None), (changed.course_code, "LEC0101")])
+
+
+def test_other_course_data_is_rejected(tmp_path):
+    filepath = str(tmp_path / "sched.jsonl")
+    courses = make_session(3, n_courses=4)
+    store = ScheduleStore(filepath, "data/course_data_utm_20199")
+    sched = store.load(courses)
+    store.add_course(sched, courses[0], courses[0].course_sections['LEC'][0])
+
+    # only the file name of the course data is saved
+    assert len(ScheduleStore(filepath, "elsewhere/course_data_utm_20199").load(courses).course_ltp_list) == 1
+    with pytest.raises(Exception, match="was saved for course_data_utm_20199, not course_data_utm_20201"):
+        ScheduleStore(filepath, "data/course_data_utm_20201").load(courses)
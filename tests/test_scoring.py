@@ -0,0 +1,36 @@
+import pytest
+from synthetic import make_session
+from course import Course, SingleSection, Timeslot
+from schedule import Schedule
+from scoring import day_masks, metrics, preference_weights, top_k
+from solver import find_best_schedules, find_schedules
+
+
+@pytest.mark.parametrize('seed', range(8))
+@pytest.mark.parametrize('preference', sorted(preference_weights))
+def test_best_schedules_match_top_k(seed, preference):
+    courses = make_session(seed, n_courses=3)
+    weights = preference_weights[preference]
+    for k in (1, 3, 10):
+        expected = top_k(find_schedules(courses, collapse=False), k, weights)
+        found = find_best_schedules(courses, k, weights)
+        # schedules with equal scores may be picked in a different order, so only the scores must agree
+        assert [s for s, sched in found] == [s for s, sched in expected]
+        assert all(s == top_k([sched], 1, weights)[0][0] for s, sched in found)
+
+
+@pytest.mark.parametrize('k', (0, -1))
+def test_no_schedules_for_k_below_1(k):
+    courses = make_session(1, n_courses=3)
+    assert find_best_schedules(courses, k, preference_weights['compact']) == []
+
+
+def test_weekend_classes_are_scored():
+    slot = Timeslot('SA', "18:00", "20:00", "DH2020", "")
+    course = Course("SAT101H5F", "Weekend", "", "", 'F', {'LEC': [SingleSection("LEC0101", [], "", 0, 10, 0, [slot])]})
+    sched = Schedule()
+    sched.add_course(course, course.course_sections['LEC'][0])
+    days = day_masks(sched.occupancy)
+    assert metrics['days_on_campus'].func(sched, days) == 1
+    assert metrics['evening_minutes'].func(sched, days) == 120
+    assert metrics['latest_end'].func(sched, days) == 20 * 60
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip('lxml')
+pytest.importorskip('jsonpickle')
+pytest.importorskip('requests')
+from synthetic import state_of
+import scrape_courses_utm
+from scrape_courses_utm import parse_data, parse_pages, split_page
+
+SECTION_ROW = ('<tr id="tr_{n}"><td></td><td><label>{sec_id}</label></td><td>Instructor, {sec_id}</td>'
+               '<td>{enrolled}</td><td>60</td><td>0</td><td></td>{weekdays}{starts}{ends}<td>{rooms}</td>'
+               '<td>{notes}</td></tr>')
+
+
+def section_row(code, term, i, sec_id):
+    weekdays = ('MO', 'WE')[:1 + i % 2]
+    starts = ['{0:02}:00'.format(9 + (i + j) % 8) for j in range(len(weekdays))]
+    ends = ['{0:02}:00'.format(10 + (i + j) % 8) for j in range(len(weekdays))]
+    if term == 'Y':
+        rooms = ''.join('<div><span>DH20{0:02}</span><span>IB1{0:02}</span></div>'.format(j)
+                        for j in range(len(weekdays)))
+    else:
+        rooms = '<br/>'.join('DH20{0:02}'.format(j) for j in range(len(weekdays)))
+    return SECTION_ROW.format(n=code + sec_id, sec_id=sec_id, enrolled=i % 61,
+                              weekdays='<td>' + ''.join('<abbr>{0}</abbr>'.format(w) for w in weekdays) + '</td>',
+                              starts='<td>' + '<br/>'.join(starts) + '</td>', ends='<td>' + '<br/>'.join(ends) + '</td>',
+                              rooms=rooms, notes='Closed' if i % 7 == 0 else '')
+
+
+def make_page(year, n_courses):
+    """
+    :return: a timetable page of n_courses courses, laid out as parse_data expects the UTM timetable.
+    """
+    courses = []
+    for c in range(n_courses):
+        term = 'FSY'[c % 3]
+        code = 'ABC{0}{1:02}H5{2}'.format(year, c, term)
+        rows = ''.join(section_row(code, term, c + i, sec_id)
+                       for i, sec_id in enumerate(['LEC0101', 'LEC0102', 'TUT0101'][:1 + c % 3]))
+        courses.append('<div class="course"><span id="{0}"><h4>{0} - Course {1} été</h4></span>'
+                       '<div class="infoCourse">Info of {0}</div><div class="enrlControls">Priority</div>'
+                       '<table id="tbl_{0}"><tbody>{2}</tbody></table></div>'.format(code, c, rows))
+    return ('<html><head><meta charset="utf-8"/></head><body><div>' + ''.join(courses) +
+            '</div></body></html>').encode('utf8')
+
+
+def test_split_page_keeps_every_course(monkeypatch):
+    monkeypatch.setattr(scrape_courses_utm, 'PARSE_CHUNK_MIN_BYTES', 0)
+    page = make_page(1, 25)
+    chunks = split_page(page, chunk_courses=10)
+    assert len(chunks) == 3
+    assert state_of([course for chunk in chunks for course in parse_data(chunk)]) == state_of(parse_data(page))
+
+
+def test_parallel_parsing_matches_serial_parsing(monkeypatch):
+    monkeypatch.setattr(scrape_courses_utm, 'PARSE_CHUNK_MIN_BYTES', 0)
+    pages = [make_page(year, 120) for year in (1, 2, 3)]
+    serial = [course for page in pages for course in parse_data(page)]
+    assert len(serial) == 360
+    assert state_of(parse_pages(pages, max_workers=2)) == state_of(serial)
@@ -0,0 +1,49 @@
+import pytest
+from synthetic import make_session
+from solver import build_matrix, count_brute_force, count_solution, expand_solution, find_schedules
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_solution_count_matches_brute_force(seed):
+    courses = make_session(seed, n_courses=3)
+    assert sum(1 for _ in find_schedules(courses, collapse=False)) == count_brute_force(courses)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_schedules_are_conflict_free(seed):
+    courses = make_session(seed, n_courses=3)
+    for sched in find_schedules(courses, collapse=False):
+        sections = [sec for cltp in sched.course_ltp_list for sec in cltp[1:] if sec is not None]
+        assert all(not a.is_conflict(b) for i, a in enumerate(sections) for b in sections[i + 1:])
+        assert len(sched.course_ltp_list) == len(courses)
+
+
+def test_duplicate_course_is_rejected():
+    courses = make_session(0, n_courses=2)
+    with pytest.raises(Exception):
+        next(find_schedules([courses[0], courses[0]]))
+
+
+def section_ids(sched):
+    return sorted((cltp[0].course_code, sec.section_id) for cltp in sched.course_ltp_list
+                  for sec in cltp[1:] if sec is not None)
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_collapsed_search_matches_uncollapsed(seed):
+    courses = make_session(seed, n_courses=3, max_sections=4, same_times_rate=0.6)
+    collapsed = sorted(section_ids(sched) for sched in find_schedules(courses, collapse=True))
+    uncollapsed = sorted(section_ids(sched) for sched in find_schedules(courses, collapse=False))
+    assert collapsed == uncollapsed
+    assert len(collapsed) == count_brute_force(courses)
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_collapsed_rows_count_their_schedules(seed):
+    courses = make_session(seed, n_courses=3, max_sections=4, same_times_rate=0.6)
+    solutions = list(build_matrix(courses, collapse=True).solve())
+    assert sum(count_solution(solution) for solution in solutions) == count_brute_force(courses)
+    for solution in solutions:
+        assert sum(1 for _ in expand_solution(solution)) == count_solution(solution)
+        # every section of a row takes place at the same times
+        assert all(len(set(sec.mask for sec in secs)) == 1 for course, sectype, secs in solution)